@@ -1,124 +1,125 @@
 """Image generation adapters for different AI models."""
 
-from schema import ImagePrompt
+from adapters.render import Field, Group, Line, Spec, SpecAdapter
 
 
-class DalleAdapter:
+class DalleAdapter(SpecAdapter):
     """DALL-E 3 adapter - uses natural language with detailed descriptions."""
 
     model_name = "dalle-3"
-
-    def compile(self, p: ImagePrompt) -> str:
-        parts = [f"Create a {p.style or 'detailed'} image of {p.subject}"]
-
-        if p.environment:
-            parts.append(f"in {p.environment}")
-
-        details = []
-        if p.lighting:
-            details.append(f"Lighting: {p.lighting}")
-        if p.mood:
-            details.append(f"Mood: {p.mood}")
-        if p.camera:
-            details.append(f"Camera: {p.camera}")
-        if p.quality_level:
-            details.append(f"Quality: {p.quality_level}")
-
-        if details:
-            parts.append(". ".join(details))
-
-        if p.negative_constraints:
-            parts.append(f"Avoid: {', '.join(p.negative_constraints)}")
-
-        return ". ".join(parts) + "."
-
-
-class MidjourneyAdapter:
+    modality = "image"
+    # Prompts are capped at 4000 characters
+    max_prompt_tokens = 1000
+
+    spec = Spec(
+        [
+            Line("Create a {style} image of {subject}", defaults={"style": "detailed"}),
+            Field("environment", "in {}"),
+            Group(
+                [
+                    Field("lighting", "Lighting: {}"),
+                    Field("mood", "Mood: {}"),
+                    Field("camera", "Camera: {}"),
+                    Field("quality_level", "Quality: {}"),
+                ],
+                sep=". ",
+            ),
+            Field("negative_constraints", "Avoid: {}", join=", "),
+        ],
+        sep=". ",
+        suffix=".",
+    )
+
+
+class MidjourneyAdapter(SpecAdapter):
     """Midjourney v6 adapter - uses comma-separated tags with parameters."""
 
     model_name = "midjourney-v6"
-
-    def compile(self, p: ImagePrompt) -> str:
-        parts = [p.subject]
-
-        if p.environment:
-            parts.append(p.environment)
-        if p.style:
-            parts.append(p.style)
-        if p.lighting:
-            parts.append(p.lighting)
-        if p.camera:
-            parts.append(p.camera)
-        if p.mood:
-            parts.append(p.mood)
-
-        prompt = ", ".join(parts)
-
-        # Add Midjourney-specific parameters
-        params = []
-        params.append(f"--ar {p.aspect_ratio or '16:9'}")
-        params.append("--v 6")
-        params.append("--q 2")
-
-        return f"{prompt} {' '.join(params)}"
-
-
-class StableDiffusionAdapter:
+    modality = "image"
+
+    spec = Spec(
+        [
+            Group(
+                [
+                    Line("{subject}"),
+                    Field("environment"),
+                    Field("style"),
+                    Field("lighting"),
+                    Field("camera"),
+                    Field("mood"),
+                ],
+                sep=", ",
+            ),
+            # Midjourney-specific parameters
+            Line("--ar {aspect_ratio} --v 6 --q 2", defaults={"aspect_ratio": "16:9"}),
+        ],
+        sep=" ",
+    )
+
+
+class StableDiffusionAdapter(SpecAdapter):
     """Stable Diffusion XL adapter - uses separate positive/negative prompts."""
 
     model_name = "sdxl"
-
-    def compile(self, p: ImagePrompt) -> str:
-        positive_parts = [p.subject]
-
-        if p.environment:
-            positive_parts.append(p.environment)
-        if p.style:
-            positive_parts.append(p.style)
-        if p.lighting:
-            positive_parts.append(p.lighting)
-        if p.mood:
-            positive_parts.append(p.mood)
-
-        positive = ", ".join(positive_parts)
-        negative = ", ".join(p.negative_constraints or ["low quality", "blurry"])
-
-        return f"Positive: {positive}\nNegative: {negative}"
-
-
-class ImagenAdapter:
+    modality = "image"
+    # The CLIP text encoder reads at most 77 tokens
+    max_prompt_tokens = 77
+
+    spec = Spec(
+        [
+            Group(
+                [
+                    Line("{subject}"),
+                    Field("environment"),
+                    Field("style"),
+                    Field("lighting"),
+                    Field("mood"),
+                ],
+                sep=", ",
+                template="Positive: {}",
+            ),
+            Line(
+                "Negative: {negative_constraints}",
+                defaults={"negative_constraints": ["low quality", "blurry"]},
+                joins={"negative_constraints": ", "},
+            ),
+        ],
+        sep="\n",
+    )
+
+
+class ImagenAdapter(SpecAdapter):
     """Google Imagen adapter - focuses on realistic descriptions."""
 
     model_name = "imagen"
-
-    def compile(self, p: ImagePrompt) -> str:
-        parts = [f"A realistic image of {p.subject}"]
-
-        if p.environment:
-            parts.append(f"in {p.environment}")
-
-        parts.append("natural lighting, realistic proportions")
-
-        if p.style:
-            parts.append(f"{p.style} style")
-
-        return ", ".join(parts) + "."
-
-
-class FireflyAdapter:
+    modality = "image"
+    max_prompt_tokens = 480
+
+    spec = Spec(
+        [
+            Line("A realistic image of {subject}"),
+            Field("environment", "in {}"),
+            Line("natural lighting, realistic proportions"),
+            Field("style", "{} style"),
+        ],
+        sep=", ",
+        suffix=".",
+    )
+
+
+class FireflyAdapter(SpecAdapter):
     """Adobe Firefly adapter - emphasizes commercial quality."""
 
     model_name = "firefly"
-
-    def compile(self, p: ImagePrompt) -> str:
-        parts = [f"High-quality commercial image of {p.subject}"]
-
-        if p.environment:
-            parts.append(f"in {p.environment}")
-
-        parts.append("clean lighting, professional style")
-
-        if p.style:
-            parts.append(f"{p.style} aesthetic")
-
-        return ", ".join(parts) + "."
+    modality = "image"
+
+    spec = Spec(
+        [
+            Line("High-quality commercial image of {subject}"),
+            Field("environment", "in {}"),
+            Line("clean lighting, professional style"),
+            Field("style", "{} aesthetic"),
+        ],
+        sep=", ",
+        suffix=".",
+    )
@@ -0,0 +1,645 @@
+"""
+Declarative render specs for prompt adapters.
+
+An adapter describes its output as a Spec: an ordered list of segments,
+each rendered from prompt fields, joined with a separator. Specs are
+compiled once, when the adapter class is defined, into a straight-line
+Python function (the "render plan"): runs of segments that always render
+are merged into one f-string with the separators folded into the literals,
+and only conditional segments go through a list join.
+
+    class PikaAdapter(SpecAdapter):
+        spec = Spec(
+            [
+                Line("Scene: {scene}"),
+                Field("action", "Action: {}"),
+                Line("Duration: {duration_seconds}s"),
+            ],
+            sep="\\n",
+        )
+"""
+
+import hashlib
+import inspect
+import marshal
+from functools import cached_property
+from string import Formatter
+
+
+def transform_fingerprint(transform):
+    """
+    Identity of a transform in a spec's repr, and so in its fingerprint:
+    the transform's qualified name plus a digest of its source (or, without
+    source, its code object), so editing the transform changes the
+    fingerprint. Builtins such as str.title are identified by name alone.
+    """
+    name = getattr(transform, "__qualname__", type(transform).__qualname__)
+    name = f"{getattr(transform, '__module__', None) or 'builtins'}.{name}"
+    try:
+        code = inspect.getsource(transform).encode("utf-8")
+    except (OSError, TypeError):
+        code = getattr(transform, "__code__", None)
+        if code is None:
+            return name
+        code = marshal.dumps(code)
+    return f"{name}:{hashlib.blake2b(code, digest_size=8).hexdigest()}"
+
+
+class Line:
+    """
+    A segment rendered from a template with {field} placeholders.
+
+    Args:
+        template: Text with {field_name} placeholders
+        when: Field names that must all be truthy for the segment to render;
+            empty means the segment always renders
+        defaults: Field name -> value used when the field is falsy
+        transforms: Field name -> callable applied to the value
+        joins: Field name -> separator used to join a list value
+
+    Defaults are applied first, then transforms, then joins.
+    """
+
+    def __init__(self, template, when=(), defaults=None, transforms=None, joins=None):
+        self.template = template
+        self.when = (when,) if isinstance(when, str) else tuple(when)
+        self.defaults = defaults or {}
+        self.transforms = transforms or {}
+        self.joins = joins or {}
+
+    def fields(self):
+        """Names of all prompt fields this segment reads."""
+        names = [name for _, name, _, _ in Formatter().parse(self.template) if name]
+        return frozenset(names) | frozenset(self.when)
+
+    def __repr__(self):
+        transforms = {
+            name: transform_fingerprint(self.transforms[name]) for name in sorted(self.transforms)
+        }
+        return (
+            f"Line({self.template!r}, when={self.when!r}, defaults={self.defaults!r}, "
+            f"transforms={transforms!r}, joins={self.joins!r})"
+        )
+
+
+class Field(Line):
+    """
+    A segment that renders only when one field is truthy.
+
+    Args:
+        name: Prompt field name
+        template: Text with a single {} placeholder for the value
+        join: Separator used to join a list value
+        transform: Callable applied to the value
+    """
+
+    def __init__(self, name, template="{}", join=None, transform=None):
+        super().__init__(
+            template.replace("{}", "{" + name + "}"),
+            when=(name,),
+            transforms={name: transform} if transform else None,
+            joins={name: join} if join is not None else None,
+        )
+
+
+class Group:
+    """
+    Segments joined with their own separator and rendered as one segment.
+
+    Args:
+        items: Child segments
+        sep: Separator between rendered children
+        template: Text with a single {} placeholder for the joined children
+        when_any: Field names of which at least one must be truthy; by
+            default the group renders whenever any child renders
+    """
+
+    def __init__(self, items, sep, template="{}", when_any=()):
+        self.items = list(items)
+        self.sep = sep
+        self.template = template
+        self.when_any = tuple(when_any)
+
+    def fields(self):
+        """Names of all prompt fields this segment reads."""
+        return frozenset(self.when_any).union(*(item.fields() for item in self.items))
+
+    def __repr__(self):
+        return (
+            f"Group({self.items!r}, sep={self.sep!r}, template={self.template!r}, "
+            f"when_any={self.when_any!r})"
+        )
+
+
+class FirstOf:
+    """The first of several alternative segments that renders."""
+
+    def __init__(self, *items):
+        self.items = list(items)
+
+    def fields(self):
+        """Names of all prompt fields this segment reads."""
+        return frozenset().union(*(item.fields() for item in self.items))
+
+    def __repr__(self):
+        return f"FirstOf({', '.join(repr(item) for item in self.items)})"
+
+
+class Spec:
+    """
+    Complete output description of an adapter.
+
+    Args:
+        items: Top-level segments in output order
+        sep: Separator between rendered segments
+        suffix: Text appended after the joined segments
+        empty: Output when no segment renders (instead of suffix alone)
+    """
+
+    def __init__(self, items, sep="", suffix="", empty=None):
+        self.items = list(items)
+        self.sep = sep
+        self.suffix = suffix
+        self.empty = empty
+
+    def fields(self):
+        """Names of all prompt fields this spec reads."""
+        return frozenset().union(*(item.fields() for item in self.items))
+
+    def __repr__(self):
+        return (
+            f"Spec({self.items!r}, sep={self.sep!r}, suffix={self.suffix!r}, "
+            f"empty={self.empty!r})"
+        )
+
+
+class _Fixed:
+    """
+    Text rendered once, bound into a specialized plan as a constant.
+
+    Args:
+        slot: Index of the text in the list passed when binding the plan
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def fields(self):
+        return frozenset()
+
+    def __repr__(self):
+        return f"_Fixed({self.slot})"
+
+
+# Specialized plans kept per plan, one per combination of varying fields and
+# fixed segments that render
+MAX_SPECIALIZED_PLANS = 128
+
+
+class RenderPlan:
+    """
+    A Spec compiled into a render function.
+
+    Attributes:
+        spec: The source Spec
+        fields: Prompt fields read by the plan, in fetch order
+        source: Generated Python source of the render function
+        render: Function (prompt) -> str
+        fingerprint: Stable digest of the spec, usable as an adapter version
+    """
+
+    def __init__(self, spec, fields, source, render):
+        self.spec = spec
+        self.fields = fields
+        self.source = source
+        self.render = render
+        # Filled by specialize(): id(segment) -> (fields, compiled segment),
+        # and (varying, shape) -> (spec, fields, source, factory, constants)
+        self._segments = {}
+        self._specialized = {}
+
+    @cached_property
+    def fingerprint(self):
+        # Computed on first use: specialized plans are built per request
+        return hashlib.blake2b(repr(self.spec).encode("utf-8"), digest_size=8).hexdigest()
+
+    def specialize(self, prompt, varying):
+        """
+        Plan for variants of a prompt that differ only in some fields.
+
+        Segments that read none of the varying fields render the same for
+        every variant, so they are rendered once, here, and bound into the
+        new plan as constant text (or dropped, if they don't render); only
+        the remaining segments are rendered per variant. Groups are
+        specialized segment by segment. The generated code depends only on
+        which segments vary and which fixed ones render, so it is compiled
+        once per such shape and reused with each prompt's texts.
+
+        Args:
+            prompt: Base prompt the variants are derived from
+            varying: Names of the fields that differ between variants
+
+        Returns:
+            RenderPlan: Plan whose render(variant) equals self.render(variant)
+                for any variant equal to prompt outside the varying fields
+        """
+        varying = frozenset(varying)
+        texts = []
+        shape = []
+        if varying.isdisjoint(self.fields):
+            texts.append(self.render(prompt))
+            items = None
+        else:
+            items = self._specialize_items(self.spec.items, prompt, varying, texts, shape)
+
+        key = (varying, tuple(shape))
+        compiled = self._specialized.get(key)
+        if compiled is None:
+            if items is None:
+                spec = Spec([_Fixed(0)])
+            else:
+                spec = Spec(
+                    items, sep=self.spec.sep, suffix=self.spec.suffix, empty=self.spec.empty
+                )
+            compiled = _compile(spec, f"{self.render.__name__}_variant")
+            if len(self._specialized) >= MAX_SPECIALIZED_PLANS:
+                # Only pathological requests get here; starting over is
+                # simpler than eviction and safe under concurrent requests
+                self._specialized.clear()
+            self._specialized[key] = compiled
+
+        spec, fields, source, factory, constants = compiled
+        render = factory(
+            **{
+                name: texts[value.slot] if isinstance(value, _Fixed) else value
+                for name, value in constants.items()
+            }
+        )
+        return RenderPlan(spec, fields, source, render)
+
+    def _specialize_items(self, items, prompt, varying, texts, shape):
+        specialized = []
+        for item in items:
+            fields, render = self._segment(item)
+            if fields.isdisjoint(varying):
+                text = render(prompt)
+                shape.append(text is not None)
+                if text is not None:
+                    specialized.append(_Fixed(len(texts)))
+                    texts.append(text)
+            elif isinstance(item, Group) and any(
+                not self._segment(child)[0].isdisjoint(varying) for child in item.items
+            ):
+                # when_any keeps reading the prompt, so it still applies as is
+                specialized.append(
+                    Group(
+                        self._specialize_items(item.items, prompt, varying, texts, shape),
+                        item.sep,
+                        item.template,
+                        item.when_any,
+                    )
+                )
+            else:
+                specialized.append(item)
+        return specialized
+
+    def segments(self, prompt, previous=None, changed=()):
+        """
+        Render the top-level segments separately (see join).
+
+        Args:
+            prompt: Prompt to render
+            previous: Result of an earlier call for a prompt that differs
+                from this one only in the changed fields; its segments that
+                read none of them are reused instead of re-rendered
+            changed: Names of the fields that changed since previous
+
+        Returns:
+            list: Rendered text of each segment, None for segments that
+                don't render
+        """
+        rendered = []
+        for index, item in enumerate(self.spec.items):
+            fields, render = self._segment(item)
+            if previous is not None and fields.isdisjoint(changed):
+                rendered.append(previous[index])
+            else:
+                rendered.append(render(prompt))
+        return rendered
+
+    def join(self, segments):
+        """The full prompt from segments(); equals render() of the same prompt."""
+        parts = [text for text in segments if text is not None]
+        if not parts and self.spec.empty is not None:
+            return self.spec.empty
+        return self.spec.sep.join(parts) + self.spec.suffix
+
+    def _segment(self, item):
+        """(fields read, compiled segment) of one of the spec's segments."""
+        segment = self._segments.get(id(item))
+        if segment is None:
+            segment = self._segments[id(item)] = (item.fields(), compile_segment(item))
+        return segment
+
+
+# Piece kinds: literal text, a value to format, (sep, list expression) to join
+_LITERAL, _VALUE, _JOIN = "literal", "value", "join"
+
+
+class _Codegen:
+    """
+    Emits Python source for a Spec.
+
+    Every sequence of segments (the spec itself, or a group) is rendered to
+    (lines, pieces, guard): code that builds a list variable, the pieces of
+    an expression for the joined result, and the list variable to test for
+    emptiness (None when the sequence always renders). Runs of segments
+    that always render are merged into a single expression rather than
+    appended one by one.
+    """
+
+    def __init__(self):
+        self.constants = {}
+        self.fields = []
+        self.lists = 0
+
+    def constant(self, value):
+        """Name under which a value is available to the generated code."""
+        for name, existing in self.constants.items():
+            if existing is value:
+                return name
+        name = f"c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def expression(self, pieces):
+        """One string expression: merged literals plus f-string formatted values."""
+        merged = []
+        for kind, text in pieces:
+            if kind == _LITERAL and merged and merged[-1][0] == _LITERAL:
+                merged[-1] = (_LITERAL, merged[-1][1] + text)
+            elif kind != _LITERAL or text:
+                merged.append((kind, text))
+        if not merged:
+            return "''"
+        if len(merged) == 1 and merged[0][0] == _JOIN:
+            sep, items = merged[0][1]
+            return f"{sep!r}.join({items})"
+
+        # Values are interpolated by name: f-string expressions can't hold
+        # quoted or backslashed separators before Python 3.12
+        rendered = []
+        for kind, text in merged:
+            if kind == _LITERAL:
+                rendered.append(repr(text))
+            elif kind == _JOIN:
+                rendered.append(f"f'{{{self.constant(text[0])}.join({text[1]})}}'")
+            else:
+                rendered.append(f"f'{{{text}}}'")
+        return " ".join(rendered)
+
+    def use(self, field):
+        if field not in self.fields:
+            self.fields.append(field)
+        return f"v_{field}"
+
+    def value(self, line, field):
+        """Expression for a placeholder value after defaults/transforms/joins."""
+        expr = self.use(field)
+        if field in line.defaults:
+            expr = f"({expr} or {self.constant(line.defaults[field])})"
+        if field in line.transforms:
+            expr = f"{self.constant(line.transforms[field])}({expr})"
+        if field in line.joins:
+            expr = f"{self.constant(line.joins[field])}.join({expr})"
+        return expr
+
+    def pieces(self, line):
+        """(kind, text) pieces rendering a Line's template."""
+        pieces = []
+        for literal, field, spec, conversion in Formatter().parse(line.template):
+            if literal:
+                pieces.append((_LITERAL, literal))
+            if field is not None:
+                inner = self.value(line, field)
+                if conversion:
+                    inner += f"!{conversion}"
+                if spec:
+                    inner += f":{spec}"
+                pieces.append((_VALUE, inner))
+        return pieces
+
+    def condition(self, fields, joiner):
+        return f" {joiner} ".join(self.use(field) for field in fields)
+
+    def group(self, item, indent):
+        """(lines, pieces, guard) for a Group, ignoring its when_any."""
+        self.lists += 1
+        lines, pieces, guard = self.sequence(item.items, f"g{self.lists}", item.sep, indent)
+        prefix, _, suffix = item.template.partition("{}")
+        return lines, [(_LITERAL, prefix)] + pieces + [(_LITERAL, suffix)], guard
+
+    def sequence(self, items, var, sep, indent):
+        """(lines, pieces, guard) for segments joined with sep."""
+        pad = "    " * indent
+        lines = []
+        pending = []
+        created = nonempty = False
+
+        def add(pad, pieces):
+            return f"{pad}{var}.append({self.expression(pieces)})"
+
+        for item in items:
+            fixed = group = None
+            if isinstance(item, Line) and not item.when:
+                fixed = self.pieces(item)
+            elif isinstance(item, _Fixed):
+                fixed = [(_VALUE, self.constant(item))]
+            elif isinstance(item, Group) and not item.when_any:
+                group = self.group(item, indent)
+                if group[2] is None:
+                    lines.extend(group[0])
+                    fixed = group[1]
+
+            if fixed is not None:
+                if pending:
+                    pending.append((_LITERAL, sep))
+                pending.extend(fixed)
+                continue
+
+            if pending:
+                expr = self.expression(pending)
+                lines.append(f"{pad}{var}.append({expr})" if created else f"{pad}{var} = [{expr}]")
+                created = nonempty = True
+                pending = []
+            elif not created:
+                lines.append(f"{pad}{var} = []")
+                created = True
+            lines.extend(self.emit(item, add, indent, group))
+
+        if not created:
+            return lines, pending, None
+        joined = (_JOIN, (sep, var))
+        if pending and nonempty:
+            return lines, [joined, (_LITERAL, sep)] + pending, None
+        if pending:
+            lines.append(add(pad, pending))
+            return lines, [joined], None
+        return lines, [joined], None if nonempty else var
+
+    def emit(self, item, add, indent, group=None):
+        """
+        Source lines adding a conditional item via add(pad, pieces).
+
+        `group` is the item's already generated (lines, pieces, guard), if any.
+        """
+        pad = "    " * indent
+
+        if isinstance(item, Line):
+            return [
+                f"{pad}if {self.condition(item.when, 'and')}:",
+                add(pad + "    ", self.pieces(item)),
+            ]
+
+        if isinstance(item, Group):
+            lines, pieces, guard = group or self.group(item, indent)
+            if guard is not None:
+                lines += [f"{pad}if {guard}:", add(pad + "    ", pieces)]
+            else:
+                lines.append(add(pad, pieces))
+            if not item.when_any:
+                return lines
+            return [f"{pad}if {self.condition(item.when_any, 'or')}:"] + [
+                "    " + line for line in lines
+            ]
+
+        if isinstance(item, FirstOf):
+            return self.first_of(item.items, add, indent)
+
+        raise TypeError(f"Unsupported spec item: {item!r}")
+
+    def first_of(self, alternatives, add, indent):
+        """Nested if/else trying each alternative in turn."""
+        pad = "    " * indent
+        item, rest = alternatives[0], alternatives[1:]
+
+        if isinstance(item, Line):
+            if not item.when:
+                return [add(pad, self.pieces(item))]
+            lines = [f"{pad}if {self.condition(item.when, 'and')}:"]
+            lines.append(add(pad + "    ", self.pieces(item)))
+        elif isinstance(item, Group):
+            lines, pieces, guard = self.group(item, indent)
+            tests = [guard] if guard else []
+            if item.when_any:
+                tests.insert(0, f"({self.condition(item.when_any, 'or')})")
+            if not tests:
+                return lines + [add(pad, pieces)]
+            lines += [f"{pad}if {' and '.join(tests)}:", add(pad + "    ", pieces)]
+        else:
+            raise TypeError(f"Unsupported FirstOf alternative: {item!r}")
+
+        if rest:
+            lines.append(f"{pad}else:")
+            lines.extend(self.first_of(rest, add, indent + 1))
+        return lines
+
+
+def compile_spec(spec, name="render"):
+    """
+    Compile a Spec into a RenderPlan.
+
+    Args:
+        spec: Spec to compile
+        name: Name for the generated function (shows up in tracebacks)
+
+    Returns:
+        RenderPlan: Plan whose render(prompt) returns the prompt string
+    """
+    spec, fields, source, factory, constants = _compile(spec, name)
+    return RenderPlan(spec, fields, source, factory(**constants))
+
+
+def _compile(spec, name):
+    """(spec, fields, source, factory, constants); factory(**constants) renders."""
+    gen = _Codegen()
+    body, pieces, guard = gen.sequence(spec.items, "parts", spec.sep, 2)
+    ending = []
+    if guard is not None and spec.empty is not None:
+        ending += [f"        if not {guard}:", f"            return {repr(spec.empty)}"]
+    ending.append(f"        return {gen.expression(pieces + [(_LITERAL, spec.suffix)])}")
+
+    fields, source, factory = _define(gen, body, ending, name)
+    return spec, fields, source, factory, gen.constants
+
+
+def compile_segment(item, name="render_segment"):
+    """
+    Compile a single spec segment on its own.
+
+    Args:
+        item: Line, Field, Group or FirstOf
+        name: Name for the generated function
+
+    Returns:
+        function: (prompt) -> rendered segment, or None when the segment
+            does not render for that prompt
+    """
+    gen = _Codegen()
+    body, pieces, guard = gen.sequence([item], "parts", "", 2)
+    ending = []
+    if guard is not None:
+        ending += [f"        if not {guard}:", "            return None"]
+    ending.append(f"        return {gen.expression(pieces)}")
+    return _define(gen, body, ending, name)[2](**gen.constants)
+
+
+def _define(gen, body, ending, name):
+    """
+    (fields, source, factory) for a generated render function body, where
+    factory(**gen.constants) returns the render function.
+    """
+    # Constants are bound as closure cells of a factory function, as
+    # dataclasses does, so the render function reads them without global
+    # lookups
+    fields = tuple(gen.fields)
+    fetch = [f"        v_{field} = p.{field}" for field in fields]
+    source = "\n".join(
+        [f"def __create_fn__({', '.join(gen.constants)}):", f"    def {name}(p):"]
+        + fetch
+        + body
+        + ending
+        + [f"    return {name}"]
+    )
+    namespace = {}
+    exec(compile(source, f"<render plan {name}>", "exec"), namespace)
+    return fields, source, namespace["__create_fn__"]
+
+
+class SpecAdapter:
+    """
+    Base class for adapters defined by a render spec.
+
+    Subclasses set `spec`; it is compiled into `plan` when the class is
+    created, and the plan's render function becomes compile() itself, so
+    adapter.compile(prompt) costs no extra call frame. They also declare
+    the `modality` they serve, which the registry catalogs them under, and
+    may set `max_prompt_tokens`, the longest prompt their model accepts
+    (see tokens.py), and a `version` naming their output in the prompt
+    store (see compiler.adapter_version; by default the plan fingerprint).
+    """
+
+    spec = None
+    plan = None
+    modality = None
+    max_prompt_tokens = None
+    version = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("spec") is not None:
+            cls.plan = compile_spec(cls.spec, name=f"render_{cls.__name__}")
+            cls.compile = staticmethod(cls.plan.render)
+
+    def compile(self, p) -> str:
+        raise TypeError(f"{type(self).__name__} must define `spec` to compile prompts")
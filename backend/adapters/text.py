@@ -1,204 +1,159 @@
 """Text generation adapters for different LLM models."""
 
-from schema import TextPrompt
+from adapters.render import Field, FirstOf, Group, Line, Spec, SpecAdapter
 
 
-class GPT4Adapter:
+class GPT4Adapter(SpecAdapter):
     """OpenAI GPT-4 / GPT-4.1 / GPT-4o adapter."""
 
     model_name = "gpt-4"
-
-    def compile(self, p: TextPrompt) -> str:
-        prompt = f"{p.goal}: {p.subject}"
-
-        details = []
-        if p.task_type:
-            details.append(f"Type: {p.task_type}")
-        if p.context:
-            details.append(f"Context: {p.context}")
-        if p.style:
-            details.append(f"Style: {p.style}")
-        if p.tone:
-            details.append(f"Tone: {p.tone}")
-        if p.format:
-            details.append(f"Format: {p.format}")
-        if p.length:
-            details.append(f"Length: {p.length}")
-        if p.constraints:
-            details.append(f"Must include: {', '.join(p.constraints)}")
-
-        if details:
-            prompt += "\n\n" + "\n".join(details)
-
-        if p.negative_constraints:
-            prompt += f"\n\nDo not: {', '.join(p.negative_constraints)}"
-
-        return prompt
-
-
-class LlamaAdapter:
+    modality = "text"
+    # Context window; MODEL_TOKEN_BUDGETS can reserve room for the reply
+    max_prompt_tokens = 8192
+
+    spec = Spec(
+        [
+            Line("{goal}: {subject}"),
+            Group(
+                [
+                    Field("task_type", "Type: {}"),
+                    Field("context", "Context: {}"),
+                    Field("style", "Style: {}"),
+                    Field("tone", "Tone: {}"),
+                    Field("format", "Format: {}"),
+                    Field("length", "Length: {}"),
+                    Field("constraints", "Must include: {}", join=", "),
+                ],
+                sep="\n",
+                template="\n\n{}",
+            ),
+            Field("negative_constraints", "\n\nDo not: {}", join=", "),
+        ]
+    )
+
+
+class LlamaAdapter(SpecAdapter):
     """Meta LLaMA 3 adapter."""
 
     model_name = "llama-3"
-
-    def compile(self, p: TextPrompt) -> str:
-        # Llama works best with clear instruction format
-        instruction = f"[INST] {p.goal}\n\n"
-        instruction += f"Topic: {p.subject}\n"
-
-        if p.task_type:
-            instruction += f"Task: {p.task_type}\n"
-        if p.context:
-            instruction += f"Background: {p.context}\n"
-
-        instruction += "\n"
-
-        if p.style or p.tone or p.format:
-            instruction += "Guidelines:\n"
-            if p.style:
-                instruction += f"- Use {p.style} style\n"
-            if p.tone:
-                instruction += f"- Maintain {p.tone} tone\n"
-            if p.format:
-                instruction += f"- Output in {p.format} format\n"
-            if p.length:
-                instruction += f"- Keep it {p.length}\n"
-
-        if p.constraints:
-            instruction += f"\nMust include: {', '.join(p.constraints)}\n"
-
-        if p.negative_constraints:
-            instruction += f"Avoid: {', '.join(p.negative_constraints)}\n"
-
-        instruction += " [/INST]"
-
-        return instruction
-
-
-class MistralAdapter:
+    modality = "text"
+    max_prompt_tokens = 8192
+
+    # Llama works best with clear instruction format
+    spec = Spec(
+        [
+            Line("[INST] {goal}\n\n"),
+            Line("Topic: {subject}\n"),
+            Field("task_type", "Task: {}\n"),
+            Field("context", "Background: {}\n"),
+            Line("\n"),
+            Group(
+                [
+                    Field("style", "- Use {} style\n"),
+                    Field("tone", "- Maintain {} tone\n"),
+                    Field("format", "- Output in {} format\n"),
+                    Field("length", "- Keep it {}\n"),
+                ],
+                sep="",
+                template="Guidelines:\n{}",
+                when_any=("style", "tone", "format"),
+            ),
+            Field("constraints", "\nMust include: {}\n", join=", "),
+            Field("negative_constraints", "Avoid: {}\n", join=", "),
+            Line(" [/INST]"),
+        ]
+    )
+
+
+class MistralAdapter(SpecAdapter):
     """Mistral AI Mistral / Mixtral adapter."""
 
     model_name = "mistral"
-
-    def compile(self, p: TextPrompt) -> str:
-        # Mistral prefers concise, direct prompts
-        prompt_parts = []
-
-        # Core task
-        if p.task_type:
-            prompt_parts.append(f"{p.task_type.title()}: {p.goal}")
-        else:
-            prompt_parts.append(p.goal)
-
-        prompt_parts.append(f"\nTopic: {p.subject}")
-
-        if p.context:
-            prompt_parts.append(f"\n{p.context}")
-
-        # Specifications in compact format
-        specs = []
-        if p.style:
-            specs.append(f"style={p.style}")
-        if p.tone:
-            specs.append(f"tone={p.tone}")
-        if p.format:
-            specs.append(f"format={p.format}")
-        if p.length:
-            specs.append(f"length={p.length}")
-
-        if specs:
-            prompt_parts.append(f"\n[{', '.join(specs)}]")
-
-        if p.constraints:
-            prompt_parts.append(f"\nInclude: {'; '.join(p.constraints)}")
-
-        if p.negative_constraints:
-            prompt_parts.append(f"\nExclude: {'; '.join(p.negative_constraints)}")
-
-        return "".join(prompt_parts)
-
-
-class GeminiAdapter:
+    modality = "text"
+    max_prompt_tokens = 32768
+
+    # Mistral prefers concise, direct prompts
+    spec = Spec(
+        [
+            FirstOf(
+                Line(
+                    "{task_type}: {goal}",
+                    when="task_type",
+                    transforms={"task_type": str.title},
+                ),
+                Line("{goal}"),
+            ),
+            Line("\nTopic: {subject}"),
+            Field("context", "\n{}"),
+            # Specifications in compact format
+            Group(
+                [
+                    Field("style", "style={}"),
+                    Field("tone", "tone={}"),
+                    Field("format", "format={}"),
+                    Field("length", "length={}"),
+                ],
+                sep=", ",
+                template="\n[{}]",
+            ),
+            Field("constraints", "\nInclude: {}", join="; "),
+            Field("negative_constraints", "\nExclude: {}", join="; "),
+        ]
+    )
+
+
+class GeminiAdapter(SpecAdapter):
     """Google Gemini adapter."""
 
     model_name = "gemini"
-
-    def compile(self, p: TextPrompt) -> str:
-        parts = [f"## {p.goal}"]
-        parts.append(f"**Subject:** {p.subject}")
-
-        if p.task_type:
-            parts.append(f"**Task Type:** {p.task_type}")
-
-        if p.context:
-            parts.append(f"**Context:**\n{p.context}")
-
-        specifications = []
-        if p.style:
-            specifications.append(f"- Style: {p.style}")
-        if p.tone:
-            specifications.append(f"- Tone: {p.tone}")
-        if p.format:
-            specifications.append(f"- Format: {p.format}")
-        if p.length:
-            specifications.append(f"- Length: {p.length}")
-        if p.quality_level:
-            specifications.append(f"- Quality: {p.quality_level}")
-
-        if specifications:
-            parts.append("**Specifications:**")
-            parts.extend(specifications)
-
-        if p.constraints:
-            parts.append(f"**Requirements:** {', '.join(p.constraints)}")
-
-        if p.negative_constraints:
-            parts.append(f"**Exclude:** {', '.join(p.negative_constraints)}")
-
-        return "\n".join(parts)
-
-
-class ClaudeAdapter:
+    modality = "text"
+    max_prompt_tokens = 1048576
+
+    spec = Spec(
+        [
+            Line("## {goal}"),
+            Line("**Subject:** {subject}"),
+            Field("task_type", "**Task Type:** {}"),
+            Field("context", "**Context:**\n{}"),
+            Group(
+                [
+                    Field("style", "- Style: {}"),
+                    Field("tone", "- Tone: {}"),
+                    Field("format", "- Format: {}"),
+                    Field("length", "- Length: {}"),
+                    Field("quality_level", "- Quality: {}"),
+                ],
+                sep="\n",
+                template="**Specifications:**\n{}",
+            ),
+            Field("constraints", "**Requirements:** {}", join=", "),
+            Field("negative_constraints", "**Exclude:** {}", join=", "),
+        ],
+        sep="\n",
+    )
+
+
+class ClaudeAdapter(SpecAdapter):
     """Anthropic Claude adapter."""
 
     model_name = "claude"
-
-    def compile(self, p: TextPrompt) -> str:
-        parts = []
-
-        # Start with clear task description
-        if p.task_type:
-            parts.append(f"Task: {p.task_type}")
-
-        parts.append(f"Goal: {p.goal}")
-        parts.append(f"Subject: {p.subject}")
-
-        # Add context if provided
-        if p.context:
-            parts.append(f"Context: {p.context}")
-
-        # Add style and tone
-        if p.style:
-            parts.append(f"Style: {p.style}")
-        if p.tone:
-            parts.append(f"Tone: {p.tone}")
-
-        # Add constraints
-        if p.constraints:
-            parts.append(f"Requirements: {', '.join(p.constraints)}")
-
-        # Add format and length
-        if p.format:
-            parts.append(f"Output format: {p.format}")
-        if p.length:
-            parts.append(f"Length: {p.length}")
-
-        # Add quality level
-        if p.quality_level:
-            parts.append(f"Quality: {p.quality_level}")
-
-        # Add negative constraints
-        if p.negative_constraints:
-            parts.append(f"Avoid: {', '.join(p.negative_constraints)}")
-
-        return "\n".join(parts)
+    modality = "text"
+    max_prompt_tokens = 200000
+
+    spec = Spec(
+        [
+            # Start with clear task description
+            Field("task_type", "Task: {}"),
+            Line("Goal: {goal}"),
+            Line("Subject: {subject}"),
+            Field("context", "Context: {}"),
+            Field("style", "Style: {}"),
+            Field("tone", "Tone: {}"),
+            Field("constraints", "Requirements: {}", join=", "),
+            Field("format", "Output format: {}"),
+            Field("length", "Length: {}"),
+            Field("quality_level", "Quality: {}"),
+            Field("negative_constraints", "Avoid: {}", join=", "),
+        ],
+        sep="\n",
+    )
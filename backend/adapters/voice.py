@@ -1,194 +1,149 @@
 """Voice synthesis adapters for different AI models."""
 
-from schema import VoicePrompt
+from adapters.render import Field, FirstOf, Group, Line, Spec, SpecAdapter
 
 
-class OpenAIVoiceAdapter:
+class OpenAIVoiceAdapter(SpecAdapter):
     """OpenAI Voice adapter - natural language descriptions."""
 
     model_name = "openai-voice"
-
-    def compile(self, p: VoicePrompt) -> str:
-        parts = []
-
-        if p.emotion:
-            if p.voice_gender:
-                parts.append(f"Use a {p.emotion} {p.voice_gender} voice")
-            else:
-                parts.append(f"Use a {p.emotion} voice")
-        elif p.voice_gender:
-            parts.append(f"Use a {p.voice_gender} voice")
-
-        if p.accent:
-            parts.append(f"with a {p.accent} accent")
-
-        if p.pace:
-            parts.append(f"Pace: {p.pace}")
-
-        if p.use_case:
-            parts.append(f"Purpose: {p.use_case}")
-
-        if p.age_range:
-            parts.append(f"Age range: {p.age_range}")
-
-        return ". ".join(parts) + "." if parts else "Generate natural voice."
-
-
-class ElevenLabsAdapter:
+    modality = "voice"
+
+    spec = Spec(
+        [
+            FirstOf(
+                Line("Use a {emotion} {voice_gender} voice", when=("emotion", "voice_gender")),
+                Field("emotion", "Use a {} voice"),
+                Field("voice_gender", "Use a {} voice"),
+            ),
+            Field("accent", "with a {} accent"),
+            Field("pace", "Pace: {}"),
+            Field("use_case", "Purpose: {}"),
+            Field("age_range", "Age range: {}"),
+        ],
+        sep=". ",
+        suffix=".",
+        empty="Generate natural voice.",
+    )
+
+
+class ElevenLabsAdapter(SpecAdapter):
     """ElevenLabs adapter - structured parameter format."""
 
     model_name = "elevenlabs"
-
-    def compile(self, p: VoicePrompt) -> str:
-        lines = []
-
-        if p.voice_gender:
-            lines.append(f"Voice: {p.voice_gender}")
-
-        if p.accent:
-            lines.append(f"Accent: {p.accent}")
-
-        if p.emotion:
-            lines.append(f"Emotion: {p.emotion}")
-
-        if p.pace:
-            lines.append(f"Pace: {p.pace}")
-
-        if p.age_range:
-            lines.append(f"Age: {p.age_range}")
-
-        # ElevenLabs-specific parameters
-        lines.append("Stability: 70%")
-        lines.append("Clarity: High")
-
-        return "\n".join(lines)
-
-
-class PlayHTAdapter:
+    modality = "voice"
+
+    spec = Spec(
+        [
+            Field("voice_gender", "Voice: {}"),
+            Field("accent", "Accent: {}"),
+            Field("emotion", "Emotion: {}"),
+            Field("pace", "Pace: {}"),
+            Field("age_range", "Age: {}"),
+            # ElevenLabs-specific parameters
+            Line("Stability: 70%"),
+            Line("Clarity: High"),
+        ],
+        sep="\n",
+    )
+
+
+class PlayHTAdapter(SpecAdapter):
     """Play.ht adapter - AI voice generation platform."""
 
     model_name = "playht"
-
-    def compile(self, p: VoicePrompt) -> str:
-        parts = []
-
-        characteristics = []
-        if p.voice_gender:
-            characteristics.append(p.voice_gender)
-        if p.age_range:
-            characteristics.append(p.age_range)
-        if p.accent:
-            characteristics.append(f"{p.accent} accent")
-
-        if characteristics:
-            parts.append(f"Voice: {', '.join(characteristics)}")
-
-        if p.emotion:
-            parts.append(f"Emotional tone: {p.emotion}")
-
-        if p.pace:
-            parts.append(f"Speaking pace: {p.pace}")
-
-        if p.use_case:
-            parts.append(f"Use case: {p.use_case}")
-
-        if p.style:
-            parts.append(f"Style: {p.style}")
-
-        return " | ".join(parts) if parts else "Generate natural voice"
-
-
-class AzureVoiceAdapter:
+    modality = "voice"
+
+    spec = Spec(
+        [
+            Group(
+                [
+                    Field("voice_gender"),
+                    Field("age_range"),
+                    Field("accent", "{} accent"),
+                ],
+                sep=", ",
+                template="Voice: {}",
+            ),
+            Field("emotion", "Emotional tone: {}"),
+            Field("pace", "Speaking pace: {}"),
+            Field("use_case", "Use case: {}"),
+            Field("style", "Style: {}"),
+        ],
+        sep=" | ",
+        empty="Generate natural voice",
+    )
+
+
+class AzureVoiceAdapter(SpecAdapter):
     """Azure Speech Services adapter - Microsoft's TTS platform."""
 
     model_name = "azure-voice"
-
-    def compile(self, p: VoicePrompt) -> str:
-        prompt = "Voice characteristics: "
-
-        specs = []
-        if p.voice_gender:
-            specs.append(f"gender={p.voice_gender}")
-        if p.age_range:
-            specs.append(f"age={p.age_range}")
-        if p.accent:
-            specs.append(f"locale={p.accent}")
-        if p.emotion:
-            specs.append(f"style={p.emotion}")
-        if p.pace:
-            specs.append(f"rate={p.pace}")
-
-        prompt += ", ".join(specs) if specs else "natural"
-
-        if p.use_case:
-            prompt += f" | Purpose: {p.use_case}"
-
-        return prompt
-
-
-class MurfAIAdapter:
+    modality = "voice"
+
+    spec = Spec(
+        [
+            Line("Voice characteristics: "),
+            FirstOf(
+                Group(
+                    [
+                        Field("voice_gender", "gender={}"),
+                        Field("age_range", "age={}"),
+                        Field("accent", "locale={}"),
+                        Field("emotion", "style={}"),
+                        Field("pace", "rate={}"),
+                    ],
+                    sep=", ",
+                ),
+                Line("natural"),
+            ),
+            Field("use_case", " | Purpose: {}"),
+        ]
+    )
+
+
+class MurfAIAdapter(SpecAdapter):
     """Murf.AI adapter - professional voiceover platform."""
 
     model_name = "murfai"
-
-    def compile(self, p: VoicePrompt) -> str:
-        parts = ["Professional voiceover"]
-
-        if p.voice_gender:
-            parts.append(f"{p.voice_gender} voice")
-
-        if p.age_range:
-            parts.append(f"age {p.age_range}")
-
-        if p.accent:
-            parts.append(f"with {p.accent} accent")
-
-        if p.emotion:
-            parts.append(f"expressing {p.emotion}")
-
-        if p.pace:
-            parts.append(f"at {p.pace} pace")
-
-        if p.use_case:
-            parts.append(f"for {p.use_case}")
-
-        return ", ".join(parts) + "."
-
-
-class WellSaidAdapter:
+    modality = "voice"
+
+    spec = Spec(
+        [
+            Line("Professional voiceover"),
+            Field("voice_gender", "{} voice"),
+            Field("age_range", "age {}"),
+            Field("accent", "with {} accent"),
+            Field("emotion", "expressing {}"),
+            Field("pace", "at {} pace"),
+            Field("use_case", "for {}"),
+        ],
+        sep=", ",
+        suffix=".",
+    )
+
+
+class WellSaidAdapter(SpecAdapter):
     """WellSaid Labs adapter - enterprise voice synthesis."""
 
     model_name = "wellsaid"
-
-    def compile(self, p: VoicePrompt) -> str:
-        lines = []
-
-        # Create voice profile description
-        profile = []
-        if p.voice_gender:
-            profile.append(p.voice_gender)
-        if p.age_range:
-            profile.append(f"aged {p.age_range}")
-
-        if profile:
-            lines.append(f"Voice Profile: {' '.join(profile)}")
-
-        if p.accent:
-            lines.append(f"Accent: {p.accent}")
-
-        if p.emotion:
-            lines.append(f"Emotional delivery: {p.emotion}")
-
-        if p.pace:
-            lines.append(f"Delivery pace: {p.pace}")
-
-        if p.style:
-            lines.append(f"Speaking style: {p.style}")
-
-        if p.use_case:
-            lines.append(f"Application: {p.use_case}")
-
-        # WellSaid-specific quality settings
-        lines.append("Audio quality: Studio")
-
-        return "\n".join(lines)
+    modality = "voice"
+
+    spec = Spec(
+        [
+            # Create voice profile description
+            Group(
+                [Field("voice_gender"), Field("age_range", "aged {}")],
+                sep=" ",
+                template="Voice Profile: {}",
+            ),
+            Field("accent", "Accent: {}"),
+            Field("emotion", "Emotional delivery: {}"),
+            Field("pace", "Delivery pace: {}"),
+            Field("style", "Speaking style: {}"),
+            Field("use_case", "Application: {}"),
+            # WellSaid-specific quality settings
+            Line("Audio quality: Studio"),
+        ],
+        sep="\n",
+    )
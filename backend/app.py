@@ -1,158 +1,385 @@
 import os
 import logging
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from compiler import PromptCompiler
-from schema import ImagePrompt, VideoPrompt, VoicePrompt, TextPrompt
-from registry import get_available_models_by_modality
-from rate_limiter import rate_limit, sanitize_payload
+from jsoncodec import BACKEND as JSON_BACKEND, FastJSONProvider
+from registry import MODALITY_MODELS
+from rate_limiter import rate_limit, rate_limiter_stats
+from service import (
+    BATCH_RATE_LIMIT,
+    MODELS_BODY,
+    MODELS_CACHE_CONTROL,
+    MODELS_ETAG,
+    RATE_LIMIT,
+    SESSION_RATE_LIMIT,
+    compile_all_request,
+    compile_cache,
+    compile_request,
+    create_session_request,
+    delete_session_request,
+    etag_matches,
+    prepare_compile_all,
+    prepare_variants,
+    prompt_store,
+    stream_batch,
+    stream_compile_all,
+    session_store,
+    stream_variants,
+    target_models,
+    tier_limits,
+    update_session_request,
+)
+from variants import VariantSpace
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
-        logging.FileHandler("prompt_generator.log"),
+        # Opened on the first log record rather than at import
+        logging.FileHandler("prompt_generator.log", delay=True),
         logging.StreamHandler(),
     ],
 )
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Configure CORS - restrict in production
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 CORS(app, origins=allowed_origins)
 
-compiler = PromptCompiler()
-
-# Input validation limits
-MAX_TEXT_LENGTH = 2000
-MAX_DURATION_SECONDS = 60
+# Batches are charged one BATCH_RATE_LIMIT slot per item, so a batch can
+# never be larger than that budget
+MAX_BATCH_SIZE = min(int(os.getenv("MAX_BATCH_SIZE", 100)), BATCH_RATE_LIMIT)
 
+# Streamed batches hold no results in memory, so they may be larger, up to
+# the whole batch budget (raise BATCH_RATE_LIMIT for larger streams)
+MAX_STREAM_BATCH_SIZE = min(
+    int(os.getenv("MAX_STREAM_BATCH_SIZE", BATCH_RATE_LIMIT)), BATCH_RATE_LIMIT
+)
 
-def validate_request_data(data):
-    """Validate incoming request data."""
-    if not data:
-        return "Request body is required", 400
+# Variants per /generate/variants request. Each is compiled for every target
+# model and costs one BATCH_RATE_LIMIT slot per prompt, so variants times
+# models is capped at that budget too
+MAX_VARIANTS = min(int(os.getenv("MAX_VARIANTS", BATCH_RATE_LIMIT)), BATCH_RATE_LIMIT)
 
-    modality = data.get("modality")
-    model = data.get("model")
-    payload = data.get("payload")
+NDJSON_MIMETYPE = "application/x-ndjson"
 
-    if not modality:
-        return "Missing required field: modality", 400
 
-    if modality not in ["text", "image", "video", "audio"]:
-        return f"Invalid modality: {modality}. Must be one of: text, image, video, audio", 400
+@app.route("/health", methods=["GET"])
+def health_check():
+    """Health check endpoint."""
+    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
 
-    if not model:
-        return "Missing required field: model", 400
 
-    available_models = get_available_models_by_modality()
-    if model not in available_models.get(modality, []):
-        return (
-            f"Invalid model '{model}' for modality '{modality}'. "
-            f"Available models: {', '.join(available_models[modality])}",
-            400,
-        )
+@app.route("/models", methods=["GET"])
+def get_models():
+    """Get available models grouped by modality, revalidated by ETag."""
+    headers = {"ETag": MODELS_ETAG, "Cache-Control": MODELS_CACHE_CONTROL}
+    if etag_matches(request.headers.get("If-None-Match"), MODELS_ETAG):
+        return Response(status=304, headers=headers)
+    return Response(MODELS_BODY, mimetype="application/json", headers=headers)
+
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Get compile cache counters and rate limiter gauges."""
+    cache_stats = compile_cache.stats() if compile_cache is not None else None
+    return jsonify(
+        {
+            "compile_cache": cache_stats,
+            "prompt_store": prompt_store.stats() if prompt_store is not None else None,
+            "rate_limiter": rate_limiter_stats(),
+            "sessions": session_store.stats(),
+            "json_backend": JSON_BACKEND,
+        }
+    )
+
+
+def wants_stream():
+    """Whether the client asked for NDJSON (?stream=1 or Accept: application/x-ndjson)."""
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+    return (
+        request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        == NDJSON_MIMETYPE
+    )
+
+
+def ndjson_response(lines):
+    """
+    Stream NDJSON lines to the client as they are produced.
+
+    The line generators only use data already read from the request, so
+    they run without the request context.
+    """
+    return Response(lines, mimetype=NDJSON_MIMETYPE)
+
+
+def fan_out_cost():
+    """Rate limit cost of a fan-out request: one slot per target model."""
+    data = request.get_json(silent=True)
+    modality = data.get("modality") if isinstance(data, dict) else None
+    if not isinstance(modality, str):
+        return 1
+    return max(1, len(MODALITY_MODELS.get(modality, ())))
+
+
+def batch_cost():
+    """Rate limit cost of a batch request: one slot per item."""
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else None
+    return max(1, len(items)) if isinstance(items, list) else 1
+
+
+def variant_cost():
+    """
+    Rate limit cost of a variant request: one slot per prompt it compiles.
+
+    Requests over MAX_VARIANTS, or over BATCH_RATE_LIMIT prompts, compile
+    nothing, so like other invalid requests they cost one slot and get the
+    validation error.
+    """
+    data = request.get_json(silent=True)
+    vary = data.get("vary") if isinstance(data, dict) else None
+    if not isinstance(vary, dict):
+        return 1
+    space = VariantSpace([(field, values) for field, values in vary.items() if values])
+    limit, sample = data.get("limit"), data.get("sample")
+    count = space.count(
+        limit if isinstance(limit, int) else None, sample if isinstance(sample, int) else None
+    )
+    if count > MAX_VARIANTS:
+        return 1
+    models = target_models(data) if isinstance(data.get("modality"), str) else None
+    prompts = count * len(models or ())
+    return 1 if prompts > BATCH_RATE_LIMIT else max(1, prompts)
+
+
+def models_cost():
+    """Rate limit cost of a multi-model request: one slot per target model."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("modality"), str):
+        return 1
+    return max(1, len(target_models(data) or ()))
 
-    if not payload:
-        return "Missing required field: payload", 400
 
-    if not isinstance(payload, dict):
-        return "Payload must be a dictionary", 400
+@app.route("/generate", methods=["POST"])
+@rate_limit(
+    max_requests=RATE_LIMIT,
+    window_seconds=60,
+    scope="generate",
+    tiers=tier_limits(RATE_LIMIT),
+)
+def generate_prompt():
+    """Generate optimized prompt for specified model."""
+    try:
+        data = request.json
 
-    # Validate text field lengths
-    for key, value in payload.items():
-        if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
-            return f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}", 400
+        if isinstance(data, dict):
+            logger.info(
+                f"Generating prompt for modality={data.get('modality')}, "
+                f"model={data.get('model')}"
+            )
 
-    # Validate duration for video
-    if modality == "video" and "duration_seconds" in payload:
-        duration = payload.get("duration_seconds")
-        try:
-            duration = int(duration)
-            if duration < 1 or duration > MAX_DURATION_SECONDS:
-                return (
-                    f"duration_seconds must be between 1 and {MAX_DURATION_SECONDS}",
-                    400,
-                )
-        except (ValueError, TypeError):
-            return "duration_seconds must be a valid integer", 400
+        body, status_code = compile_request(data)
+        if status_code != 200:
+            logger.warning(f"Validation error: {body['error']}")
+            return jsonify(body), status_code
 
-    return None
+        logger.info(f"Successfully generated prompt for {body['model']}")
+        return jsonify(body)
 
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
 
-@app.route("/health", methods=["GET"])
-def health_check():
-    """Health check endpoint."""
-    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
 
+@app.route("/generate/batch", methods=["POST"])
+@rate_limit(
+    max_requests=BATCH_RATE_LIMIT,
+    window_seconds=60,
+    cost=batch_cost,
+    scope="batch",
+    tiers=tier_limits(BATCH_RATE_LIMIT),
+)
+def generate_batch():
+    """
+    Generate prompts for many requests in one call, preserving order.
 
-@app.route("/models", methods=["GET"])
-def get_models():
-    """Get available models grouped by modality."""
+    With streaming requested, results are sent as NDJSON lines while the
+    batch compiles (see service.stream_batch).
+    """
     try:
-        models = get_available_models_by_modality()
-        return jsonify({"models": models})
+        data = request.json
+        items = data.get("items") if isinstance(data, dict) else None
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Field 'items' must be a non-empty list"}), 400
+
+        stream = wants_stream()
+        max_size = MAX_STREAM_BATCH_SIZE if stream else MAX_BATCH_SIZE
+        if len(items) > max_size:
+            return (
+                jsonify({"error": f"Batch exceeds maximum size of {max_size} items"}),
+                400,
+            )
+
+        if stream:
+            return ndjson_response(stream_batch(items))
+
+        results = []
+        errors = 0
+        for item in items:
+            body, status_code = compile_request(item)
+            if status_code != 200:
+                errors += 1
+            results.append(body)
+
+        logger.info(f"Generated batch of {len(items)} prompts ({errors} errors)")
+        return jsonify({"results": results, "count": len(results), "errors": errors})
+
     except Exception as e:
-        logger.error(f"Error fetching models: {str(e)}")
-        return jsonify({"error": "Failed to fetch models"}), 500
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route("/generate", methods=["POST"])
-@rate_limit(max_requests=int(os.getenv("RATE_LIMIT", 60)), window_seconds=60)
-def generate_prompt():
-    """Generate optimized prompt for specified model."""
+@app.route("/generate/all", methods=["POST"])
+@rate_limit(
+    max_requests=BATCH_RATE_LIMIT,
+    window_seconds=60,
+    cost=fan_out_cost,
+    scope="batch",
+    tiers=tier_limits(BATCH_RATE_LIMIT),
+)
+def generate_all():
+    """
+    Generate prompts for every model of a modality from one payload.
+
+    With streaming requested, each model's prompt is sent as an NDJSON line
+    once compiled (see service.stream_compile_all).
+    """
     try:
         data = request.json
 
-        # Validate request
-        validation_error = validate_request_data(data)
-        if validation_error:
-            error_msg, status_code = validation_error
-            logger.warning(f"Validation error: {error_msg}")
-            return jsonify({"error": error_msg}), status_code
-
-        modality = data["modality"]
-        model = data["model"]
-        payload = data["payload"]
-
-        # Sanitize payload to prevent injection
-        payload = sanitize_payload(payload, MAX_TEXT_LENGTH)
-
-        logger.info(f"Generating prompt for modality={modality}, model={model}")
-
-        # Create appropriate prompt object
-        try:
-            if modality == "text":
-                prompt = TextPrompt(**payload)
-            elif modality == "image":
-                prompt = ImagePrompt(**payload)
-            elif modality == "video":
-                prompt = VideoPrompt(**payload)
-            elif modality == "audio":
-                prompt = VoicePrompt(**payload)
-        except TypeError as e:
-            logger.error(f"Invalid payload structure: {str(e)}")
-            return jsonify({"error": f"Invalid payload: {str(e)}"}), 400
-
-        # Compile prompt
-        result = compiler.compile(prompt, model)
-
-        logger.info(f"Successfully generated prompt for {model}")
-        return jsonify({"prompt": result, "model": model, "modality": modality})
-
-    except ValueError as e:
-        logger.error(f"Value error: {str(e)}")
-        return jsonify({"error": str(e)}), 400
+        if wants_stream():
+            prompt, error = prepare_compile_all(data)
+            if error:
+                body, status_code = error
+                logger.warning(f"Validation error: {body['error']}")
+                return jsonify(body), status_code
+            return ndjson_response(stream_compile_all(prompt, data["modality"]))
+
+        body, status_code = compile_all_request(data)
+        if status_code != 200:
+            logger.warning(f"Validation error: {body['error']}")
+            return jsonify(body), status_code
+
+        logger.info(
+            f"Generated {len(body['prompts'])} prompts for modality={body['modality']}"
+        )
+        return jsonify(body)
+
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.route("/generate/variants", methods=["POST"])
+@rate_limit(
+    max_requests=BATCH_RATE_LIMIT,
+    window_seconds=60,
+    cost=variant_cost,
+    scope="batch",
+    tiers=tier_limits(BATCH_RATE_LIMIT),
+)
+def generate_variants():
+    """
+    Generate prompts for every combination of per-field values (an A/B
+    matrix), streamed as NDJSON lines while the variants compile (see
+    service.stream_variants).
+    """
+    try:
+        variants, error = prepare_variants(request.json, MAX_VARIANTS, BATCH_RATE_LIMIT)
+        if error:
+            body, status_code = error
+            logger.warning(f"Validation error: {body['error']}")
+            return jsonify(body), status_code
+
+        logger.info(
+            f"Generating {variants.space.count(variants.limit, variants.sample)} variants "
+            f"for modality={variants.modality}, models={','.join(variants.models)}"
+        )
+        return ndjson_response(stream_variants(variants))
+
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
 
 
+@app.route("/sessions", methods=["POST"])
+@rate_limit(
+    max_requests=BATCH_RATE_LIMIT,
+    window_seconds=60,
+    cost=models_cost,
+    scope="batch",
+    tiers=tier_limits(BATCH_RATE_LIMIT),
+)
+def create_session():
+    """
+    Open a live-preview session: compile a payload for one or more models
+    and keep it for incremental updates.
+    """
+    try:
+        body, status_code = create_session_request(request.json)
+        if status_code != 201:
+            logger.warning(f"Validation error: {body['error']}")
+        return jsonify(body), status_code
+
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.route("/sessions/<session_id>", methods=["PATCH"])
+@rate_limit(
+    max_requests=SESSION_RATE_LIMIT,
+    window_seconds=60,
+    scope="sessions",
+    tiers=tier_limits(SESSION_RATE_LIMIT),
+)
+def update_session(session_id):
+    """Apply field changes to a session, re-rendering only what they affect."""
+    try:
+        body, status_code = update_session_request(session_id, request.json)
+        if status_code != 200:
+            logger.warning(f"Session update error: {body['error']}")
+        return jsonify(body), status_code
+
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+@rate_limit(
+    max_requests=SESSION_RATE_LIMIT,
+    window_seconds=60,
+    scope="sessions",
+    tiers=tier_limits(SESSION_RATE_LIMIT),
+)
+def delete_session(session_id):
+    """Close a session."""
+    body, status_code = delete_session_request(session_id)
+    if status_code == 204:
+        return "", 204
+    logger.warning(f"Session delete error: {body['error']}")
+    return jsonify(body), status_code
+
+
 @app.errorhandler(404)
 def not_found(e):
     """Handle 404 errors."""
@@ -0,0 +1,535 @@
+"""
+ASGI app serving the prompt API (/health, /models, /generate) and the
+live-preview WebSocket (/live).
+
+Runs under an async server, so a slow client holds a coroutine rather than
+a whole worker while its request trickles in:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Validation, compilation and rate limiting are shared with the Flask app
+through service.py and rate_limiter.py, so both modes honour the same
+contract.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from jsoncodec import dumps, loads
+from rate_limiter import get_rate_limiter, resolve_client
+from service import (
+    MODELS_BODY,
+    MODELS_CACHE_CONTROL,
+    MODELS_ETAG,
+    RATE_LIMIT,
+    compile_request,
+    etag_matches,
+    open_session,
+    session_changes,
+    tier_limits,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Configure CORS - restrict in production
+allowed_origins = set(os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(","))
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", 1024 * 1024))
+
+# Threads for compile work; 0 compiles inline on the event loop, which is
+# fastest while compiles stay in the microsecond range
+COMPILE_WORKERS = int(os.getenv("ASGI_COMPILE_WORKERS", 0))
+
+GENERATE_TIERS = tier_limits(RATE_LIMIT)
+
+# Live preview: WebSocket connections per minute per client (one charge per
+# connection, however many updates it carries), and the most compiled
+# updates pushed per connection per second (edits in between coalesce;
+# 0 pushes each update as soon as the previous one has been sent)
+LIVE_RATE_LIMIT = int(os.getenv("LIVE_RATE_LIMIT", 30))
+LIVE_MAX_UPDATES_PER_SECOND = float(os.getenv("LIVE_MAX_UPDATES_PER_SECOND", 20))
+
+LIVE_TIERS = tier_limits(LIVE_RATE_LIMIT)
+
+_executor = None
+if COMPILE_WORKERS > 0:
+    _executor = ThreadPoolExecutor(COMPILE_WORKERS, thread_name_prefix="compile")
+
+
+async def run_compile(fn, *args):
+    """Run compile work inline, or on the compile threads when configured."""
+    if _executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+class BodyTooLarge(Exception):
+    """Request body exceeded MAX_BODY_BYTES."""
+
+
+class ClientDisconnected(Exception):
+    """Client went away before the request body was complete."""
+
+
+async def read_body(receive):
+    """Read the full request body, enforcing MAX_BODY_BYTES."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def send_json(send, status, body, headers=()):
+    """Send a complete JSON response; bytes bodies are sent as already encoded."""
+    if status == 304:
+        # Not Modified carries no body
+        await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    data = body if isinstance(body, bytes) else dumps(body)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(data)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": data})
+
+
+def rate_limit_headers(decision, limited=False):
+    """Rate limit headers for a decision, matching the Flask decorator."""
+    headers = [
+        (b"x-ratelimit-limit", str(decision.limit).encode()),
+        (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+    ]
+    if limited:
+        headers.append((b"x-ratelimit-reset", str(decision.reset).encode()))
+        headers.append((b"retry-after", str(decision.reset).encode()))
+    return headers
+
+
+async def health_check(scope, headers, receive):
+    """Health check endpoint."""
+    return 200, {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}, []
+
+
+async def get_models(scope, headers, receive):
+    """Get available models grouped by modality, revalidated by ETag."""
+    cache_headers = [
+        (b"etag", MODELS_ETAG.encode()),
+        (b"cache-control", MODELS_CACHE_CONTROL.encode()),
+    ]
+    if etag_matches(headers.get("if-none-match"), MODELS_ETAG):
+        return 304, b"", cache_headers
+    return 200, MODELS_BODY, cache_headers
+
+
+async def generate_prompt(scope, headers, receive):
+    """Generate optimized prompt for specified model."""
+    client = scope.get("client")
+    tier, client_id = resolve_client(
+        headers.get("x-api-key"),
+        headers.get("x-forwarded-for"),
+        client[0] if client else None,
+    )
+    limiter = get_rate_limiter(
+        GENERATE_TIERS.get(tier, RATE_LIMIT), 60, "generate", tier
+    )
+
+    decision = limiter.check(client_id)
+    if not decision.allowed:
+        return (
+            429,
+            {
+                "error": "Rate limit exceeded",
+                "message": f"Too many requests. Please try again in {decision.reset} seconds.",
+            },
+            rate_limit_headers(decision, limited=True),
+        )
+
+    try:
+        data = loads(await read_body(receive) or b"null")
+    except BodyTooLarge:
+        return 413, {"error": "Request body too large"}, rate_limit_headers(decision)
+    except ValueError:
+        return (
+            400,
+            {"error": "Request body must be valid JSON"},
+            rate_limit_headers(decision),
+        )
+
+    if isinstance(data, dict):
+        logger.info(
+            f"Generating prompt for modality={data.get('modality')}, "
+            f"model={data.get('model')}"
+        )
+
+    body, status_code = await run_compile(compile_request, data)
+
+    if status_code != 200:
+        logger.warning(f"Validation error: {body['error']}")
+    else:
+        logger.info(f"Successfully generated prompt for {body['model']}")
+    return status_code, body, rate_limit_headers(decision)
+
+
+class LiveConnection:
+    """
+    State of one live-preview WebSocket: its compile session and what is
+    waiting to be pushed to the client.
+
+    Incoming changes are validated as they arrive and merged into one
+    pending update; a payload only replaces the latest one waiting to be
+    opened. A single pusher opens whatever payload is waiting, then
+    compiles whatever is pending, once per push, waiting for each send to
+    complete before the next. A client typing faster than it reads (or
+    than LIVE_MAX_UPDATES_PER_SECOND) therefore gets fewer, coalesced
+    updates rather than a growing queue. Every payload after the first is
+    charged to the connection's rate limiter.
+
+    Args:
+        send: ASGI send callable of the connection
+        limiter: Rate limiter charged for re-opened sessions
+        client_id: Key of the client in limiter
+    """
+
+    def __init__(self, send, limiter, client_id):
+        self.send = send
+        self.limiter = limiter
+        self.client_id = client_id
+        self.session = None
+        self.opens = 0
+        # Messages for the pusher: the latest payload to open and the raw
+        # changes received after it, the latest error, and the changes
+        # received since the last update
+        self.opening = None
+        self.deferred = {}
+        self.deferred_merged = 0
+        self.error = None
+        self.pending = {}
+        self.merged = 0
+        self.ready = asyncio.Event()
+
+    def receive(self, data):
+        """
+        Handle one client message: a payload opens (or replaces) the
+        session, {"changes": {...}} updates it.
+        """
+        if isinstance(data, dict) and "payload" in data:
+            self.opening = data
+            self.deferred = {}
+            self.deferred_merged = 0
+        elif self.opening is not None:
+            # Validated once the session they apply to is open
+            changes = data.get("changes") if isinstance(data, dict) else None
+            if not isinstance(changes, dict) or not changes:
+                self.fail({"error": "Field 'changes' must be a non-empty object"})
+                return
+            self.deferred.update(changes)
+            self.deferred_merged += 1
+        elif self.session is None:
+            self.fail({"error": "Send a payload to open the session before any changes"})
+            return
+        else:
+            changes, error = session_changes(self.session, data)
+            if error:
+                self.fail(error[0])
+                return
+            self.pending.update(changes)
+            self.merged += 1
+        self.ready.set()
+
+    def fail(self, body):
+        """Report an error to the client; only the latest one is kept."""
+        self.error = {"type": "error", **body}
+        self.ready.set()
+
+    async def open(self):
+        """
+        Open the waiting payload and apply the changes received after it;
+        on failure the previous session, if any, is kept and the changes
+        apply to it instead.
+        """
+        data, self.opening = self.opening, None
+        session, error = None, None
+        if self.opens:
+            decision = self.limiter.check(self.client_id)
+            if not decision.allowed:
+                error = {
+                    "error": "Rate limit exceeded",
+                    "message": f"Too many sessions. Please try again in {decision.reset} seconds.",
+                }
+        self.opens += 1
+        if error is None:
+            session, failure = await run_compile(open_session, data)
+            if failure:
+                error = failure[0]
+        if self.opening is not None:
+            return  # a newer payload replaced this one meanwhile
+
+        deferred, merged = self.deferred, self.deferred_merged
+        self.deferred = {}
+        self.deferred_merged = 0
+        if error:
+            await self.send_json({"type": "error", **error})
+        else:
+            self.session = session
+            self.pending = {}
+            self.merged = 0
+            await self.send_json(
+                {
+                    "type": "session",
+                    "version": session.version,
+                    "modality": session.modality,
+                    "prompts": dict(session.prompts),
+                }
+            )
+        if not deferred:
+            return
+        if self.session is None:
+            self.fail({"error": "Send a payload to open the session before any changes"})
+            return
+        changes, error = session_changes(self.session, {"changes": deferred})
+        if error:
+            self.fail(error[0])
+            return
+        self.pending.update(changes)
+        self.merged += merged
+
+    async def push(self):
+        """Send pending messages until cancelled, at most one update per interval."""
+        loop = asyncio.get_running_loop()
+        next_update = loop.time()
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+
+            if self.opening is not None:
+                await self.open()
+                if self.opening is not None:
+                    continue
+            if self.error is not None:
+                error, self.error = self.error, None
+                await self.send_json(error)
+            if not self.pending:
+                continue
+
+            # Wait out the interval, letting further changes coalesce
+            delay = next_update - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.opening is not None or not self.pending:
+                continue  # a new payload replaces the session first
+            session, changes, merged = self.session, self.pending, self.merged
+            self.pending = {}
+            self.merged = 0
+            try:
+                body = await run_compile(session.update, changes)
+            except TypeError as e:
+                await self.send_json({"type": "error", "error": f"Invalid payload: {str(e)}"})
+                continue
+            if LIVE_MAX_UPDATES_PER_SECOND > 0:
+                next_update = loop.time() + 1 / LIVE_MAX_UPDATES_PER_SECOND
+            await self.send_json({"type": "update", "merged": merged, **body})
+
+    async def send_json(self, body):
+        await self.send({"type": "websocket.send", "text": dumps(body).decode()})
+
+
+async def live_preview(scope, headers, receive, send):
+    """
+    Live-preview WebSocket: compile a payload, then push updated prompts
+    as the client sends field changes.
+
+    The rate limiter is charged when the connection opens and for every
+    session re-opened on it, not per change; within a connection, compile
+    work is bounded by coalescing.
+    """
+    if (await receive())["type"] != "websocket.connect":
+        return
+
+    origin = headers.get("origin")
+    if origin and origin not in allowed_origins:
+        await send({"type": "websocket.close", "code": 1008})
+        return
+
+    client = scope.get("client")
+    tier, client_id = resolve_client(
+        headers.get("x-api-key"),
+        headers.get("x-forwarded-for"),
+        client[0] if client else None,
+    )
+    limiter = get_rate_limiter(LIVE_TIERS.get(tier, LIVE_RATE_LIMIT), 60, "live", tier)
+    decision = limiter.check(client_id)
+    if not decision.allowed:
+        if "websocket.http.response" in scope.get("extensions", {}):
+            body = {
+                "error": "Rate limit exceeded",
+                "message": f"Too many connections. Please try again in {decision.reset} seconds.",
+            }
+            await send(
+                {
+                    "type": "websocket.http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        *rate_limit_headers(decision, limited=True),
+                    ],
+                }
+            )
+            await send({"type": "websocket.http.response.body", "body": dumps(body)})
+        else:
+            # Closing before accepting rejects the handshake (HTTP 403)
+            await send({"type": "websocket.close", "code": 1008})
+        return
+
+    await send({"type": "websocket.accept", "headers": rate_limit_headers(decision)})
+    connection = LiveConnection(send, limiter, client_id)
+    pusher = asyncio.ensure_future(connection.push())
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if pusher.done():
+                # The pusher failed (e.g. the client vanished mid-send)
+                pusher.result()
+
+            text = message.get("text")
+            raw = text.encode() if text is not None else message.get("bytes") or b""
+            if len(raw) > MAX_BODY_BYTES:
+                await send({"type": "websocket.close", "code": 1009})
+                return
+            try:
+                data = loads(raw)
+            except ValueError:
+                connection.fail({"error": "Messages must be valid JSON"})
+                continue
+            connection.receive(data)
+    finally:
+        pusher.cancel()
+
+
+ROUTES = {
+    "/health": {"GET": health_check},
+    "/models": {"GET": get_models},
+    "/generate": {"POST": generate_prompt},
+}
+
+WEBSOCKET_ROUTES = {
+    "/live": live_preview,
+}
+
+
+def cors_headers(headers, preflight=False):
+    """CORS headers for an allowed Origin, mirroring flask-cors defaults."""
+    origin = headers.get("origin")
+    if not origin or origin not in allowed_origins:
+        return []
+
+    result = [
+        (b"access-control-allow-origin", origin.encode()),
+        (b"vary", b"Origin"),
+    ]
+    if preflight:
+        result.append((b"access-control-allow-methods", b"GET, POST, OPTIONS"))
+        requested = headers.get("access-control-request-headers")
+        if requested:
+            result.append((b"access-control-allow-headers", requested.encode()))
+    return result
+
+
+async def lifespan(receive, send):
+    """Handle server startup and shutdown events."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] not in ("http", "websocket"):
+        return
+
+    headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in scope.get("headers", [])
+    }
+
+    if scope["type"] == "websocket":
+        handler = WEBSOCKET_ROUTES.get(scope["path"])
+        if handler is None:
+            await receive()
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        try:
+            await handler(scope, headers, receive, send)
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+            await send({"type": "websocket.close", "code": 1011})
+        return
+    methods = ROUTES.get(scope["path"])
+
+    if methods is None:
+        await send_json(send, 404, {"error": "Endpoint not found"}, cors_headers(headers))
+        return
+
+    if scope["method"] == "OPTIONS":
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 204,
+                "headers": cors_headers(headers, preflight=True),
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    handler = methods.get(scope["method"])
+    if handler is None:
+        await send_json(send, 405, {"error": "Method not allowed"}, cors_headers(headers))
+        return
+
+    try:
+        status, body, extra_headers = await handler(scope, headers, receive)
+    except ClientDisconnected:
+        return
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        status, body, extra_headers = 500, {"error": "Internal server error"}, []
+
+    await send_json(send, status, body, [*extra_headers, *cors_headers(headers)])
@@ -0,0 +1,81 @@
+"""
+Benchmark: ns/op for every registered adapter on a typical full payload.
+
+Usage:
+    cd backend
+    python benchmarks/bench_adapters.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry import ADAPTER_REGISTRY, get_available_models_by_modality  # noqa: E402
+from schema import PROMPT_TYPES  # noqa: E402
+
+PAYLOADS = {
+    "text": {
+        "goal": "Write a product announcement",
+        "subject": "a new ceramic mug line",
+        "style": "concise",
+        "constraints": ["mention dishwasher safe", "include price"],
+        "negative_constraints": ["jargon"],
+        "quality_level": "high",
+        "task_type": "marketing copy",
+        "tone": "friendly",
+        "format": "markdown",
+        "length": "short",
+        "context": "Launching next week in three colours.",
+    },
+    "image": {
+        "goal": "product shot",
+        "subject": "a ceramic mug on a wooden table",
+        "style": "photorealistic",
+        "negative_constraints": ["text", "watermark"],
+        "quality_level": "high",
+        "environment": "a sunlit kitchen",
+        "lighting": "soft window light",
+        "camera": "50mm, shallow depth of field",
+        "mood": "calm",
+        "aspect_ratio": "4:3",
+    },
+    "video": {
+        "goal": "establishing shot",
+        "subject": "city",
+        "style": "cinematic",
+        "negative_constraints": ["flicker"],
+        "scene": "a busy street at night",
+        "action": "people walking with umbrellas",
+        "camera_motion": "slowly pans left",
+        "lighting": "neon reflections",
+        "duration_seconds": 10,
+        "realism_level": "photoreal",
+    },
+    "audio": {
+        "goal": "podcast intro",
+        "subject": "welcome message",
+        "style": "conversational",
+        "voice_gender": "female",
+        "age_range": "30-40",
+        "accent": "British",
+        "emotion": "warm",
+        "pace": "medium",
+        "use_case": "podcast",
+    },
+}
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for modality, models in get_available_models_by_modality().items():
+        prompt = PROMPT_TYPES[modality](modality=modality, **PAYLOADS[modality])
+        for model in models:
+            compile_prompt = ADAPTER_REGISTRY[model].compile
+            best = min(timeit.repeat(lambda: compile_prompt(prompt), number=number, repeat=3))
+            print(f"{modality:<6} {model:<24} {best / number * 1e9:8.0f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
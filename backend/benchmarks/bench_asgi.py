@@ -0,0 +1,156 @@
+"""
+Load test: p50/p99 /generate latency for gunicorn sync workers versus the
+ASGI app under uvicorn, while slow clients hold connections open.
+
+Requires gunicorn and uvicorn.
+
+Usage:
+    cd backend
+    python benchmarks/bench_asgi.py [workers] [fast_clients] [slow_clients]
+"""
+
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUESTS_PER_CLIENT = 50
+SLOW_CLIENT_SECONDS = 10
+
+BODY = json.dumps(
+    {
+        "modality": "image",
+        "model": "midjourney",
+        "payload": {
+            "modality": "image",
+            "goal": "product shot",
+            "subject": "a ceramic mug",
+            "style": "photorealistic",
+        },
+    }
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def slow_client(port, stop):
+    """Open a POST and trickle its body one byte at a time."""
+    try:
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(
+            b"POST /generate HTTP/1.1\r\nHost: localhost\r\n"
+            b"Content-Type: application/json\r\n"
+            + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+        )
+        for byte in BODY.encode():
+            if stop.is_set():
+                break
+            sock.sendall(bytes([byte]))
+            time.sleep(SLOW_CLIENT_SECONDS / len(BODY))
+        sock.close()
+    except OSError:
+        pass
+
+
+def fast_client(port):
+    latencies = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for _ in range(REQUESTS_PER_CLIENT):
+        start = time.perf_counter()
+        conn.request("POST", "/generate", BODY, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.getheader("Connection", "").lower() == "close":
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.close()
+    return latencies
+
+
+def run(name, command, port, fast_clients, slow_clients):
+    env = dict(os.environ, RATE_LIMIT="100000000")
+    server = subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(port)
+        stop = threading.Event()
+        slow = [
+            threading.Thread(target=slow_client, args=(port, stop), daemon=True)
+            for _ in range(slow_clients)
+        ]
+        for thread in slow:
+            thread.start()
+        time.sleep(0.5)
+
+        with ThreadPoolExecutor(fast_clients) as pool:
+            results = list(pool.map(fast_client, [port] * fast_clients))
+        stop.set()
+
+        latencies = sorted(x for result in results for x in result)
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"{name:<8} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   ({len(latencies)} requests)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    workers = sys.argv[1] if len(sys.argv) > 1 else "4"
+    fast_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    slow_clients = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    print(f"{workers} workers, {fast_clients} fast clients, {slow_clients} slow clients")
+    port = free_port()
+    run(
+        "sync",
+        ["gunicorn", "-w", workers, "-b", f"127.0.0.1:{port}", "app:app"],
+        port,
+        fast_clients,
+        slow_clients,
+    )
+    port = free_port()
+    run(
+        "asgi",
+        [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--workers", workers, "--port", str(port), "--log-level", "warning",
+        ],
+        port,
+        fast_clients,
+        slow_clients,
+    )
+
+
+if __name__ == "__main__":
+    main()
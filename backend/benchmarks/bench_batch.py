@@ -0,0 +1,76 @@
+"""
+Benchmark: prompts/sec for single /generate calls versus /generate/batch.
+
+Usage:
+    cd backend
+    python benchmarks/bench_batch.py [total_prompts] [batch_size]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the limiter out of the way; this measures request overhead only.
+os.environ.setdefault("RATE_LIMIT", "100000000")
+os.environ.setdefault("BATCH_RATE_LIMIT", "100000000")
+os.environ.setdefault("MAX_BATCH_SIZE", "1000")
+
+import logging  # noqa: E402
+
+from app import app  # noqa: E402
+
+ITEM = {
+    "modality": "image",
+    "model": "midjourney",
+    "payload": {
+        "modality": "image",
+        "goal": "product shot",
+        "subject": "a ceramic mug on a wooden table",
+        "style": "photorealistic",
+        "lighting": "soft window light",
+        "mood": "calm",
+        "aspect_ratio": "4:3",
+    },
+}
+
+
+def bench_single(client, total):
+    body = json.dumps(ITEM)
+    start = time.perf_counter()
+    for _ in range(total):
+        response = client.post("/generate", data=body, content_type="application/json")
+        assert response.status_code == 200
+    return time.perf_counter() - start
+
+
+def bench_batch(client, total, batch_size):
+    body = json.dumps({"items": [ITEM] * batch_size})
+    start = time.perf_counter()
+    for _ in range(total // batch_size):
+        response = client.post(
+            "/generate/batch", data=body, content_type="application/json"
+        )
+        assert response.status_code == 200
+    return time.perf_counter() - start
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    total -= total % batch_size
+
+    logging.disable(logging.INFO)
+    with app.test_client() as client:
+        single = bench_single(client, total)
+        batch = bench_batch(client, total, batch_size)
+
+    print(f"prompts: {total}, batch size: {batch_size}")
+    print(f"single: {total / single:10.0f} prompts/sec")
+    print(f"batch:  {total / batch:10.0f} prompts/sec ({single / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: bulk compile throughput and memory as the input grows.
+
+Writes JSONL inputs of increasing size, runs bulk_compile.py on each in a
+fresh process and reports rows/sec and the peak RSS of the main process
+with inline compilation (--workers 0), which should stay flat, then
+rows/sec for the largest input across worker counts.
+
+Usage:
+    cd backend
+    python benchmarks/bench_bulk_compile.py [max_rows]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the CLI and reports the process's own peak RSS (kB on Linux)
+RUN = """
+import resource, runpy, sys
+sys.argv = ["bulk_compile.py", *sys.argv[1:]]
+try:
+    runpy.run_path("bulk_compile.py", run_name="__main__")
+except SystemExit:
+    pass
+print(f"maxrss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}", file=sys.stderr)
+"""
+
+
+def write_input(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            row = {
+                "modality": "image",
+                "model": ("dalle", "midjourney", "imagen")[i % 3],
+                "goal": "catalog refresh",
+                "subject": f"product {i}, a ceramic mug",
+                "style": "photorealistic",
+                "lighting": "soft window light",
+            }
+            f.write(json.dumps(row) + "\n")
+
+
+def run(source, workers):
+    output = source + ".out"
+    result = subprocess.run(
+        [sys.executable, "-c", RUN, source, "-o", output, "--workers", str(workers)],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, COMPILE_CACHE_SIZE="0"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    summary, maxrss = result.stderr.strip().splitlines()[-2:]
+    rows_per_second = float(summary.split(", ")[-1].split()[0])
+    return rows_per_second, int(maxrss.split()[1]) / 1024
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    sizes = [n for n in (25000, 100000, 400000, 1600000) if n <= max_rows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>9} {'rows/sec':>10} {'peak RSS':>10}  (--workers 0)")
+        for rows in sizes:
+            source = os.path.join(tmp, f"in-{rows}.jsonl")
+            write_input(source, rows)
+            rate, rss = run(source, 0)
+            print(f"{rows:>9} {rate:10.0f} {rss:7.1f} MiB")
+
+        print(f"\n{'workers':>9} {'rows/sec':>10}  ({sizes[-1]} rows, {os.cpu_count()} CPUs)")
+        for workers in sorted({1, 2, os.cpu_count() or 1}):
+            rate, _ = run(source, workers)
+            print(f"{workers:>9} {rate:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: JSON encode/decode cost per request.
+
+Compares Flask's default JSON provider (stdlib json, as used before) with
+jsoncodec (orjson when installed) for a typical /generate request and
+response and for one with every text field at the 2000 character limit,
+then times the /models view building its response through jsonify versus
+serving the body encoded at startup.
+
+Usage:
+    cd backend
+    python benchmarks/bench_json.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import jsoncodec  # noqa: E402
+from app import app, get_models  # noqa: E402
+from registry import get_available_models_by_modality  # noqa: E402
+from schema import MAX_TEXT_LENGTH  # noqa: E402
+from service import compile_request  # noqa: E402
+
+TEXT_FIELDS = ["goal", "subject", "style", "environment", "lighting", "camera", "mood"]
+
+
+def make_request(size):
+    payload = {"modality": "image", **{name: ("word " * size)[: size - 1] for name in TEXT_FIELDS}}
+    payload["negative_constraints"] = [("blurry " * size)[: size - 1]] * 3
+    return {"modality": "image", "model": "midjourney", "payload": payload}
+
+
+CASES = {
+    "typical": make_request(24),
+    "max-size": make_request(MAX_TEXT_LENGTH),
+}
+
+legacy = DefaultJSONProvider(Flask("legacy"))
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"backend: {jsoncodec.BACKEND}")
+    print(f"{'case':<22} {'stdlib':>10} {'jsoncodec':>12}")
+
+    for name, request in CASES.items():
+        body = legacy.dumps(request).encode("utf-8")
+        response, status = compile_request(request)
+        assert status == 200, response
+
+        rows = {
+            f"{name} request": (lambda: legacy.loads(body), lambda: jsoncodec.loads(body)),
+            f"{name} response": (
+                lambda: legacy.dumps(response, separators=(",", ":")).encode("utf-8"),
+                lambda: jsoncodec.dumps(response),
+            ),
+        }
+        for label, (old, new) in rows.items():
+            before, after = per_call(old, number), per_call(new, number)
+            print(f"{label:<22} {before:7.2f} us {after:9.2f} us  ({before / after:.1f}x)")
+
+    # /models view: jsonify of the catalog on every hit versus the pre-encoded body
+    legacy_app = Flask("legacy_models")
+    with legacy_app.test_request_context("/models"):
+        before = per_call(lambda: jsonify({"models": get_available_models_by_modality()}), number)
+    with app.test_request_context("/models"):
+        after = per_call(get_models, number)
+    print(f"{'GET /models view':<22} {before:7.2f} us {after:9.2f} us  ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: live preview over the /live WebSocket versus a POST to
+/generate per keystroke and model, driven in-process through the ASGI app.
+
+A typist enters TYPED into "lighting" at one keystroke every INTERVAL
+seconds, previewing all five image models. Reports the server CPU time,
+the rate limiter charges, the compiles run and the messages sent back:
+
+    per keystroke   one /generate request per keystroke and model
+    live            one WebSocket; keystrokes coalesce into at most
+                    LIVE_MAX_UPDATES_PER_SECOND updates
+    live, slow      the same with a client that takes SLOW_READ seconds
+                    to read each update (backpressure: fewer, larger
+                    coalesced updates instead of a queue)
+
+Usage:
+    cd backend
+    python benchmarks/bench_live.py [interval_ms]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INTERVAL = (float(sys.argv[1]) if len(sys.argv) > 1 else 10) / 1000
+SLOW_READ = 0.2
+
+os.environ["COMPILE_CACHE_SIZE"] = "0"
+os.environ["RATE_LIMIT"] = "100000000"
+
+import logging  # noqa: E402
+
+import asgi  # noqa: E402
+import sessions  # noqa: E402
+from asgi import app  # noqa: E402
+from registry import MODALITY_MODELS  # noqa: E402
+
+logging.disable(logging.INFO)
+
+TYPED = "warm late-afternoon light falling across the table, long soft shadows"
+MODELS = list(MODALITY_MODELS["image"])
+PAYLOAD = {
+    "modality": "image",
+    "goal": "product shot for the spring catalog",
+    "subject": "a hand-thrown ceramic mug with a speckled glaze and a thumb rest",
+    "environment": "on a reclaimed oak table beside a tall window",
+    "style": "photorealistic",
+}
+
+
+def scope(kind, path):
+    return {
+        "type": kind,
+        "asgi": {"version": "3.0"},
+        "method": "POST",
+        "path": path,
+        "headers": [],
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def per_keystroke():
+    charges = replies = 0
+    for i in range(len(TYPED)):
+        payload = {**PAYLOAD, "lighting": TYPED[: i + 1]}
+        for model in MODELS:
+            body = json.dumps({"modality": "image", "model": model, "payload": payload})
+            messages = [{"type": "http.request", "body": body.encode()}]
+
+            async def receive():
+                return messages.pop(0)
+
+            async def send(message):
+                pass
+
+            await app(scope("http", "/generate"), receive, send)
+            charges += 1
+            replies += 1
+        await asyncio.sleep(INTERVAL)
+    return charges, charges, replies
+
+
+async def live(read_seconds):
+    incoming = asyncio.Queue()
+    replies = []
+
+    async def typist():
+        await incoming.put({"type": "websocket.connect"})
+        await incoming.put(json.dumps({"modality": "image", "payload": PAYLOAD}))
+        for i in range(len(TYPED)):
+            await asyncio.sleep(INTERVAL)
+            await incoming.put(json.dumps({"changes": {"lighting": TYPED[: i + 1]}}))
+        # Wait for the final text to arrive, then hang up
+        while not replies or TYPED not in replies[-1]:
+            await asyncio.sleep(0.01)
+        await incoming.put({"type": "websocket.disconnect", "code": 1000})
+
+    async def receive():
+        message = await incoming.get()
+        if isinstance(message, dict):
+            return message
+        return {"type": "websocket.receive", "text": message}
+
+    async def send(message):
+        if message["type"] == "websocket.send":
+            await asyncio.sleep(read_seconds)
+            replies.append(message["text"])
+
+    compiles = []
+    update = sessions.CompileSession.update
+
+    def counted(session, changes):
+        compiles.append(len(session.models))
+        return update(session, changes)
+
+    sessions.CompileSession.update = counted
+    try:
+        await asyncio.gather(typist(), app(scope("websocket", "/live"), receive, send))
+    finally:
+        sessions.CompileSession.update = update
+    return 1, len(MODELS) + sum(compiles), len(replies)
+
+
+def main():
+    print(
+        f"{len(TYPED)} keystrokes every {INTERVAL * 1000:g} ms, {len(MODELS)} image models, "
+        f"LIVE_MAX_UPDATES_PER_SECOND={asgi.LIVE_MAX_UPDATES_PER_SECOND:g}"
+    )
+    for name, run in (
+        ("per keystroke", per_keystroke),
+        ("live", lambda: live(0)),
+        ("live, slow", lambda: live(SLOW_READ)),
+    ):
+        start = time.process_time()
+        charges, compiles, replies = asyncio.run(run())
+        cpu = (time.process_time() - start) * 1000
+        print(
+            f"{name:<14} cpu {cpu:7.1f} ms   limiter charges {charges:4d}   "
+            f"prompt compiles {compiles:4d}   messages {replies:4d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
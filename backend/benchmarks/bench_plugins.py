@@ -0,0 +1,67 @@
+"""
+Benchmark: adapter plugin discovery as the number of plugins grows.
+
+Installs N throwaway distributions (one adapter entry point each) into a
+temporary directory on sys.path and times a full entry point scan against
+discovery served from the on-disk index.
+
+Usage:
+    cd backend
+    python benchmarks/bench_plugins.py [max_plugins]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins import discover_adapters, scan_entry_points  # noqa: E402
+
+
+def install_plugins(site, start, stop):
+    for i in range(start, stop):
+        dist_info = os.path.join(site, f"plugin_{i}-1.0.dist-info")
+        os.mkdir(dist_info)
+        with open(os.path.join(dist_info, "METADATA"), "w") as f:
+            f.write(f"Metadata-Version: 2.1\nName: plugin-{i}\nVersion: 1.0\n")
+        with open(os.path.join(dist_info, "entry_points.txt"), "w") as f:
+            f.write(f"[prompt_generator.adapters]\nimage.model-{i} = plugin_{i}:Adapter\n")
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    max_plugins = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    counts = [n for n in (10, 50, 100, 250, 500, 1000) if n <= max_plugins]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = os.path.join(tmp, "site")
+        os.mkdir(site)
+        sys.path.insert(0, site)
+        index_path = os.path.join(tmp, "index.json")
+
+        print(f"{'plugins':>8} {'scan':>12} {'cached index':>14}")
+        installed = 0
+        for count in counts:
+            install_plugins(site, installed, count)
+            installed = count
+
+            scan, adapters = best_of(scan_entry_points)
+            discover_adapters(index_path=index_path)  # refresh the index
+            cached, cached_adapters = best_of(lambda: discover_adapters(index_path=index_path))
+            assert len(adapters) == len(cached_adapters) >= count
+
+            print(f"{count:>8} {scan * 1e3:9.2f} ms {cached * 1e3:11.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: lookups in the persistent prompt store with millions of entries.
+
+Fills a store with ENTRIES compiled prompts (spread over every model), then
+reports:
+
+    put             writing a new prompt (lock, append, index)
+    open            opening the store in a new process (maps, no loading)
+    get hit         a stored prompt, random keys
+    get miss        a key that is not stored
+    compile         compile_payload without any cache, for reference
+    store tier      compile_payload served from the store (key, lookup)
+    dict baseline   loading the same prompts from JSONL into a dict, and
+                    looking one up there
+    compact         rewriting the store without a tenth of its records
+
+Usage:
+    cd backend
+    python benchmarks/bench_prompt_store.py [entries]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENTRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+LOOKUPS = 200_000
+
+from cache import payload_key, store_key  # noqa: E402
+from compiler import PromptCompiler, adapter_version  # noqa: E402
+from prompt_store import PromptStore  # noqa: E402
+from registry import ADAPTER_REGISTRY, MODEL_INDEX  # noqa: E402
+
+MODELS = list(ADAPTER_REGISTRY)
+VERSIONS = {model: adapter_version(ADAPTER_REGISTRY[model]) for model in MODELS}
+
+
+def request(i):
+    model = MODELS[i % len(MODELS)]
+    modality = MODEL_INDEX[model].modality
+    payload = {
+        "modality": modality,
+        "goal": "product shot for the spring catalog",
+        "subject": f"hand-thrown ceramic mug number {i} with a speckled glaze",
+        "style": "photorealistic",
+    }
+    return model, modality, payload
+
+
+def per_call(seconds, calls):
+    return seconds / calls * 1e6
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="bench-prompt-store-")
+    path = os.path.join(directory, "prompts")
+    compiler = PromptCompiler()
+    keys = []
+
+    store = PromptStore(path)
+    put_seconds = 0.0
+    start = time.perf_counter()
+    with open(os.path.join(directory, "prompts.jsonl"), "w", encoding="utf-8") as jsonl:
+        for i in range(ENTRIES):
+            model, modality, payload = request(i)
+            prompt = compiler.compile_payload(modality, payload, model)
+            key = store_key(payload_key(model, payload), VERSIONS[model])
+            keys.append(key)
+            jsonl.write(json.dumps({"key": key.hex(), "prompt": prompt}) + "\n")
+            put_start = time.perf_counter()
+            store.put(key, model, VERSIONS[model], prompt)
+            put_seconds += time.perf_counter() - put_start
+    stats = store.stats()
+    store.close()
+    print(
+        f"{ENTRIES} entries in {time.perf_counter() - start:.1f}s: segment "
+        f"{stats['segment_bytes'] / 2**20:.0f} MiB, index {stats['index_bytes'] / 2**20:.0f} MiB"
+    )
+    print(f"{'put':<14} {per_call(put_seconds, ENTRIES):9.2f} us")
+
+    start = time.perf_counter()
+    store = PromptStore(path)
+    print(f"{'open':<14} {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+    rng = random.Random(0)
+    sample = [rng.choice(keys) for _ in range(LOOKUPS)]
+    missing = [
+        store_key(("gpt-4", rng.getrandbits(128).to_bytes(16, "little")), "v0")
+        for _ in range(LOOKUPS)
+    ]
+    for name, lookups in (("get hit", sample), ("get miss", missing)):
+        start = time.perf_counter()
+        for key in lookups:
+            store.get(key)
+        print(f"{name:<14} {per_call(time.perf_counter() - start, LOOKUPS):9.2f} us")
+
+    requests = [request(rng.randrange(ENTRIES)) for _ in range(LOOKUPS // 10)]
+    for name, tier in (("compile", compiler), ("store tier", PromptCompiler(store=store))):
+        start = time.perf_counter()
+        for model, modality, payload in requests:
+            tier.compile_payload(modality, payload, model)
+        print(f"{name:<14} {per_call(time.perf_counter() - start, len(requests)):9.2f} us")
+
+    start = time.perf_counter()
+    with open(os.path.join(directory, "prompts.jsonl"), encoding="utf-8") as jsonl:
+        prompts = {}
+        for line in jsonl:
+            entry = json.loads(line)
+            prompts[bytes.fromhex(entry["key"])] = entry["prompt"]
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in sample:
+        prompts.get(key)
+    print(
+        f"{'dict baseline':<14} {per_call(time.perf_counter() - start, LOOKUPS):9.2f} us "
+        f"after loading for {load_seconds:.1f}s"
+    )
+    del prompts
+
+    start = time.perf_counter()
+    result = store.compact(lambda record: record.key[0] >= 26)
+    print(
+        f"{'compact':<14} {time.perf_counter() - start:9.2f} s  "
+        f"kept {result['kept']}, dropped {result['dropped']}"
+    )
+    store.close()
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
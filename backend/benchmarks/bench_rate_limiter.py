@@ -0,0 +1,137 @@
+"""
+Benchmark: GCRA RateLimiter versus the previous per-request deque limiter,
+and the rate_limit decorator versus the previous one, which followed
+is_allowed with get_remaining (and get_reset_time when limited).
+
+Usage:
+    cd backend
+    python benchmarks/bench_rate_limiter.py [calls]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from functools import wraps
+
+from flask import Flask, jsonify, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter, rate_limit  # noqa: E402
+
+
+class DequeRateLimiter:
+    """The previous implementation: one timestamp stored per request."""
+
+    def __init__(self, max_requests=60, window_seconds=60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.requests = defaultdict(deque)
+
+    def is_allowed(self, key, cost=1):
+        now = time.time()
+        cutoff = now - self.window_seconds
+        while self.requests[key] and self.requests[key][0] < cutoff:
+            self.requests[key].popleft()
+        if len(self.requests[key]) + cost <= self.max_requests:
+            self.requests[key].extend([now] * cost)
+            return True
+        return False
+
+
+def previous_rate_limit(max_requests=60, window_seconds=60):
+    """The previous decorator: up to three limiter calls per request."""
+    limiter = RateLimiter(max_requests, window_seconds)
+
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
+            if not limiter.is_allowed(client_ip):
+                remaining = limiter.get_remaining(client_ip)
+                reset_time = limiter.get_reset_time(client_ip)
+                response = jsonify({"error": "Rate limit exceeded"})
+                response.status_code = 429
+                response.headers["X-RateLimit-Limit"] = str(max_requests)
+                response.headers["X-RateLimit-Remaining"] = str(remaining)
+                response.headers["X-RateLimit-Reset"] = str(reset_time)
+                response.headers["Retry-After"] = str(reset_time)
+                return response
+            remaining = limiter.get_remaining(client_ip)
+            response = f(*args, **kwargs)
+            response.headers["X-RateLimit-Limit"] = str(max_requests)
+            response.headers["X-RateLimit-Remaining"] = str(remaining)
+            return response
+
+        return wrapped
+
+    return decorator
+
+
+def time_decorator(decorate, traffic):
+    """Nanoseconds a decorator adds to each request, one per traffic entry."""
+    app = Flask(__name__)
+
+    def view():
+        return jsonify({"ok": True})
+
+    views = {
+        "bare": view,
+        "decorated": decorate(max_requests=100, window_seconds=60)(view),
+    }
+    contexts = {
+        key: app.test_request_context("/", headers={"X-Forwarded-For": key}) for key in traffic
+    }
+    timings = {}
+    for name, run in views.items():
+        start = time.perf_counter()
+        for key in traffic:
+            with contexts[key]:
+                run()
+        timings[name] = (time.perf_counter() - start) / len(traffic) * 1e9
+    return timings["decorated"] - timings["bare"]
+
+
+def time_checks(limiter, calls, keys):
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.is_allowed(keys[i % len(keys)])
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def memory_per_key(cls, max_requests, keys):
+    """Bytes retained per key once every key has used its full budget."""
+    tracemalloc.start()
+    limiter = cls(max_requests, 60)
+    for key in keys:
+        for _ in range(max_requests):
+            limiter.is_allowed(key)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained / len(keys)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    keys = [f"10.0.0.{i}" for i in range(100)]
+
+    print(f"{'limit/min':>10} {'impl':>6} {'ns/check':>10} {'bytes/key':>10}")
+    for max_requests in (60, 6000):
+        for name, cls in (("deque", DequeRateLimiter), ("gcra", RateLimiter)):
+            ns = time_checks(cls(max_requests, 60), calls, keys)
+            per_key = memory_per_key(cls, max_requests, keys[:20])
+            print(f"{max_requests:>10} {name:>6} {ns:>10.0f} {per_key:>10.0f}")
+
+    # Half of the keys make 100 requests and stay within their limit of
+    # 100; the other half make 300 and are limited for two thirds of them
+    traffic = (keys[:50] + keys[50:] * 3) * 100
+    print()
+    print(f"{'decorator':>10} {'ns/request over the bare view':>30}")
+    for name, decorate in (("previous", previous_rate_limit), ("current", rate_limit)):
+        print(f"{name:>10} {time_decorator(decorate, traffic):>30.0f}")
+
+
+if __name__ == "__main__":
+    main()
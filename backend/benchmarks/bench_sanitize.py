@@ -0,0 +1,69 @@
+"""
+Benchmark: validating and sanitizing a payload.
+
+Compares sanitize_payload, which rebuilds every string with split/join
+and used to run after a separate validation pass, with the fused single
+pass of validation.clean_payload, which validates too but keeps
+already-clean strings as they are. The legacy column leaves out the cost
+of the old validation pass, so it understates the previous path.
+
+Usage:
+    cd backend
+    python benchmarks/bench_sanitize.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import sanitize_payload  # noqa: E402
+from service import MAX_TEXT_LENGTH  # noqa: E402
+from validation import clean_payload  # noqa: E402
+
+CLEAN = {
+    "modality": "image",
+    "goal": "product shot for an online store",
+    "subject": "a ceramic mug on a wooden table",
+    "style": "photorealistic",
+    "lighting": "soft window light",
+    "camera": "50mm lens, shallow depth of field",
+    "negative_constraints": ["text", "watermark", "blurry"],
+}
+
+PAYLOADS = {
+    "clean": CLEAN,
+    "dirty": {
+        key: [f"  {v}\t\n" for v in value] if isinstance(value, list) else f" {value}\x00  \r\n"
+        for key, value in CLEAN.items()
+    },
+    "clean 2000 chars": dict(CLEAN, subject=("a ceramic mug " * 150)[:MAX_TEXT_LENGTH - 1]),
+    "dirty 2000 chars": dict(CLEAN, subject=("a  ceramic\tmug " * 150)[:MAX_TEXT_LENGTH - 1]),
+}
+
+
+def fused(payload):
+    return clean_payload("image", payload)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'payload':<18} {'sanitize_payload':>18} {'fused':>12}")
+    for name, payload in PAYLOADS.items():
+        assert fused(payload) == (sanitize_payload(payload, MAX_TEXT_LENGTH), [])
+
+        legacy = min(
+            timeit.repeat(
+                lambda: sanitize_payload(payload, MAX_TEXT_LENGTH), number=number, repeat=5
+            )
+        )
+        current = min(timeit.repeat(lambda: fused(payload), number=number, repeat=5))
+        print(
+            f"{name:<18} {legacy / number * 1e6:15.2f} us {current / number * 1e6:9.2f} us"
+            f"  ({legacy / current:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: live preview by session updates versus re-posting the payload.
+
+Simulates typing into one field of an image form with long (1500 char)
+subject and environment fields, previewing all image models after every
+keystroke, and reports per keystroke the server-side time and the size of
+the JSON response:
+
+    full payload    the whole payload validated and compiled for every
+                    model each time (as the forms re-POST it today)
+    session update  PATCH-style update of the one changed field: only it
+                    is validated and only the segments that read it are
+                    re-rendered; the response carries the changed prompts
+                    and their edits
+    edits only      the size of the edits alone, for clients that apply
+                    them to the previous prompts
+
+Usage:
+    cd backend
+    python benchmarks/bench_sessions.py [keystrokes]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KEYSTROKES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+os.environ["COMPILE_CACHE_SIZE"] = "0"
+
+import logging  # noqa: E402
+
+from jsoncodec import dumps  # noqa: E402
+from service import (  # noqa: E402
+    compile_all_request,
+    create_session_request,
+    update_session_request,
+)
+
+logging.disable(logging.INFO)
+
+TYPED = "warm late-afternoon light falling across the table, long soft shadows"
+
+PAYLOAD = {
+    "modality": "image",
+    "goal": "product shot for the spring catalog",
+    "subject": ("a hand-thrown ceramic mug with a speckled glaze and a thumb rest " * 24)[:1500],
+    "environment": ("on a reclaimed oak table beside a tall window in a quiet studio " * 24)[
+        :1500
+    ],
+    "style": "photorealistic",
+    "negative_constraints": ["text", "watermark", "extra handles"],
+}
+
+
+def keystrokes():
+    for i in range(KEYSTROKES):
+        yield TYPED[: i % len(TYPED) + 1]
+
+
+def full_payload():
+    sizes = 0
+    for text in keystrokes():
+        body, _ = compile_all_request(
+            {"modality": "image", "payload": {**PAYLOAD, "lighting": text}}
+        )
+        sizes += len(dumps(body))
+    return sizes, sizes
+
+
+def session_update():
+    body, _ = create_session_request({"modality": "image", "payload": PAYLOAD})
+    session = body["session"]
+    sizes = edit_sizes = 0
+    for text in keystrokes():
+        body, _ = update_session_request(session, {"changes": {"lighting": text}})
+        sizes += len(dumps(body))
+        edit_sizes += len(dumps(body["edits"]))
+    return sizes, edit_sizes
+
+
+def main():
+    print(f"{KEYSTROKES} keystrokes, 5 image models, 1500-char subject and environment")
+    for name, fn in (("full payload", full_payload), ("session update", session_update)):
+        start = time.perf_counter()
+        sizes, edit_sizes = fn()
+        elapsed = (time.perf_counter() - start) / KEYSTROKES * 1e6
+        print(f"{name:<15} {elapsed:7.1f} us/keystroke {sizes / KEYSTROKES:8.0f} B/response")
+        if fn is session_update:
+            print(f"{'edits only':<15} {'':>18} {edit_sizes / KEYSTROKES:8.0f} B/response")
+
+
+if __name__ == "__main__":
+    main()
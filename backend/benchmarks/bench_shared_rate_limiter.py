@@ -0,0 +1,56 @@
+"""
+Benchmark: shared-memory rate limiter throughput across processes.
+
+Usage:
+    cd backend
+    python benchmarks/bench_shared_rate_limiter.py [processes] [calls_per_process]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter  # noqa: E402
+from shared_rate_limiter import SharedRateLimiter  # noqa: E402
+
+
+def worker(path, calls, distinct_keys):
+    limiter = SharedRateLimiter(max_requests=10**9, window_seconds=60, path=path)
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.is_allowed(f"10.0.{i % distinct_keys // 256}.{i % 256}")
+    elapsed = time.perf_counter() - start
+    limiter.close()
+    return elapsed
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    distinct_keys = 1000
+
+    local = RateLimiter(max_requests=10**9, window_seconds=60)
+    start = time.perf_counter()
+    for i in range(calls):
+        local.is_allowed(f"10.0.{i % distinct_keys // 256}.{i % 256}")
+    print(f"in-process (1 proc):   {calls / (time.perf_counter() - start):12,.0f} checks/sec")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ratelimit")
+        SharedRateLimiter(path=path).close()
+
+        for n in (1, processes):
+            ctx = multiprocessing.get_context("fork")
+            start = time.perf_counter()
+            with ctx.Pool(n) as pool:
+                pool.starmap(worker, [(path, calls, distinct_keys)] * n)
+            wall = time.perf_counter() - start
+            print(f"shared ({n} proc):       {n * calls / wall:12,.0f} checks/sec")
+
+
+if __name__ == "__main__":
+    main()
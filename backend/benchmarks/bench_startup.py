@@ -0,0 +1,54 @@
+"""
+Benchmark: cold start of a worker with lazy versus preloaded adapters.
+
+Starts fresh interpreters and reports the median import time of the app
+and time to the first /generate response. PRELOAD_ADAPTERS=true loads
+every adapter at import, as the registry used to.
+
+Usage:
+    cd backend
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from test_startup import FIRST_RESPONSE  # noqa: E402
+
+
+def cold_start(preload):
+    env = dict(os.environ, PRELOAD_ADAPTERS="true" if preload else "false")
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_RESPONSE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    print(f"{'mode':<10} {'import':>10} {'first response':>16}")
+    # Interleave modes so machine noise affects both alike
+    results = {False: [], True: []}
+    for _ in range(runs):
+        for preload in results:
+            results[preload].append(cold_start(preload))
+
+    for preload, samples in results.items():
+        imported = statistics.median(r["import_ms"] for r in samples)
+        first = statistics.median(r["first_response_ms"] for r in samples)
+        print(f"{'preload' if preload else 'lazy':<10} {imported:7.1f} ms {first:13.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: buffered JSON versus streamed NDJSON for a large batch.
+
+Sends one /generate/batch request with many items both ways and reports
+time to the first byte of the response, total time, and the peak memory
+allocated while the response is produced and consumed (tracemalloc).
+Both modes parse the whole request first, which accounts for most of the
+streamed mode's time to first byte and peak memory.
+
+Usage:
+    cd backend
+    python benchmarks/bench_stream.py [items]
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+# Lift the limits so both modes accept the whole batch; no cache, so every
+# item is compiled
+os.environ.update(
+    BATCH_RATE_LIMIT=str(10 * ITEMS),
+    MAX_BATCH_SIZE=str(ITEMS),
+    MAX_STREAM_BATCH_SIZE=str(ITEMS),
+    COMPILE_CACHE_SIZE="0",
+)
+
+import logging  # noqa: E402
+
+from app import app  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def make_body(count):
+    items = [
+        {
+            "modality": "image",
+            "model": "midjourney",
+            "payload": {
+                "modality": "image",
+                "goal": "product shot",
+                "subject": f"ceramic mug number {i}",
+                "style": "photorealistic",
+                "lighting": "soft window light",
+            },
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"items": items})
+
+
+def measure(client, path, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post(path, data=body, content_type="application/json", buffered=False)
+    first = None
+    size = 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter()
+        size += len(chunk)
+    done = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response.close()
+    return (first - start) * 1e3, (done - start) * 1e3, peak / 2**20, size / 2**20
+
+
+def main():
+    client = app.test_client()
+    body = make_body(ITEMS)
+    print(f"{ITEMS} items")
+    print(f"{'mode':<10} {'first byte':>12} {'total':>12} {'peak alloc':>12} {'response':>10}")
+    for mode, path in (("buffered", "/generate/batch"), ("stream", "/generate/batch?stream=1")):
+        first, total, peak, size = measure(client, path, body)
+        print(f"{mode:<10} {first:9.1f} ms {total:9.1f} ms {peak:8.1f} MiB {size:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: offline token estimation and budget fitting on 2000-character
+fields.
+
+Counting, per 2000-character string of varied prose:
+
+    cold            new string, no words costed yet (first requests)
+    warm words      new string, its words already costed (steady state)
+    cached string   the same string again
+
+Fitting a text prompt with a 2000-character context and 20 constraints
+(about 700 tokens) to BUDGET tokens, for every text model:
+
+    compile         compile alone, for reference
+    fit_prompt      as shipped: drops about the excess in word-sized
+                    units and recounts to confirm
+    bisect          baseline: binary search over the context's length,
+                    compiling and counting the prompt at every probe
+
+Usage:
+    cd backend
+    python benchmarks/bench_tokens.py [repeats]
+"""
+
+import dataclasses
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+BUDGET = 200
+
+import tokens  # noqa: E402
+from registry import ADAPTER_REGISTRY, MODALITY_MODELS  # noqa: E402
+from schema import TextPrompt  # noqa: E402
+from tokens import approx_tokens, count_tokens, fit_prompt  # noqa: E402
+
+rng = random.Random(0)
+VOCABULARY = [
+    "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(1, 12)))
+    for _ in range(3000)
+] + ["the", "a", "of", "and", "to", "in", "is", "that", "for", "with"] * 100
+
+
+def prose(length=2000):
+    words = []
+    while sum(map(len, words)) + len(words) < length:
+        word = rng.choice(VOCABULARY)
+        words.append(word + rng.choice([",", ".", "", "", "", ""]))
+    return " ".join(words)[:length]
+
+
+def measure(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def bisect_fit(adapter, prompt, budget):
+    """Longest prefix of the context that fits, by binary search with recounts."""
+    low, high = 0, len(prompt.context)
+    while low < high:
+        middle = (low + high + 1) // 2
+        text = adapter.compile(dataclasses.replace(prompt, context=prompt.context[:middle]))
+        if approx_tokens(text) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return adapter.compile(dataclasses.replace(prompt, context=prompt.context[:low]))
+
+
+def main():
+    texts = [prose() for _ in range(REPEATS)]
+    print(f"{REPEATS} strings of 2000 chars, ~{approx_tokens(texts[0])} tokens each")
+
+    def cold():
+        tokens._word_costs.clear()
+        approx_tokens(next(fresh))
+
+    fresh = iter(texts)
+    print(f"{'cold':<14} {measure(cold):8.1f} us/string")
+    for text in texts:
+        approx_tokens(text)
+    fresh = iter(texts)
+    print(f"{'warm words':<14} {measure(lambda: approx_tokens(next(fresh))):8.1f} us/string")
+    count_tokens(texts[0])
+    print(f"{'cached string':<14} {measure(lambda: count_tokens(texts[0])):8.3f} us/string")
+
+    print(f"fit to {BUDGET} tokens, 2000-char context and 20 constraints")
+    for model in MODALITY_MODELS["text"]:
+        adapter = ADAPTER_REGISTRY[model]
+        prompt = TextPrompt(
+            modality="text",
+            goal="Summarize",
+            subject="the attached quarterly report for the board",
+            context=prose(),
+            tone="formal",
+            constraints=[prose(40) for _ in range(20)],
+        )
+        fit = fit_prompt(adapter, prompt, BUDGET)
+        assert fit.tokens <= BUDGET
+
+        def fit_uncached():
+            count_tokens.cache_clear()
+            fit_prompt(adapter, prompt, BUDGET)
+
+        compile_us = measure(lambda: adapter.compile(prompt))
+        fit_us = measure(fit_uncached)
+        bisect_us = measure(lambda: bisect_fit(adapter, prompt, BUDGET), REPEATS // 10)
+        print(
+            f"{model:<10} compile {compile_us:7.1f} us   fit_prompt {fit_us:7.1f} us   "
+            f"bisect {bisect_us:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
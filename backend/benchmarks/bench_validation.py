@@ -0,0 +1,81 @@
+"""
+Benchmark: cost of rejecting junk payloads.
+
+Compares the schema-generated validators (reject while sanitizing) with
+the previous path, which checked string lengths, sanitized the whole
+payload, hashed it for the compile cache and only then failed on unknown
+keys when constructing the prompt dataclass.
+
+Usage:
+    cd backend
+    python benchmarks/bench_validation.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import CompileCache  # noqa: E402
+from compiler import PromptCompiler  # noqa: E402
+from rate_limiter import sanitize_payload  # noqa: E402
+from service import MAX_TEXT_LENGTH  # noqa: E402
+from validation import clean_payload  # noqa: E402
+
+BASE = {"modality": "image", "goal": "product shot", "subject": "a ceramic mug"}
+
+JUNK = {
+    "unknown keys": dict(BASE, **{f"junk_{i}": "x" * 1000 for i in range(200)}),
+    "one unknown key": dict(BASE, bogus="x" * 500, style="photorealistic"),
+    "wrong types": dict(BASE, style={"nested": ["a"] * 100}, negative_constraints="blurry"),
+    "missing required": {"modality": "image", "style": "photorealistic " * 100},
+    "valid": dict(BASE, style="photorealistic", lighting="soft"),
+}
+
+legacy_compiler = PromptCompiler(cache=CompileCache(max_entries=4096))
+current_compiler = PromptCompiler(cache=CompileCache(max_entries=4096))
+
+
+def legacy_compile_request(payload):
+    """The pre-validator payload path: length scan, sanitize, cache key, construct."""
+    for key, value in payload.items():
+        if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
+            return {"error": f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}"}, 400
+    sanitized = sanitize_payload(payload, MAX_TEXT_LENGTH)
+    try:
+        result = legacy_compiler.compile_payload("image", sanitized, "midjourney")
+    except TypeError as e:
+        return {"error": f"Invalid payload: {str(e)}"}, 400
+    return {"prompt": result}, 200
+
+
+def current_compile_request(payload):
+    """The payload path of service.compile_request: validate and sanitize, compile."""
+    sanitized, field_errors = clean_payload("image", payload)
+    if field_errors:
+        return {"error": field_errors[0]["message"], "field_errors": field_errors}, 400
+    return {"prompt": current_compiler.compile_payload("image", sanitized, "midjourney")}, 200
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'payload':<18} {'legacy':>18} {'validators':>18}")
+    for name, payload in JUNK.items():
+        legacy_status = legacy_compile_request(payload)[1]
+        status = current_compile_request(payload)[1]
+
+        legacy = min(
+            timeit.repeat(lambda: legacy_compile_request(payload), number=number, repeat=3)
+        )
+        current = min(
+            timeit.repeat(lambda: current_compile_request(payload), number=number, repeat=3)
+        )
+        print(
+            f"{name:<18} {legacy / number * 1e6:9.1f} us ({legacy_status})"
+            f" {current / number * 1e6:9.1f} us ({status})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: expanding an A/B matrix with /generate/variants versus one
+/generate call per variant and model.
+
+The matrix is 4 lighting x 5 styles x 3 camera setups on an otherwise
+fixed ImagePrompt, compiled for every image model. Reports the time to
+produce all prompts, per prompt:
+
+    per request     one compile_request per variant and model (what a
+                    client script posting each payload does, minus HTTP)
+    full render     stream_variants with every adapter rendering each
+                    variant in full
+    specialized     stream_variants as shipped: segments that do not read
+                    lighting, style or camera are rendered once per request
+
+and, for the rendering step alone, every variant rendered with each
+model's full plan versus its specialized plan (including specializing).
+
+Usage:
+    cd backend
+    python benchmarks/bench_variants.py [repeats]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+# Every variant is distinct, so the per-request path gains nothing from the
+# cache either way; disable it so all three paths compile
+os.environ["COMPILE_CACHE_SIZE"] = "0"
+
+import logging  # noqa: E402
+
+import service  # noqa: E402
+from service import compile_request, prepare_variants, stream_variants  # noqa: E402
+
+logging.disable(logging.INFO)
+
+REQUEST = {
+    "modality": "image",
+    "payload": {
+        "modality": "image",
+        "goal": "product shot for the spring catalog",
+        "subject": "a hand-thrown ceramic mug with a speckled glaze",
+        "environment": "on a reclaimed oak table beside a window",
+        "mood": "calm and inviting",
+        "quality_level": "high detail, 8k",
+        "negative_constraints": ["text", "watermark", "extra handles"],
+        "aspect_ratio": "4:5",
+    },
+    "vary": {
+        "lighting": ["soft window light", "hard noon sun", "neon rim light", "golden hour"],
+        "style": ["photorealistic", "film photo", "watercolor", "isometric 3d", "ink sketch"],
+        "camera": ["85mm f/1.8", "overhead flat lay", "macro close-up"],
+    },
+}
+
+
+def per_request():
+    variants, _ = prepare_variants(REQUEST, max_variants=10000)
+    for _, values in variants.space.expand():
+        payload = service.variant_payload(variants.payload, variants.space.fields, values)
+        for model in variants.models:
+            compile_request({"modality": "image", "model": model, "payload": payload})
+
+
+def full_render():
+    def unspecialized(prompt, models, varying):
+        return {model: service.ADAPTER_REGISTRY[model].compile for model in models}
+
+    original = service.compiler.variant_compilers
+    service.compiler.variant_compilers = unspecialized
+    try:
+        specialized()
+    finally:
+        service.compiler.variant_compilers = original
+
+
+def specialized():
+    variants, _ = prepare_variants(REQUEST, max_variants=10000)
+    for _ in stream_variants(variants):
+        pass
+
+
+def render_only(specialize):
+    variants, _ = prepare_variants(REQUEST, max_variants=10000)
+    fields = variants.space.fields
+    base = service.build_prompt("image", variants.payload)
+    prompts = [
+        service.build_prompt("image", service.variant_payload(variants.payload, fields, values))
+        for _, values in variants.space.expand()
+    ]
+    plans = [service.ADAPTER_REGISTRY[model].plan for model in variants.models]
+
+    def run():
+        for plan in plans:
+            render = plan.specialize(base, fields).render if specialize else plan.render
+            for prompt in prompts:
+                render(prompt)
+
+    return run
+
+
+def measure(fn, prompts):
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - start) / REPEATS / prompts * 1e6
+
+
+def main():
+    variants, _ = prepare_variants(REQUEST, max_variants=10000)
+    prompts = variants.space.size * len(variants.models)
+    print(f"{variants.space.size} variants x {len(variants.models)} models, {REPEATS} repeats")
+    for name, fn in (
+        ("per request", per_request),
+        ("full render", full_render),
+        ("specialized", specialized),
+    ):
+        print(f"{name:<12} {measure(fn, prompts):6.2f} us/prompt")
+    print("render step only")
+    for name, specialize in (("full plan", False), ("specialized", True)):
+        print(f"{name:<12} {measure(render_only(specialize), prompts):6.2f} us/prompt")
+
+
+if __name__ == "__main__":
+    main()
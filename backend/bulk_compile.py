@@ -0,0 +1,394 @@
+"""
+Offline bulk prompt compilation, without going through HTTP.
+
+Reads rows from a JSONL or CSV file, validates and compiles them exactly
+like /generate (service.compile_request) across a process pool, and writes
+one JSON line per row:
+
+    python bulk_compile.py catalog.jsonl -o prompts.jsonl --workers 8
+    python bulk_compile.py catalog.csv -o prompts.jsonl --checkpoint run.ckpt --resume
+
+Each row names its modality and model and carries the payload fields, either
+flat (CSV columns or JSON keys) or, in JSONL, nested under "payload" like a
+/generate request. In CSV, empty cells are left out and list fields are
+split on "|". Output lines are {"row": n, "model": ..., "prompt": ...} or
+{"row": n, "status": 400, "error": ...} (500 if compiling the row failed
+unexpectedly), numbered from 0 in input order.
+
+Input is read lazily in chunks and at most two chunks per worker are in
+flight, so memory stays bounded however large the input is. With
+--checkpoint, the input offset, row number and output size are recorded
+after each chunk; --resume truncates the output back to the checkpoint and
+continues from the recorded input offset. The output must still hold
+everything the checkpoint records. In --unordered mode, chunks can finish
+past the first unfinished one; the checkpoint lists their rows, which resume
+skips, so it must be given the same --chunk-size.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from jsoncodec import dumps, loads
+from service import compile_request
+from validation import PAYLOAD_VALIDATORS, TEXT_LIST
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+LIST_SEPARATOR = "|"
+
+
+def read_jsonl(f, offset=0):
+    """
+    Yield (offset after the row, raw line) for each non-blank JSONL line.
+
+    Lines are parsed by the workers, so the reader only splits the input.
+    """
+    f.seek(offset)
+    position = offset
+    for line in f:
+        position += len(line)
+        if line.strip():
+            yield position, line
+
+
+def read_csv(f, offset=0):
+    """
+    Yield (offset after the row, row dict) for each CSV record.
+
+    The header is always read from the start of the file; offset, if given,
+    is where the first record to yield starts.
+    """
+    header = f.readline()
+    fieldnames = next(csv.reader([header.decode("utf-8-sig")]))
+    position = offset or len(header)
+    f.seek(position)
+
+    def lines():
+        nonlocal position
+        for line in f:
+            position += len(line)
+            yield line.decode("utf-8")
+
+    # csv.reader pulls exactly the lines of one record per row, so position
+    # is the end of the record just returned
+    for values in csv.reader(lines()):
+        if values:
+            yield position, dict(zip(fieldnames, values))
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv}
+
+
+def row_to_request(record):
+    """
+    Build a /generate request dict from an input row.
+
+    Args:
+        record: Parsed JSONL object or CSV row dict
+
+    Returns:
+        dict: Request with modality, model and payload
+    """
+    if not isinstance(record, dict) or "payload" in record:
+        return record
+    payload = {key: value for key, value in record.items() if key != "model"}
+    return {"modality": record.get("modality"), "model": record.get("model"), "payload": payload}
+
+
+def csv_payload_values(request):
+    """Drop empty CSV cells and split list fields, in place."""
+    payload = request.get("payload")
+    if not isinstance(payload, dict):
+        return
+    validator = PAYLOAD_VALIDATORS.get(request.get("modality"))
+    for key in [key for key, value in payload.items() if value == ""]:
+        del payload[key]
+    if validator is None:
+        return
+    for key, value in payload.items():
+        rule = validator.rules.get(key)
+        if rule is not None and rule.kind is TEXT_LIST:
+            payload[key] = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+
+
+def compile_chunk(first_row, rows):
+    """
+    Compile one chunk of rows; runs in a worker process.
+
+    Args:
+        first_row: Number of the chunk's first row
+        rows: Raw JSONL lines (bytes) or CSV row dicts
+
+    Returns:
+        tuple: (output bytes, number of rows, number of errors)
+    """
+    lines = []
+    errors = 0
+    for row, raw in enumerate(rows, first_row):
+        if isinstance(raw, bytes):
+            try:
+                request = row_to_request(loads(raw))
+            except ValueError:
+                body, status_code = {"error": "Row is not valid JSON"}, 400
+                request = None
+        else:
+            request = row_to_request(raw)
+            csv_payload_values(request)
+
+        if request is not None:
+            try:
+                body, status_code = compile_request(request)
+            except Exception as e:
+                # One bad row must not abort (and, on resume, re-abort) the run
+                logger.error(f"Unexpected error in row {row}: {str(e)}", exc_info=True)
+                body, status_code = {"error": f"Internal error: {type(e).__name__}: {e}"}, 500
+        if status_code == 200:
+            lines.append(dumps({"row": row, **body}))
+        else:
+            errors += 1
+            lines.append(dumps({"row": row, "status": status_code, **body}))
+    return b"\n".join(lines) + b"\n", len(rows), errors
+
+
+def chunked(rows, chunk_size, first_row):
+    """Group (offset, row) pairs into (first row, end offset, rows) chunks."""
+    chunk = []
+    offset = None
+    for offset, raw in rows:
+        chunk.append(raw)
+        if len(chunk) == chunk_size:
+            yield first_row, offset, chunk
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        yield first_row, offset, chunk
+
+
+def read_checkpoint(path):
+    """Load a checkpoint written by write_checkpoint, or None if absent."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, checkpoint):
+    """Atomically replace the checkpoint file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".bulk-checkpoint-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+class InlineExecutor:
+    """Executor that runs work in the calling process (--workers 0)."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def bulk_compile(
+    input_path,
+    output,
+    fmt=None,
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    ordered=True,
+    checkpoint_path=None,
+    resume=False,
+    report=None,
+):
+    """
+    Compile every row of an input file.
+
+    Args:
+        input_path: JSONL or CSV file
+        output: Output file path
+        fmt: "jsonl" or "csv"; detected from the file extension when None
+        workers: Worker processes (None = CPU count, 0 = compile inline)
+        chunk_size: Rows per work unit
+        ordered: Write results in input order (otherwise as completed)
+        checkpoint_path: File to record progress in after every chunk
+        resume: Continue from checkpoint_path instead of starting over
+        report: Called with (rows, errors, seconds) as chunks are written
+
+    Returns:
+        dict: rows, errors, seconds and rows_per_second of this run
+    """
+    fmt = fmt or ("csv" if input_path.lower().endswith(".csv") else "jsonl")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    start = {"row": 0, "offset": 0, "output_bytes": 0}
+    if resume:
+        if not checkpoint_path:
+            raise ValueError("--resume needs --checkpoint")
+        checkpoint = read_checkpoint(checkpoint_path)
+        if checkpoint is not None:
+            if checkpoint["input"] != os.path.abspath(input_path):
+                raise ValueError(f"Checkpoint {checkpoint_path} is for {checkpoint['input']}")
+            if not os.path.exists(output) or os.path.getsize(output) < checkpoint["output_bytes"]:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} records {checkpoint['output_bytes']} bytes "
+                    f"of output, but {output} is missing or shorter"
+                )
+            if checkpoint.get("finished") and checkpoint["chunk_size"] != chunk_size:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} lists chunks of {checkpoint['chunk_size']} "
+                    f"rows; resume with --chunk-size {checkpoint['chunk_size']}"
+                )
+            start = checkpoint
+    # Rows written past the checkpointed prefix: first row -> next row
+    written = dict(start.get("finished", ()))
+
+    executor = ProcessPoolExecutor(workers) if workers > 0 else InlineExecutor()
+    max_in_flight = 2 * max(1, workers)
+    started = time.perf_counter()
+    rows_done = errors = 0
+
+    mode = "r+b" if start["output_bytes"] else "wb"
+    with open(input_path, "rb") as f, open(output, mode) as out:
+        out.truncate(start["output_bytes"])
+        out.seek(start["output_bytes"])
+
+        # Chunks finished but not yet part of the contiguous checkpointed
+        # prefix: sequence number -> (first row, next row, input offset)
+        finished = {}
+        frontier = {"seq": 0, "row": start["row"], "offset": start["offset"]}
+
+        def write(seq, chunk_end, result):
+            nonlocal rows_done, errors
+            data, count, chunk_errors = result
+            out.write(data)
+            rows_done += count
+            errors += chunk_errors
+            finished[seq] = chunk_end
+            advanced = False
+            while frontier["seq"] in finished:
+                _, frontier["row"], frontier["offset"] = finished.pop(frontier["seq"])
+                frontier["seq"] += 1
+                advanced = True
+            if advanced and checkpoint_path:
+                out.flush()
+                write_checkpoint(
+                    checkpoint_path,
+                    {
+                        "input": os.path.abspath(input_path),
+                        "row": frontier["row"],
+                        "offset": frontier["offset"],
+                        "output_bytes": out.tell(),
+                        "chunk_size": chunk_size,
+                        "finished": sorted(chunk[:2] for chunk in finished.values()),
+                    },
+                )
+            if report:
+                report(rows_done, errors, time.perf_counter() - started)
+
+        pending = deque()
+        try:
+            rows = READERS[fmt](f, start["offset"])
+            for seq, (first_row, end_offset, chunk) in enumerate(
+                chunked(rows, chunk_size, start["row"])
+            ):
+                next_row = first_row + len(chunk)
+                done = written.get(first_row, first_row)
+                if done >= next_row:
+                    future = Future()
+                    future.set_result((b"", 0, 0))
+                else:
+                    future = executor.submit(compile_chunk, done, chunk[done - first_row :])
+                pending.append((seq, (first_row, next_row, end_offset), future))
+
+                while len(pending) >= max_in_flight:
+                    if ordered:
+                        done_seq, chunk_end, done = pending.popleft()
+                        write(done_seq, chunk_end, done.result())
+                    else:
+                        wait([entry[2] for entry in pending], return_when=FIRST_COMPLETED)
+                        for entry in [entry for entry in pending if entry[2].done()]:
+                            pending.remove(entry)
+                            write(entry[0], entry[1], entry[2].result())
+
+            while pending:
+                done_seq, chunk_end, done = pending.popleft()
+                write(done_seq, chunk_end, done.result())
+        finally:
+            executor.shutdown(wait=True)
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows_done,
+        "errors": errors,
+        "seconds": seconds,
+        "rows_per_second": rows_done / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile prompts for every row of a file.")
+    parser.add_argument("input", help="JSONL or CSV input file")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output file")
+    parser.add_argument(
+        "--format", choices=sorted(READERS), help="input format (default: by extension)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: CPU count, 0: inline)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per work unit"
+    )
+    parser.add_argument(
+        "--unordered", action="store_true", help="write results as they complete, not in order"
+    )
+    parser.add_argument("--checkpoint", help="file to record progress in")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint")
+    args = parser.parse_args(argv)
+
+    last_report = [0.0]
+
+    def report(rows, errors, seconds):
+        if seconds - last_report[0] >= 5:
+            last_report[0] = seconds
+            print(f"{rows} rows ({errors} errors), {rows / seconds:.0f} rows/sec", file=sys.stderr)
+
+    try:
+        stats = bulk_compile(
+            args.input,
+            args.output,
+            fmt=args.format,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            ordered=not args.unordered,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            report=report,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(
+        f"Compiled {stats['rows']} rows ({stats['errors']} errors) in {stats['seconds']:.1f}s, "
+        f"{stats['rows_per_second']:.0f} rows/sec",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Bounded in-memory cache for compiled prompts.
+Adapters are pure functions of the prompt object, so a compiled prompt can be
+reused for any request with the same model and sanitized payload.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def payload_key(model, payload):
+    """
+    Build a cache key from a model name and a sanitized payload.
+
+    Args:
+        model: Target model name
+        payload: Sanitized payload dictionary
+
+    Returns:
+        tuple: (model, digest of the canonical JSON form of the payload)
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+    return model, digest
+
+
+def store_key(cache_key, version):
+    """
+    Build a persistent store key (see prompt_store.py) from a cache key.
+
+    Args:
+        cache_key: Key built by payload_key
+        version: Version of the model's adapter (see compiler.adapter_version)
+
+    Returns:
+        bytes: 16-byte digest of the adapter version, model and payload
+    """
+    model, digest = cache_key
+    material = b"\0".join((version.encode("utf-8"), model.encode("utf-8"), digest))
+    return hashlib.blake2b(material, digest_size=16).digest()
+
+
+class CompileCache:
+    """
+    LRU cache with optional TTL and a cap on total stored bytes.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_entries=4096, ttl_seconds=None, max_bytes=None):
+        """
+        Initialize compile cache.
+
+        Args:
+            max_entries: Maximum number of cached prompts
+            ttl_seconds: Seconds an entry stays valid (None for no expiry)
+            max_bytes: Maximum total size of cached prompts (None for no cap)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a compiled prompt.
+
+        Args:
+            key: Key built by payload_key
+
+        Returns:
+            str: Cached prompt, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._discard(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a compiled prompt, evicting least recently used entries as needed.
+
+        Args:
+            key: Key built by payload_key
+            value: Compiled prompt string
+        """
+        size = sys.getsizeof(value)
+        if self.max_entries <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+
+        expires_at = None
+        if self.ttl_seconds:
+            expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        Remove an entry.
+
+        Args:
+            key: Key of the entry
+
+        Returns:
+            bool: Whether the key was present
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._discard(key)
+            return True
+
+    def clear(self):
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Size, capacity and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
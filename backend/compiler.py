@@ -1,9 +1,117 @@
-from registry import ADAPTER_REGISTRY
+from registry import ADAPTER_REGISTRY, MODALITY_MODELS
+from schema import PROMPT_TYPES
+from cache import payload_key, store_key
+
+
+def adapter_version(adapter) -> str:
+    """
+    Version of an adapter's output, part of every persistent store key.
+
+    The adapter's `version` attribute when set, else the fingerprint of its
+    render plan, which changes with its spec and with the code of its
+    transforms (not with globals they read). Adapters without a plan, or
+    that override compile() around it, add their class path; bump `version`
+    when such code changes.
+    """
+    version = getattr(adapter, "version", None)
+    if version:
+        return str(version)
+    plan = getattr(adapter, "plan", None)
+    if plan is not None and adapter.compile is plan.render:
+        return plan.fingerprint
+    path = f"{type(adapter).__module__}.{type(adapter).__qualname__}"
+    return path if plan is None else f"{path}:{plan.fingerprint}"
 
 
 class PromptCompiler:
+    def __init__(self, cache=None, store=None):
+        self.cache = cache
+        self.store = store
+
     def compile(self, prompt, model_name: str) -> str:
         adapter = ADAPTER_REGISTRY.get(model_name)
         if not adapter:
             raise ValueError(f"Unsupported model: {model_name}")
         return adapter.compile(prompt)
+
+    def compile_payload(self, modality: str, payload: dict, model_name: str) -> str:
+        """
+        Build the prompt object for a sanitized payload and compile it.
+
+        When a cache is configured, repeated payloads are served from it
+        without constructing the prompt object. A persistent store (see
+        prompt_store.py) is the next tier: it is read on cache misses and
+        keeps every prompt compiled, across restarts and worker processes.
+
+        Raises:
+            TypeError: If the payload does not match the modality's schema
+            ValueError: If the model is not supported
+        """
+        key = None
+        if self.cache is not None or self.store is not None:
+            key = payload_key(model_name, payload)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        stored_key = None
+        if self.store is not None:
+            adapter = ADAPTER_REGISTRY.get(model_name)
+            if not adapter:
+                raise ValueError(f"Unsupported model: {model_name}")
+            version = adapter_version(adapter)
+            stored_key = store_key(key, version)
+            stored = self.store.get(stored_key)
+            if stored is not None:
+                if self.cache is not None:
+                    self.cache.set(key, stored)
+                return stored
+
+        result = self.compile(PROMPT_TYPES[modality].from_payload(payload), model_name)
+
+        if self.cache is not None:
+            self.cache.set(key, result)
+        if stored_key is not None:
+            self.store.put(stored_key, model_name, version, result)
+        return result
+
+    def compile_all(self, prompt, modality: str) -> dict:
+        """Compile one prompt for every registered model of a modality."""
+        models = MODALITY_MODELS.get(modality)
+        if not models:
+            raise ValueError(f"Unsupported modality: {modality}")
+        return {model: ADAPTER_REGISTRY[model].compile(prompt) for model in models}
+
+    def variant_compilers(self, prompt, model_names, varying) -> dict:
+        """
+        Compile functions for variants of a prompt, one per model.
+
+        Spec adapters get their render plan specialized to the prompt (see
+        RenderPlan.specialize): segments that read none of the varying
+        fields are rendered once, here, so each variant only re-renders
+        the rest. Other adapters compile every variant in full.
+
+        Args:
+            prompt: Base prompt the variants are derived from
+            model_names: Models to compile for
+            varying: Names of the fields that differ between variants
+
+        Returns:
+            dict: Model name -> function (prompt) -> str
+
+        Raises:
+            ValueError: If a model is not supported
+        """
+        compilers = {}
+        for model in model_names:
+            adapter = ADAPTER_REGISTRY.get(model)
+            if not adapter:
+                raise ValueError(f"Unsupported model: {model}")
+            plan = getattr(adapter, "plan", None)
+            # Subclasses may override compile() around their plan
+            if plan is not None and adapter.compile is plan.render:
+                compilers[model] = plan.specialize(prompt, varying).render
+            else:
+                compilers[model] = adapter.compile
+        return compilers
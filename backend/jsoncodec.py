@@ -0,0 +1,88 @@
+"""
+JSON encoding and decoding for the API.
+
+Uses orjson when it is installed and falls back to the standard library
+json module otherwise. Both backends produce compact UTF-8 output with keys
+in insertion order, so responses are the same whichever one is active.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Name of the active backend, reported by /stats
+BACKEND = "orjson" if orjson is not None else "json"
+
+# Dates are handed to the Flask default hook, which formats them as HTTP
+# dates like the stdlib path does; non-str keys are stringified like json
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+)
+
+_default = DefaultJSONProvider.default
+
+
+def stdlib_dumps(obj):
+    """Serialize to compact UTF-8 JSON bytes with the json module."""
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def stdlib_loads(data):
+    """Deserialize JSON text or UTF-8 bytes with the json module."""
+    return json.loads(data)
+
+
+if orjson is not None:
+
+    def dumps(obj):
+        """
+        Serialize an object to compact JSON.
+
+        Args:
+            obj: JSON-serializable object
+
+        Returns:
+            bytes: UTF-8 encoded JSON
+        """
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+
+else:
+    dumps = stdlib_dumps
+    loads = stdlib_loads
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by dumps/loads above.
+
+    Used for both request.json and jsonify. Calls that pass json module
+    keyword arguments, and pretty-printed debug responses, go through the
+    Flask default provider instead.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
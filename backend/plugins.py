@@ -0,0 +1,183 @@
+"""
+Discovery of adapter plugins through package entry points.
+
+A distribution provides adapters by declaring entry points in the
+"prompt_generator.adapters" group, named "<modality>.<model>" and pointing
+at the adapter class, e.g. in its pyproject.toml:
+
+    [project.entry-points."prompt_generator.adapters"]
+    "image.house-style" = "house_adapters.image:HouseStyleAdapter"
+
+Reading entry points means opening the metadata of every installed
+distribution, so the discovered index is cached on disk. The cache is keyed
+by the names of the distribution metadata directories on sys.path (and
+their directories' modification times), which change whenever anything is
+installed, upgraded or removed; while the key matches, startup costs one
+directory listing per sys.path entry however many plugins are installed.
+Plugin classes themselves are only imported when first used.
+
+The index names the classes that will be imported, so it lives in the
+user's own cache directory, is written readable by its owner only, and is
+ignored unless it is owned by the current user and writable by no one else.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "prompt_generator.adapters"
+
+_METADATA_SUFFIXES = (".dist-info", ".egg-info")
+
+
+def default_index_path():
+    """
+    Default location of the discovered-plugin index cache, per user; an
+    empty string (no cache) when there is no cache or home directory.
+    """
+    cache_home = os.getenv("XDG_CACHE_HOME")
+    if not cache_home:
+        home = os.path.expanduser("~")
+        if home == "~":
+            return ""
+        cache_home = os.path.join(home, ".cache")
+    return os.path.join(cache_home, "prompt-generator", "adapter-index.json")
+
+
+def distributions_key(paths=None):
+    """
+    Fingerprint of the distributions installed on the given paths.
+
+    Args:
+        paths: Import path entries (defaults to sys.path)
+
+    Returns:
+        str: Hex digest that changes when a distribution is added,
+            removed, upgraded or reinstalled
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in sys.path if paths is None else paths:
+        directory = entry or "."
+        try:
+            names = sorted(
+                name for name in os.listdir(directory) if name.endswith(_METADATA_SUFFIXES)
+            )
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            # Zip files and missing directories hold no metadata to watch
+            continue
+        digest.update(f"{entry}\0{mtime}\0".encode())
+        digest.update("\0".join(names).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def scan_entry_points(group=ENTRY_POINT_GROUP, modalities=None):
+    """
+    Read adapter entry points from the installed distributions.
+
+    Args:
+        group: Entry point group to read
+        modalities: Accepted modalities, or None to accept any
+
+    Returns:
+        dict: Model name -> (modality, "module:Class"); the first
+            distribution on sys.path wins when a model is declared twice
+    """
+    from importlib.metadata import entry_points
+
+    points = entry_points()
+    points = points.select(group=group) if hasattr(points, "select") else points.get(group, ())
+
+    adapters = {}
+    for point in points:
+        modality, dot, model = point.name.partition(".")
+        if not dot or not model or ":" not in point.value:
+            logger.warning(f"Ignoring adapter entry point '{point.name} = {point.value}'")
+            continue
+        if modalities is not None and modality not in modalities:
+            logger.warning(f"Ignoring adapter '{model}' of unknown modality '{modality}'")
+            continue
+        adapters.setdefault(model, (modality, point.value))
+    return adapters
+
+
+def discover_adapters(group=ENTRY_POINT_GROUP, modalities=None, index_path=None):
+    """
+    Adapter plugins from entry points, served from the on-disk index when
+    the installed distributions have not changed.
+
+    Args:
+        group: Entry point group to read
+        modalities: Accepted modalities, or None to accept any
+        index_path: Index cache file; None uses default_index_path() and
+            an empty string disables the cache
+
+    Returns:
+        dict: Model name -> (modality, "module:Class")
+    """
+    if index_path is None:
+        index_path = default_index_path()
+    key = f"{group}:{sorted(modalities) if modalities is not None else '*'}:{distributions_key()}"
+
+    if index_path:
+        try:
+            index = _read_index(index_path)
+            if index is not None and index.get("key") == key:
+                return {model: tuple(entry) for model, entry in index["adapters"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    adapters = scan_entry_points(group, modalities)
+
+    if index_path and _index_dir_writable(index_path):
+        try:
+            _write_index(index_path, {"key": key, "adapters": adapters})
+        except OSError as e:
+            logger.warning(f"Could not write adapter index {index_path}: {e}")
+    return adapters
+
+
+def _index_dir_writable(path):
+    """Whether the index's directory exists (or can be made) and is writable."""
+    directory = os.path.dirname(path) or "."
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError:
+        logger.debug(f"Not caching the adapter index: cannot create {directory}")
+        return False
+    return os.access(directory, os.W_OK)
+
+
+def _read_index(path):
+    """The parsed index file, or None if another user could have written it."""
+    with open(path, encoding="utf-8") as f:
+        status = os.fstat(f.fileno())
+        if hasattr(os, "getuid") and (status.st_uid != os.getuid() or status.st_mode & 0o022):
+            logger.warning(
+                f"Ignoring adapter index {path}: it must be owned, and only be "
+                "writable, by the current user"
+            )
+            return None
+        return json.load(f)
+
+
+def _write_index(path, index):
+    """
+    Atomically replace the index file, so readers never see half of it.
+    mkstemp creates the file with mode 0600, which os.replace keeps.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".adapter-index-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
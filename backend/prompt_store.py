@@ -0,0 +1,558 @@
+"""
+Persistent, content-addressed store of compiled prompts.
+
+Prompts are appended to a segment file and never rewritten in place. Each
+is keyed by a digest of its adapter's version, the model and the sanitized
+payload (cache.store_key), so a key always names the same prompt: it is
+written once, and an adapter change writes new keys instead of replacing
+old prompts. That also answers "which prompt did we send for this payload
+and model" for as long as the record is kept:
+
+    python prompt_store.py get /var/lib/prompts/store request.json
+    python prompt_store.py compact /var/lib/prompts/store --older-than 90
+    python prompt_store.py stats /var/lib/prompts/store
+
+Keys are found through an open-addressing hash index next to the segment
+(PATH.idx), memory-mapped like the segment: 16-byte slots holding the first
+8 bytes of a key and its record's offset, doubled when MAX_LOAD of them
+are full. A lookup reads a slot or two and one record from the maps
+without taking any lock. Writes, index growth and compaction hold a file
+lock (PATH.lock), so every worker process can share one store; a process
+picks up files another one replaced (by growth or compaction) on its next
+write, and until then reads the files it has mapped. The index can always
+be rebuilt from the segment: a missing or damaged index is, and records
+appended by a writer that died before indexing them are indexed on the
+next write.
+"""
+
+import argparse
+import contextlib
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+from cache import payload_key, store_key
+
+_SEGMENT_MAGIC = b"PGPS0001"
+_INDEX_MAGIC = b"PGPI0001"
+# magic, slots, entries, segment bytes indexed
+_HEADER = struct.Struct("<8sQQQ")
+_HEADER_SIZE = 64
+# first 8 bytes of the key, record offset (0 marks an empty slot)
+_SLOT = struct.Struct("<QQ")
+# key, created (Unix time), model, version and prompt lengths; then the
+# UTF-8 model, version and prompt
+_RECORD = struct.Struct("<16sdBBI")
+
+# Smallest index, and the share of slots filled before it doubles
+MIN_SLOTS = 1024
+MAX_LOAD = 0.7
+
+
+class StoredPrompt(NamedTuple):
+    """A record of the store."""
+
+    key: bytes
+    model: str
+    version: str
+    created: float
+    prompt: str
+
+
+def _slot_count(entries, minimum=MIN_SLOTS):
+    """Power-of-two slot count holding entries within MAX_LOAD."""
+    slots = minimum
+    while entries > slots * MAX_LOAD:
+        slots *= 2
+    return slots
+
+
+def _place(index, mask, key_hash, offset):
+    """Write a slot into the first free place of its probe sequence."""
+    i = key_hash & mask
+    while _SLOT.unpack_from(index, _HEADER_SIZE + i * _SLOT.size)[1]:
+        i = (i + 1) & mask
+    _SLOT.pack_into(index, _HEADER_SIZE + i * _SLOT.size, key_hash, offset)
+
+
+def _key_hash(key):
+    return int.from_bytes(key[:8], "little")
+
+
+class PromptStore:
+    """
+    Append-only store of compiled prompts on disk, keyed by store_key.
+    Safe to share between threads and processes.
+    """
+
+    def __init__(self, path, min_slots=MIN_SLOTS):
+        """
+        Open a store, creating its files if missing.
+
+        Args:
+            path: Segment file; the index and lock files get ".idx" and
+                ".lock" appended
+            min_slots: Smallest index size (a power of two)
+        """
+        self.path = path
+        self.index_path = path + ".idx"
+        self.min_slots = min_slots
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._segment_fd = None
+        self._index_fd = None
+        self._segment = None
+        # (index map, slot mask), swapped as one when the index is replaced
+        self._table = None
+        self._lock = threading.Lock()
+        # Held while the segment fd or map changes: lock-free readers remap
+        # the segment when it has grown, and must not see a closed fd
+        self._map_lock = threading.Lock()
+        self._lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            self._open()
+            self._catch_up()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self):
+        """(Re)open both files, initializing new ones. Called locked."""
+        segment_fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        if os.fstat(segment_fd).st_size == 0:
+            os.write(segment_fd, _SEGMENT_MAGIC)
+        elif os.pread(segment_fd, len(_SEGMENT_MAGIC), 0) != _SEGMENT_MAGIC:
+            os.close(segment_fd)
+            raise ValueError(f"Not a prompt store segment: {self.path}")
+
+        index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = os.pread(index_fd, _HEADER.size, 0)
+        if len(header) < _HEADER.size or header[:8] != _INDEX_MAGIC:
+            # New or damaged index: start empty and index the whole segment
+            os.ftruncate(index_fd, 0)
+            os.ftruncate(index_fd, _HEADER_SIZE + self.min_slots * _SLOT.size)
+            os.pwrite(
+                index_fd, _HEADER.pack(_INDEX_MAGIC, self.min_slots, 0, len(_SEGMENT_MAGIC)), 0
+            )
+
+        with self._map_lock:
+            self._close_files()
+            self._segment_fd = segment_fd
+            self._index_fd = index_fd
+            self._segment = mmap.mmap(segment_fd, 0, access=mmap.ACCESS_READ)
+        index = mmap.mmap(index_fd, 0)
+        self._table = (index, _HEADER.unpack_from(index, 0)[1] - 1)
+
+    def _map_segment(self):
+        """Map the segment file as it is now; safe to call without the store lock."""
+        with self._map_lock:
+            fd = self._segment_fd
+            if fd is None:
+                raise ValueError("Prompt store is closed")
+            self._segment = segment = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        return segment
+
+    def _close_files(self):
+        """Close both files. Called with the map lock held."""
+        # Maps are left to the garbage collector: readers in other threads
+        # may still be using them
+        for fd in (self._segment_fd, self._index_fd):
+            if fd is not None:
+                os.close(fd)
+        self._segment_fd = self._index_fd = None
+
+    def _sync(self):
+        """Reopen files replaced by another process and index unindexed records."""
+        try:
+            replaced = (
+                os.stat(self.path).st_ino != os.fstat(self._segment_fd).st_ino
+                or os.stat(self.index_path).st_ino != os.fstat(self._index_fd).st_ino
+            )
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._open()
+        self._catch_up()
+
+    def _catch_up(self):
+        """Index records past the indexed end; truncate a torn last record."""
+        index = self._table[0]
+        indexed = _HEADER.unpack_from(index, 0)[3]
+        size = os.fstat(self._segment_fd).st_size
+        if indexed >= size:
+            return
+
+        segment = self._map_segment()
+        offset = indexed
+        while offset + _RECORD.size <= size:
+            key, _, model_length, version_length, prompt_length = _RECORD.unpack_from(
+                segment, offset
+            )
+            end = offset + _RECORD.size + model_length + version_length + prompt_length
+            if end > size:
+                break
+            if self._find(key) is None:
+                self._insert(key, offset)
+            offset = end
+        if offset < size:
+            # A writer died mid-record; no index entry points into it
+            os.ftruncate(self._segment_fd, offset)
+            self._map_segment()
+        self._set_indexed(offset)
+
+    def _segment_covering(self, end):
+        """Segment map at least end bytes long, or None."""
+        segment = self._segment
+        if end > len(segment):
+            # Appended since we mapped it, by this or another process
+            try:
+                segment = self._map_segment()
+            except (OSError, ValueError):
+                return None
+            if end > len(segment):
+                return None
+        return segment
+
+    def _find(self, key):
+        """
+        (segment map, offset) of the record of key, or None. Read the record
+        from that map, where its key was checked: the store's own map may
+        since have been replaced, e.g. by a compaction in another thread.
+        """
+        key_hash = _key_hash(key)
+        index, mask = self._table
+        i = key_hash & mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(index, _HEADER_SIZE + i * _SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == key_hash:
+                segment = self._segment
+                if offset + _RECORD.size > len(segment):
+                    segment = self._segment_covering(offset + _RECORD.size)
+                if segment is not None and segment[offset : offset + 16] == key:
+                    return segment, offset
+            i = (i + 1) & mask
+
+    def _extend(self, segment, offset, end):
+        """
+        A map of the segment holding the record at offset up to end, or None.
+        A longer map of the current segment file is only used if it holds
+        the same key at offset, and so the same record.
+        """
+        if end <= len(segment):
+            return segment
+        longer = self._segment_covering(end)
+        if longer is None or longer[offset : offset + 16] != segment[offset : offset + 16]:
+            return None
+        return longer
+
+    def _read(self, segment, offset):
+        """The record at offset of a segment map found by _find, or None."""
+        key, created, model_length, version_length, prompt_length = _RECORD.unpack_from(
+            segment, offset
+        )
+        start = offset + _RECORD.size
+        middle = start + model_length + version_length
+        segment = self._extend(segment, offset, middle + prompt_length)
+        if segment is None:
+            return None
+        return StoredPrompt(
+            key,
+            segment[start : start + model_length].decode("utf-8"),
+            segment[start + model_length : middle].decode("utf-8"),
+            created,
+            segment[middle : middle + prompt_length].decode("utf-8"),
+        )
+
+    def _insert(self, key, offset):
+        """Add an index slot, doubling the index when it is full. Called locked."""
+        _, slots, entries, _ = _HEADER.unpack_from(self._table[0], 0)
+        if entries + 1 > slots * MAX_LOAD:
+            self._replace_index(self._slot_offsets(), slots * 2)
+        index, mask = self._table
+        _place(index, mask, _key_hash(key), offset)
+        magic, slots, entries, indexed = _HEADER.unpack_from(index, 0)
+        _HEADER.pack_into(index, 0, magic, slots, entries + 1, indexed)
+
+    def _set_indexed(self, end):
+        index = self._table[0]
+        magic, slots, entries, _ = _HEADER.unpack_from(index, 0)
+        _HEADER.pack_into(index, 0, magic, slots, entries, end)
+
+    def _slot_offsets(self):
+        """(key hash, offset) of every full slot."""
+        index = self._table[0]
+        return [
+            (key_hash, offset)
+            for key_hash, offset in _SLOT.iter_unpack(index[_HEADER_SIZE:])
+            if offset
+        ]
+
+    def _write_index(self, slots, entries, indexed):
+        """Write a new index file; returns its temporary path. Called locked."""
+        directory = os.path.dirname(self.index_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".prompt-index-")
+        try:
+            os.ftruncate(fd, _HEADER_SIZE + slots * _SLOT.size)
+            with mmap.mmap(fd, 0) as index:
+                mask = slots - 1
+                for key_hash, offset in entries:
+                    _place(index, mask, key_hash, offset)
+                _HEADER.pack_into(index, 0, _INDEX_MAGIC, slots, len(entries), indexed)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            os.close(fd)
+        return tmp_path
+
+    def _replace_index(self, entries, slots):
+        """Swap in an index of the given size holding entries. Called locked."""
+        indexed = _HEADER.unpack_from(self._table[0], 0)[3]
+        os.replace(self._write_index(slots, entries, indexed), self.index_path)
+        self._open()
+
+    def get(self, key):
+        """
+        Look up a compiled prompt.
+
+        Args:
+            key: Key built by store_key
+
+        Returns:
+            str: Stored prompt, or None if the key is not stored
+        """
+        found = self._find(key)
+        if found is not None:
+            # Only the prompt is decoded; _find has mapped the record header
+            segment, offset = found
+            lengths = _RECORD.unpack_from(segment, offset)[2:]
+            start = offset + _RECORD.size + lengths[0] + lengths[1]
+            segment = self._extend(segment, offset, start + lengths[2])
+            if segment is not None:
+                self.hits += 1
+                return segment[start : start + lengths[2]].decode("utf-8")
+        self.misses += 1
+        return None
+
+    def record(self, key):
+        """
+        Look up a stored prompt with its model, version and creation time.
+
+        Args:
+            key: Key built by store_key
+
+        Returns:
+            StoredPrompt: The record, or None if the key is not stored
+        """
+        found = self._find(key)
+        return None if found is None else self._read(*found)
+
+    def put(self, key, model, version, prompt):
+        """
+        Store a compiled prompt, unless its key is already stored.
+
+        Args:
+            key: Key built by store_key
+            model: Model the prompt was compiled for
+            version: Adapter version in the key (see compiler.adapter_version)
+            prompt: Compiled prompt
+
+        Returns:
+            bool: Whether a record was written
+
+        Raises:
+            ValueError: If the model name or version exceeds 255 bytes
+        """
+        model_bytes = model.encode("utf-8")
+        version_bytes = version.encode("utf-8")
+        if len(model_bytes) > 255 or len(version_bytes) > 255:
+            raise ValueError("Model names and adapter versions are limited to 255 bytes")
+        prompt_bytes = prompt.encode("utf-8")
+        record = (
+            _RECORD.pack(
+                key, time.time(), len(model_bytes), len(version_bytes), len(prompt_bytes)
+            )
+            + model_bytes
+            + version_bytes
+            + prompt_bytes
+        )
+
+        with self._locked():
+            self._sync()
+            if self._find(key) is not None:
+                return False
+            offset = _HEADER.unpack_from(self._table[0], 0)[3]
+            os.write(self._segment_fd, record)
+            self._insert(key, offset)
+            self._set_indexed(offset + len(record))
+            self.writes += 1
+        return True
+
+    def compact(self, keep=None):
+        """
+        Rewrite the store without the records keep() rejects.
+
+        Kept records are copied in their original order into a new segment,
+        indexed by a new index sized for them, and both replace the old
+        files. Other processes switch to them on their next write.
+
+        Args:
+            keep: Function (StoredPrompt) -> bool; None keeps every record
+
+        Returns:
+            dict: Records kept and dropped, and segment bytes before and after
+        """
+        with self._locked():
+            self._sync()
+            # Every record is indexed and no one can append while we hold the lock
+            segment = self._map_segment()
+            offsets = sorted(offset for _, offset in self._slot_offsets())
+            directory = os.path.dirname(self.path) or "."
+            fd, segment_path = tempfile.mkstemp(dir=directory, prefix=".prompt-segment-")
+            kept = []
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(_SEGMENT_MAGIC)
+                    position = len(_SEGMENT_MAGIC)
+                    for offset in offsets:
+                        record = self._read(segment, offset)
+                        if record is None or (keep is not None and not keep(record)):
+                            continue
+                        end = offset + _RECORD.size + sum(_RECORD.unpack_from(segment, offset)[2:])
+                        out.write(segment[offset:end])
+                        kept.append((_key_hash(record.key), position))
+                        position += end - offset
+                    out.flush()
+                    os.fsync(out.fileno())
+                index_path = self._write_index(
+                    _slot_count(len(kept), self.min_slots), kept, position
+                )
+            except BaseException:
+                os.unlink(segment_path)
+                raise
+
+            before = _HEADER.unpack_from(self._table[0], 0)[3]
+            # Segment first: a reader pairing the new segment with the old
+            # index only sees keys that don't match, never a wrong prompt
+            os.replace(segment_path, self.path)
+            os.replace(index_path, self.index_path)
+            self._open()
+        return {
+            "kept": len(kept),
+            "dropped": len(offsets) - len(kept),
+            "bytes_before": before,
+            "bytes_after": position,
+        }
+
+    def stats(self):
+        """
+        Get store counters.
+
+        Returns:
+            dict: Entries, index and segment sizes and hit/miss counters
+        """
+        index = self._table[0]
+        _, slots, entries, indexed = _HEADER.unpack_from(index, 0)
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "slots": slots,
+            "segment_bytes": indexed,
+            "index_bytes": len(index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return _HEADER.unpack_from(self._table[0], 0)[2]
+
+    def close(self):
+        """Release the mappings and file descriptors."""
+        with self._lock, self._map_lock:
+            self._segment.close()
+            self._table[0].close()
+            self._close_files()
+            os.close(self._lock_fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and compact a prompt store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="print the stored prompt for a /generate request")
+    get.add_argument("store", help="segment file (PROMPT_STORE_PATH)")
+    get.add_argument("request", help="JSON file with modality, model and payload")
+    get.add_argument("--version", help="adapter version (default: the current one)")
+
+    compact = commands.add_parser("compact", help="drop records and rewrite the store")
+    compact.add_argument("store", help="segment file (PROMPT_STORE_PATH)")
+    compact.add_argument(
+        "--older-than", type=float, metavar="DAYS", help="drop records older than DAYS"
+    )
+    compact.add_argument(
+        "--current-only", action="store_true", help="drop records of past adapter versions"
+    )
+
+    stats = commands.add_parser("stats", help="print entry and size counters")
+    stats.add_argument("store", help="segment file (PROMPT_STORE_PATH)")
+    args = parser.parse_args(argv)
+
+    # Imported here: loading the service reads its settings from the environment
+    from compiler import adapter_version
+    from registry import ADAPTER_REGISTRY
+
+    store = PromptStore(args.store)
+    try:
+        if args.command == "get":
+            from service import prepare_request
+
+            with open(args.request, encoding="utf-8") as f:
+                data = json.load(f)
+            payload, error = prepare_request(data)
+            if error:
+                parser.error(error[0]["error"])
+            version = args.version or adapter_version(ADAPTER_REGISTRY[data["model"]])
+            record = store.record(store_key(payload_key(data["model"], payload), version))
+            if record is None:
+                print("Not stored", file=sys.stderr)
+                return 1
+            print(json.dumps({**record._asdict(), "key": record.key.hex()}, indent=2))
+        elif args.command == "compact":
+            cutoff = None if args.older_than is None else time.time() - args.older_than * 86400
+            current = {
+                (model, adapter_version(ADAPTER_REGISTRY[model])) for model in ADAPTER_REGISTRY
+            }
+
+            def keep(record):
+                if cutoff is not None and record.created < cutoff:
+                    return False
+                return not args.current_only or (record.model, record.version) in current
+
+            print(json.dumps(store.compact(keep)))
+        else:
+            print(json.dumps(store.stats()))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,53 +3,153 @@ Simple in-memory rate limiter for Flask API.
 For production, use Redis-backed rate limiting.
 """
 
+import math
+import os
+import sys
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
+from typing import NamedTuple
 from flask import request, jsonify
-from collections import defaultdict, deque
+
+
+class RateLimitDecision(NamedTuple):
+    """Outcome of a rate limit check, with everything needed for headers."""
+
+    allowed: bool
+    remaining: int
+    limit: int
+    reset: int  # seconds until the next request is allowed
+
+
+# Allowance for float rounding when a burst lands exactly on the limit
+_EPSILON = 1e-9
+
+
+def gcra_update(tat, now, emission_interval, window_seconds, cost=1):
+    """
+    Apply one GCRA (generic cell rate algorithm) decision.
+
+    Args:
+        tat: Stored theoretical arrival time for the key (None if unseen)
+        now: Current time in seconds
+        emission_interval: Seconds of budget one request consumes
+        window_seconds: Burst tolerance; a full window allows max_requests
+        cost: Number of request slots this call consumes
+
+    Returns:
+        tuple: (allowed, new theoretical arrival time)
+    """
+    tat = now if tat is None or tat < now else tat
+    new_tat = tat + emission_interval * cost
+    if new_tat - now > window_seconds + _EPSILON:
+        return False, tat
+    return True, new_tat
+
+
+def gcra_remaining(tat, now, emission_interval, window_seconds):
+    """Requests still allowed right now for a stored arrival time."""
+    backlog = tat - now if tat is not None and tat > now else 0.0
+    return max(0, int((window_seconds - backlog) / emission_interval + _EPSILON))
+
+
+def gcra_reset_time(tat, now, emission_interval, window_seconds, cost=1):
+    """Whole seconds until a request of cost is allowed (0 if allowed now)."""
+    if tat is None:
+        return 0
+    wait = tat + emission_interval * cost - window_seconds - now
+    return max(0, math.ceil(wait - _EPSILON))
 
 
 class RateLimiter:
     """
-    Token bucket rate limiter implementation.
-    Tracks requests per IP address.
+    GCRA rate limiter, equivalent to a token bucket of max_requests tokens
+    refilled evenly over window_seconds.
+    Stores a single timestamp per IP address, so checks are O(1) in time
+    and memory regardless of the limit.
+
+    Keys are kept in least-recently-seen order. Each check drops a few idle
+    keys from the front (an idle key has a full budget, so forgetting it
+    changes nothing), and max_keys caps how many clients are tracked.
+    Safe to share between threads.
     """
 
-    def __init__(self, max_requests=60, window_seconds=60):
+    # Idle keys dropped per check; keeps sweeping amortized O(1)
+    SWEEP_BATCH = 2
+
+    def __init__(self, max_requests=60, window_seconds=60, max_keys=100000):
         """
         Initialize rate limiter.
 
         Args:
             max_requests: Maximum requests allowed in time window
             window_seconds: Time window in seconds
+            max_keys: Maximum number of tracked clients; the least recently
+                seen client is forgotten when exceeded
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(deque)
+        self.max_keys = max_keys
+        self.emission_interval = window_seconds / max_requests
+        # Theoretical arrival time per key: when its bucket would be full again
+        self.tats = OrderedDict()
+        self.evicted_keys = 0
+        self._lock = threading.Lock()
+
+    def check(self, key, cost=1):
+        """
+        Check and record a request in a single pass.
 
-    def is_allowed(self, key):
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Number of request slots this call consumes
+
+        Returns:
+            RateLimitDecision: Whether the request is allowed, plus the
+            remaining budget, limit and reset time after this call (for a
+            rejected request, the seconds until its cost fits)
+        """
+        # Inlined GCRA helpers: this runs on every request
+        tats = self.tats
+        with self._lock:
+            now = time.time()
+            stored = tats.get(key)
+            if stored is None:
+                self._sweep(now)
+                tat = now
+            else:
+                tats.move_to_end(key)
+                tat = stored if stored > now else now
+
+            new_tat = tat + self.emission_interval * cost
+            allowed = new_tat - now <= self.window_seconds + _EPSILON
+            if allowed:
+                tats[key] = tat = new_tat
+
+        backlog = tat - now
+        remaining = int((self.window_seconds - backlog) / self.emission_interval + _EPSILON)
+        # A rejected request waits until its own cost fits, not just one slot
+        wait = backlog + self.emission_interval * (1 if allowed else cost) - self.window_seconds
+        return RateLimitDecision(
+            allowed,
+            remaining if remaining > 0 else 0,
+            self.max_requests,
+            math.ceil(wait - _EPSILON) if wait > _EPSILON else 0,
+        )
+
+    def is_allowed(self, key, cost=1):
         """
         Check if request is allowed for given key (e.g., IP address).
 
         Args:
             key: Identifier for rate limiting (usually IP address)
+            cost: Number of request slots this call consumes
 
         Returns:
             bool: True if request is allowed, False otherwise
         """
-        now = time.time()
-        cutoff = now - self.window_seconds
-
-        # Remove old requests outside the window
-        while self.requests[key] and self.requests[key][0] < cutoff:
-            self.requests[key].popleft()
-
-        # Check if under limit
-        if len(self.requests[key]) < self.max_requests:
-            self.requests[key].append(now)
-            return True
-
-        return False
+        return self.check(key, cost).allowed
 
     def get_remaining(self, key):
         """
@@ -61,14 +161,9 @@ class RateLimiter:
         Returns:
             int: Number of remaining requests
         """
-        now = time.time()
-        cutoff = now - self.window_seconds
-
-        # Clean up old requests
-        while self.requests[key] and self.requests[key][0] < cutoff:
-            self.requests[key].popleft()
-
-        return max(0, self.max_requests - len(self.requests[key]))
+        with self._lock:
+            tat = self.tats.get(key)
+        return gcra_remaining(tat, time.time(), self.emission_interval, self.window_seconds)
 
     def get_reset_time(self, key):
         """
@@ -78,29 +173,163 @@ class RateLimiter:
             key: Identifier for rate limiting
 
         Returns:
-            int: Seconds until limit resets
+            int: Seconds until the next request is allowed
         """
-        if not self.requests[key]:
-            return 0
+        with self._lock:
+            tat = self.tats.get(key)
+        return gcra_reset_time(tat, time.time(), self.emission_interval, self.window_seconds)
 
-        oldest_request = self.requests[key][0]
-        reset_time = oldest_request + self.window_seconds
-        return max(0, int(reset_time - time.time()))
+    def _sweep(self, now):
+        """
+        Drop idle keys from the front and enforce max_keys before an insert.
+        Called with the lock held.
+        """
+        tats = self.tats
+        for _ in range(self.SWEEP_BATCH):
+            if not tats:
+                return
+            oldest_key = next(iter(tats))
+            if tats[oldest_key] > now:
+                break
+            del tats[oldest_key]
+
+        while len(tats) >= self.max_keys:
+            tats.popitem(last=False)
+            self.evicted_keys += 1
+
+    def stats(self):
+        """
+        Get gauges for tracked clients.
 
+        Returns:
+            dict: Tracked key count, cap, evictions and approximate memory
+        """
+        with self._lock:
+            memory = sys.getsizeof(self.tats) + sum(
+                sys.getsizeof(key) + sys.getsizeof(tat) for key, tat in self.tats.items()
+            )
+            tracked = len(self.tats)
+            evicted = self.evicted_keys
+        return {
+            "backend": "memory",
+            "tracked_keys": tracked,
+            "max_keys": self.max_keys,
+            "evicted_keys": evicted,
+            "memory_bytes": memory,
+        }
+
+
+def parse_tier_mapping(value):
+    """
+    Parse a "name:value,name:value" setting into a dict.
 
-# Global rate limiter instance
-_rate_limiter = None
+    Args:
+        value: Comma-separated pairs, e.g. "key123:pro,key456:partner"
 
+    Returns:
+        dict: Mapping of names to values (as strings)
+    """
+    mapping = {}
+    for pair in (value or "").split(","):
+        name, sep, item = pair.partition(":")
+        if sep and name.strip() and item.strip():
+            mapping[name.strip()] = item.strip()
+    return mapping
+
+
+DEFAULT_SCOPE = "default"
+DEFAULT_TIER = "default"
+
+# API key -> tier name, e.g. API_KEY_TIERS="key123:pro,key456:partner"
+API_KEY_TIERS = parse_tier_mapping(os.getenv("API_KEY_TIERS", ""))
+
+# Rate limiter instances keyed by (scope, tier)
+_rate_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    max_requests=60, window_seconds=60, scope=DEFAULT_SCOPE, tier=DEFAULT_TIER
+):
+    """
+    Get or create the rate limiter for a scope (e.g., route) and client tier.
+
+    Each (scope, tier) pair has its own limits and storage, so routes with
+    different budgets never share counters.
+
+    Set RATE_LIMIT_BACKEND=shared to keep counters in memory-mapped files
+    shared by all worker processes (path from RATE_LIMIT_SHM_PATH, suffixed
+    with the scope and tier).
+    """
+    key = (scope, tier)
+    limiter = _rate_limiters.get(key)
+    if limiter is not None:
+        return limiter
+
+    with _registry_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "shared":
+                from shared_rate_limiter import SharedRateLimiter, default_shm_path
+
+                base_path = os.getenv("RATE_LIMIT_SHM_PATH") or default_shm_path()
+                limiter = SharedRateLimiter(
+                    max_requests, window_seconds, path=f"{base_path}-{scope}-{tier}"
+                )
+            else:
+                limiter = RateLimiter(
+                    max_requests,
+                    window_seconds,
+                    max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000)),
+                )
+            _rate_limiters[key] = limiter
+    return limiter
+
+
+def rate_limiter_stats():
+    """Gauges of every rate limiter created so far, keyed by "scope:tier"."""
+    return {
+        f"{scope}:{tier}": limiter.stats()
+        for (scope, tier), limiter in list(_rate_limiters.items())
+    }
+
+
+def resolve_client(api_key, forwarded_for, remote_addr):
+    """
+    Identify a client from request metadata.
 
-def get_rate_limiter(max_requests=60, window_seconds=60):
-    """Get or create rate limiter instance."""
-    global _rate_limiter
-    if _rate_limiter is None:
-        _rate_limiter = RateLimiter(max_requests, window_seconds)
-    return _rate_limiter
+    Requests with an API key listed in API_KEY_TIERS are limited per key in
+    that key's tier; everyone else is limited per IP in the default tier.
 
+    Args:
+        api_key: Value of the X-API-Key header, if any
+        forwarded_for: Value of the X-Forwarded-For header, if any
+        remote_addr: Address of the connecting peer
 
-def rate_limit(max_requests=60, window_seconds=60):
+    Returns:
+        tuple: (tier name, client identifier)
+    """
+    if api_key and api_key in API_KEY_TIERS:
+        return API_KEY_TIERS[api_key], f"key:{api_key}"
+
+    # Get client identifier (IP address)
+    client_ip = forwarded_for or remote_addr
+    if client_ip:
+        # Handle multiple IPs in X-Forwarded-For
+        client_ip = client_ip.split(",")[0].strip()
+    return DEFAULT_TIER, client_ip
+
+
+def get_client_identity():
+    """Identify the client of the current Flask request; see resolve_client."""
+    return resolve_client(
+        request.headers.get("X-API-Key"),
+        request.headers.get("X-Forwarded-For"),
+        request.remote_addr,
+    )
+
+
+def rate_limit(max_requests=60, window_seconds=60, cost=1, scope=None, tiers=None):
     """
     Decorator to rate limit Flask routes.
 
@@ -113,46 +342,63 @@ def rate_limit(max_requests=60, window_seconds=60):
     Args:
         max_requests: Maximum requests per window
         window_seconds: Time window in seconds
+        cost: Request slots consumed per call, or a callable returning
+            the cost for the current request (e.g., batch size)
+        scope: Name of the budget this route draws from; defaults to the
+            view function name. Routes sharing a scope share counters.
+        tiers: Optional mapping of client tier to max_requests, overriding
+            the default limit for API keys in that tier
     """
+    tiers = tiers or {}
 
     def decorator(f):
+        limiter_scope = scope or f.__name__
+
         @wraps(f)
         def wrapped(*args, **kwargs):
-            limiter = get_rate_limiter(max_requests, window_seconds)
-
-            # Get client identifier (IP address)
-            client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-            if client_ip:
-                # Handle multiple IPs in X-Forwarded-For
-                client_ip = client_ip.split(",")[0].strip()
+            tier, client_id = get_client_identity()
+            limit = tiers.get(tier, max_requests)
+            limiter = get_rate_limiter(limit, window_seconds, limiter_scope, tier)
+
+            # A request costing more than the whole budget can never be
+            # admitted, so waiting would not help: reject it outright
+            weight = cost() if callable(cost) else cost
+            if weight > limit:
+                response = jsonify(
+                    {
+                        "error": "Request too large",
+                        "message": f"This request counts as {weight} requests, over the limit "
+                        f"of {limit} per {window_seconds} seconds. Split it into smaller ones.",
+                    }
+                )
+                response.status_code = 413
+                response.headers["X-RateLimit-Limit"] = str(limit)
+                return response
 
             # Check rate limit
-            if not limiter.is_allowed(client_ip):
-                remaining = limiter.get_remaining(client_ip)
-                reset_time = limiter.get_reset_time(client_ip)
-
+            decision = limiter.check(client_id, weight)
+            if not decision.allowed:
+                retry_after = max(1, decision.reset)
                 response = jsonify(
                     {
                         "error": "Rate limit exceeded",
-                        "message": f"Too many requests. Please try again in {reset_time} seconds.",
+                        "message": f"Too many requests. Please try again in {retry_after} seconds.",
                     }
                 )
                 response.status_code = 429
-                response.headers["X-RateLimit-Limit"] = str(max_requests)
-                response.headers["X-RateLimit-Remaining"] = str(remaining)
-                response.headers["X-RateLimit-Reset"] = str(reset_time)
-                response.headers["Retry-After"] = str(reset_time)
+                response.headers["X-RateLimit-Limit"] = str(decision.limit)
+                response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+                response.headers["X-RateLimit-Reset"] = str(retry_after)
+                response.headers["Retry-After"] = str(retry_after)
 
                 return response
 
-            # Request allowed - add rate limit headers
-            remaining = limiter.get_remaining(client_ip)
             response = f(*args, **kwargs)
 
-            # Add rate limit headers to response
+            # Request allowed - add rate limit headers
             if hasattr(response, "headers"):
-                response.headers["X-RateLimit-Limit"] = str(max_requests)
-                response.headers["X-RateLimit-Remaining"] = str(remaining)
+                response.headers["X-RateLimit-Limit"] = str(decision.limit)
+                response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
 
             return response
 
@@ -1,71 +1,247 @@
 """
 Central registry for all prompt adapters.
-Maps model names to their corresponding adapter instances.
+Maps model names to their corresponding adapter instances. Adapters are
+registered by import path and only imported and instantiated on first use;
+besides the built-in adapters below, installed packages can provide more
+through entry points (see plugins.py). The model catalog and lookup index
+are derived from the registrations once, at import, without loading any
+adapter.
 """
 
-from adapters.image import (
-    DalleAdapter,
-    MidjourneyAdapter,
-    StableDiffusionAdapter,
-    ImagenAdapter,
-    FireflyAdapter,
-)
-from adapters.video import (
-    SoraAdapter,
-    RunwayAdapter,
-    PikaAdapter,
-    VeoAdapter,
-    StableVideoDiffusionAdapter,
-)
-from adapters.audio import (
-    OpenAIAudioAdapter,
-    ElevenLabsAdapter,
-    SeamlessM4TAdapter,
-    IndicTTSAdapter,
-    CoquiTTSAdapter,
-)
-from adapters.text import (
-    GPT4Adapter,
-    LlamaAdapter,
-    MistralAdapter,
-    GeminiAdapter,
-    ClaudeAdapter,
-)
+import importlib
+import logging
+import os
+import threading
+from collections.abc import MutableMapping
+from typing import Any, NamedTuple
 
-# Registry mapping model names to adapter instances
-ADAPTER_REGISTRY = {
+from plugins import discover_adapters
+from schema import PROMPT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Registered adapters: model name -> (modality, "module:Class")
+ADAPTER_PATHS = {
     # Text/LLM models
-    "gpt-4": GPT4Adapter(),
-    "llama-3": LlamaAdapter(),
-    "mistral": MistralAdapter(),
-    "gemini": GeminiAdapter(),
-    "claude": ClaudeAdapter(),
+    "gpt-4": ("text", "adapters.text:GPT4Adapter"),
+    "llama-3": ("text", "adapters.text:LlamaAdapter"),
+    "mistral": ("text", "adapters.text:MistralAdapter"),
+    "gemini": ("text", "adapters.text:GeminiAdapter"),
+    "claude": ("text", "adapters.text:ClaudeAdapter"),
     # Image models
-    "dalle": DalleAdapter(),
-    "stable-diffusion": StableDiffusionAdapter(),
-    "midjourney": MidjourneyAdapter(),
-    "imagen": ImagenAdapter(),
-    "firefly": FireflyAdapter(),
+    "dalle": ("image", "adapters.image:DalleAdapter"),
+    "stable-diffusion": ("image", "adapters.image:StableDiffusionAdapter"),
+    "midjourney": ("image", "adapters.image:MidjourneyAdapter"),
+    "imagen": ("image", "adapters.image:ImagenAdapter"),
+    "firefly": ("image", "adapters.image:FireflyAdapter"),
     # Video models
-    "sora": SoraAdapter(),
-    "runway": RunwayAdapter(),
-    "pika": PikaAdapter(),
-    "veo": VeoAdapter(),
-    "stable-video-diffusion": StableVideoDiffusionAdapter(),
+    "sora": ("video", "adapters.video:SoraAdapter"),
+    "runway": ("video", "adapters.video:RunwayAdapter"),
+    "pika": ("video", "adapters.video:PikaAdapter"),
+    "veo": ("video", "adapters.video:VeoAdapter"),
+    "stable-video-diffusion": ("video", "adapters.video:StableVideoDiffusionAdapter"),
     # Audio models
-    "openai-audio": OpenAIAudioAdapter(),
-    "elevenlabs": ElevenLabsAdapter(),
-    "seamless-m4t": SeamlessM4TAdapter(),
-    "indic-tts": IndicTTSAdapter(),
-    "coqui-tts": CoquiTTSAdapter(),
+    "openai-audio": ("audio", "adapters.audio:OpenAIAudioAdapter"),
+    "elevenlabs": ("audio", "adapters.audio:ElevenLabsAdapter"),
+    "seamless-m4t": ("audio", "adapters.audio:SeamlessM4TAdapter"),
+    "indic-tts": ("audio", "adapters.audio:IndicTTSAdapter"),
+    "coqui-tts": ("audio", "adapters.audio:CoquiTTSAdapter"),
 }
 
+_MISSING = object()
+
+
+def load_adapter_class(path):
+    """
+    Import an adapter class from a "module:Class" path.
+
+    Args:
+        path: Import path of the adapter class
+
+    Returns:
+        type: The adapter class
+    """
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class ModelEntry(NamedTuple):
+    """Index entry for a registered model."""
+
+    modality: str
+    target: Any  # "module:Class" import path, or an adapter instance
+
+
+class AdapterRegistry(MutableMapping):
+    """
+    Model name -> adapter instance, loading adapters on first lookup.
+
+    A model is registered with either an adapter instance or the import
+    path of its class plus the modality it serves. Path entries are
+    imported and instantiated the first time they are looked up, and the
+    class's declared modality is checked against the registration then; a
+    mismatch raises RuntimeError, as it is a server misconfiguration rather
+    than a bad request. After freeze(), registrations can no longer change.
+
+    Args:
+        paths: Mapping of model name to (modality, "module:Class")
+    """
+
+    def __init__(self, paths=None):
+        self._entries = {}
+        self._adapters = {}
+        self._lock = threading.Lock()
+        self._frozen = False
+        for model, (modality, path) in (paths or {}).items():
+            self.register(model, path, modality)
+
+    def register(self, model, target, modality=None):
+        """
+        Register an adapter for a model, replacing any previous one.
+
+        Args:
+            model: Model name
+            target: Adapter instance, or "module:Class" import path
+            modality: Modality served; defaults to the adapter's own
+
+        Raises:
+            TypeError: If no modality is given or declared, or the registry
+                is frozen
+        """
+        self._check_mutable()
+        if not isinstance(target, str):
+            modality = getattr(target, "modality", None) or modality
+        if not modality:
+            raise TypeError(f"Adapter for model '{model}' does not declare a modality")
+
+        self._entries[model] = ModelEntry(modality, target)
+        if isinstance(target, str):
+            self._adapters.pop(model, None)
+        else:
+            self._adapters[model] = target
+
+    def freeze(self):
+        """
+        Refuse any further registration or removal. Views built from index()
+        are snapshots; freezing keeps them in agreement with the registry.
+        """
+        self._frozen = True
+
+    def _check_mutable(self):
+        if self._frozen:
+            raise TypeError("The adapter registry is frozen; register adapters before startup")
+
+    def index(self):
+        """Model name -> ModelEntry(modality, target), in registration order."""
+        return dict(self._entries)
+
+    def is_loaded(self, model):
+        """Whether the model's adapter has been instantiated."""
+        return model in self._adapters
+
+    def preload(self):
+        """Load every registered adapter, e.g. to warm a worker up."""
+        for model in self._entries:
+            self[model]
+
+    def get(self, model, default=None):
+        adapter = self._adapters.get(model, _MISSING)
+        if adapter is not _MISSING:
+            return adapter
+        if model not in self._entries:
+            return default
+        return self._load(model)
+
+    def __getitem__(self, model):
+        adapter = self._adapters.get(model, _MISSING)
+        if adapter is _MISSING:
+            return self._load(model)
+        return adapter
+
+    def _load(self, model):
+        modality, path = self._entries[model]
+        with self._lock:
+            adapter = self._adapters.get(model, _MISSING)
+            if adapter is _MISSING:
+                adapter = load_adapter_class(path)()
+                if adapter.modality != modality:
+                    raise RuntimeError(
+                        f"Adapter {path} declares modality '{adapter.modality}', "
+                        f"but model '{model}' is registered as '{modality}'"
+                    )
+                self._adapters[model] = adapter
+        return adapter
+
+    def __setitem__(self, model, adapter):
+        entry = self._entries.get(model)
+        self.register(model, adapter, entry.modality if entry else None)
+
+    def __delitem__(self, model):
+        self._check_mutable()
+        del self._entries[model]
+        self._adapters.pop(model, None)
+
+    def __contains__(self, model):
+        return model in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def register_plugins(registry, plugins):
+    """
+    Register discovered plugin adapters; built-in models are not replaced.
+
+    Args:
+        registry: AdapterRegistry to add to
+        plugins: Mapping of model name to (modality, "module:Class")
+    """
+    for model, (modality, path) in plugins.items():
+        if model in registry:
+            logger.warning(f"Plugin adapter {path} ignored: model '{model}' is already registered")
+            continue
+        registry.register(model, path, modality)
+
+
+# Registry mapping model names to adapter instances
+ADAPTER_REGISTRY = AdapterRegistry(ADAPTER_PATHS)
+
+# Plugin discovery is opt-in: it reads every installed distribution's
+# metadata and caches an index on disk, which importing this module should
+# not do by default
+if os.getenv("ADAPTER_PLUGINS", "False").lower() == "true":
+    register_plugins(
+        ADAPTER_REGISTRY,
+        discover_adapters(
+            modalities=PROMPT_TYPES, index_path=os.getenv("ADAPTER_INDEX_PATH") or None
+        ),
+    )
+
+
+def build_catalog(index):
+    """Model names grouped by modality, both in registry order."""
+    catalog = {}
+    for model, entry in index.items():
+        catalog.setdefault(entry.modality, []).append(model)
+    return {modality: tuple(models) for modality, models in catalog.items()}
+
+
+# Everything below is derived from the registry once; registrations are
+# complete (built-ins and plugins), so freeze it to keep them in agreement
+ADAPTER_REGISTRY.freeze()
+
+# model -> (modality, target): one dict lookup validates a request's model
+MODEL_INDEX = ADAPTER_REGISTRY.index()
+
+# modality -> model names, in registry order
+MODALITY_MODELS = build_catalog(MODEL_INDEX)
+
+MODALITIES = frozenset(MODALITY_MODELS)
+
 
 def get_available_models_by_modality():
     """Return available models grouped by modality."""
-    return {
-        "text": ["gpt-4", "llama-3", "mistral", "gemini", "claude"],
-        "image": ["dalle", "stable-diffusion", "midjourney", "imagen", "firefly"],
-        "video": ["sora", "runway", "pika", "veo", "stable-video-diffusion"],
-        "audio": ["openai-audio", "elevenlabs", "seamless-m4t", "indic-tts", "coqui-tts"],
-    }
+    return {modality: list(models) for modality, models in MODALITY_MODELS.items()}
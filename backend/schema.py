@@ -1,8 +1,31 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import MISSING, dataclass, field, fields
 from typing import List, Optional
 
+# Input limits, enforced by the payload validators built in validation.py.
+# Text fields default to MAX_TEXT_LENGTH; field metadata can override it
+# ("max_length") or bound integers ("min"/"max").
+MAX_TEXT_LENGTH = 2000
+MAX_DURATION_SECONDS = 60
 
-@dataclass
+# Prompt objects are created for every request; on Python 3.10+ they are
+# slotted, which drops the per-instance __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def prompt_dataclass(cls):
+    """Make cls a (slotted) dataclass and record its field names for from_payload."""
+    cls = dataclass(cls, **_SLOTS)
+    cls.FIELD_NAMES = frozenset(f.name for f in fields(cls))
+    cls.REQUIRED_FIELDS = frozenset(
+        f.name
+        for f in fields(cls)
+        if f.default is MISSING and f.default_factory is MISSING
+    )
+    return cls
+
+
+@prompt_dataclass
 class CanonicalPrompt:
     modality: str
     goal: str
@@ -12,8 +35,38 @@ class CanonicalPrompt:
     negative_constraints: Optional[List[str]] = None
     quality_level: Optional[str] = None
 
+    @classmethod
+    def from_payload(cls, payload):
+        """
+        Build a prompt from a sanitized payload dict.
+
+        Args:
+            payload: Field name -> value
 
-@dataclass
+        Returns:
+            CanonicalPrompt: Instance of cls
+
+        Raises:
+            TypeError: If the payload has unknown fields or lacks required ones
+        """
+        try:
+            return cls(**payload)
+        except TypeError:
+            # Diagnose only on failure so the success path stays a single call
+            unknown = payload.keys() - cls.FIELD_NAMES
+            if unknown:
+                raise TypeError(
+                    f"unknown field(s) for {cls.__name__}: {', '.join(sorted(unknown))}"
+                ) from None
+            missing = cls.REQUIRED_FIELDS - payload.keys()
+            if missing:
+                raise TypeError(
+                    f"missing required field(s): {', '.join(sorted(missing))}"
+                ) from None
+            raise
+
+
+@prompt_dataclass
 class ImagePrompt(CanonicalPrompt):
     environment: Optional[str] = None
     lighting: Optional[str] = None
@@ -22,17 +75,17 @@ class ImagePrompt(CanonicalPrompt):
     aspect_ratio: Optional[str] = None
 
 
-@dataclass
+@prompt_dataclass
 class VideoPrompt(CanonicalPrompt):
     scene: str = ""
     action: str = ""
     camera_motion: Optional[str] = None
     lighting: Optional[str] = None
-    duration_seconds: int = 5
+    duration_seconds: int = field(default=5, metadata={"min": 1, "max": MAX_DURATION_SECONDS})
     realism_level: Optional[str] = None
 
 
-@dataclass
+@prompt_dataclass
 class VoicePrompt(CanonicalPrompt):
     voice_gender: Optional[str] = None
     age_range: Optional[str] = None
@@ -42,10 +95,19 @@ class VoicePrompt(CanonicalPrompt):
     use_case: Optional[str] = None
 
 
-@dataclass
+@prompt_dataclass
 class TextPrompt(CanonicalPrompt):
     task_type: Optional[str] = None  # e.g., "creative writing", "code generation", "analysis"
     tone: Optional[str] = None  # e.g., "formal", "casual", "technical"
     format: Optional[str] = None  # e.g., "markdown", "json", "plain text"
     length: Optional[str] = None  # e.g., "short", "medium", "long"
     context: Optional[str] = None  # additional context for the task
+
+
+# Prompt dataclass for each API modality
+PROMPT_TYPES = {
+    "text": TextPrompt,
+    "image": ImagePrompt,
+    "video": VideoPrompt,
+    "audio": VoicePrompt,
+}
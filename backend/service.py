@@ -0,0 +1,757 @@
+"""
+Request handling shared by the Flask (WSGI) and ASGI apps.
+Validates, sanitizes and compiles prompt requests without depending on
+any web framework.
+"""
+
+import hashlib
+import logging
+import os
+import secrets
+from typing import NamedTuple, Optional
+
+from compiler import PromptCompiler
+from schema import MAX_DURATION_SECONDS, MAX_TEXT_LENGTH, PROMPT_TYPES  # noqa: F401
+from cache import CompileCache
+from jsoncodec import dumps
+from registry import (
+    ADAPTER_REGISTRY,
+    MODALITIES,
+    MODALITY_MODELS,
+    MODEL_INDEX,
+    get_available_models_by_modality,
+)
+from rate_limiter import parse_tier_mapping
+from sessions import CompileSession
+from tokens import count_tokens, fit_prompt, token_budget
+from validation import MAX_FIELD_ERRORS, PAYLOAD_VALIDATORS, clean_payload
+from variants import VariantSpace
+
+logger = logging.getLogger(__name__)
+
+compile_cache = None
+if int(os.getenv("COMPILE_CACHE_SIZE", 4096)) > 0:
+    compile_cache = CompileCache(
+        max_entries=int(os.getenv("COMPILE_CACHE_SIZE", 4096)),
+        ttl_seconds=float(os.getenv("COMPILE_CACHE_TTL", 0)) or None,
+        max_bytes=int(os.getenv("COMPILE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    )
+
+# Persistent prompt store (see prompt_store.py): every compiled prompt is
+# kept on disk, shared by all workers and read after the in-memory cache
+prompt_store = None
+if os.getenv("PROMPT_STORE_PATH"):
+    from prompt_store import PromptStore
+
+    prompt_store = PromptStore(os.getenv("PROMPT_STORE_PATH"))
+
+compiler = PromptCompiler(cache=compile_cache, store=prompt_store)
+
+# Live-preview sessions: dropped SESSION_TTL seconds after their last update
+# (0 keeps them), or least recently updated first beyond MAX_SESSIONS. They
+# live in the memory of the process that opened them, so /sessions needs a
+# single worker or routing that sends each session to one worker; session
+# IDs name their process so that a misrouted request fails loudly (421)
+session_store = CompileCache(
+    max_entries=int(os.getenv("MAX_SESSIONS", 1000)),
+    ttl_seconds=float(os.getenv("SESSION_TTL", 1800)) or None,
+)
+
+# Adapters load on first use; long-lived workers can load them all up front
+if os.getenv("PRELOAD_ADAPTERS", "False").lower() == "true":
+    ADAPTER_REGISTRY.preload()
+
+# Rate limits (per minute). Single prompts and batch/fan-out work have
+# separate budgets; batch budgets count prompts rather than HTTP requests.
+# Session updates (one per edit while typing) have their own budget.
+RATE_LIMIT = int(os.getenv("RATE_LIMIT", 60))
+BATCH_RATE_LIMIT = int(os.getenv("BATCH_RATE_LIMIT", 600))
+SESSION_RATE_LIMIT = int(os.getenv("SESSION_RATE_LIMIT", 600))
+
+# API key tiers scale every budget, e.g. RATE_LIMIT_TIERS="pro:10,partner:50"
+TIER_MULTIPLIERS = {
+    tier: float(multiplier)
+    for tier, multiplier in parse_tier_mapping(os.getenv("RATE_LIMIT_TIERS", "")).items()
+}
+
+
+# The model catalog is static for the life of the process: encode it once at
+# startup and let clients revalidate it by a strong ETag of those bytes
+MODELS_BODY = dumps({"models": get_available_models_by_modality()})
+MODELS_ETAG = f'"{hashlib.blake2b(MODELS_BODY, digest_size=16).hexdigest()}"'
+MODELS_CACHE_CONTROL = f"public, max-age={int(os.getenv('MODELS_MAX_AGE', 300))}"
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Check an If-None-Match header against an ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so
+    W/"..." validators match as well.
+
+    Args:
+        if_none_match: Header value, or None when absent
+        etag: Quoted entity tag of the current representation
+
+    Returns:
+        bool: True when the client's cached copy is current (send 304)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def tier_limits(max_requests):
+    """Per-tier max_requests for a route with the given default limit."""
+    return {
+        tier: max(1, int(max_requests * multiplier))
+        for tier, multiplier in TIER_MULTIPLIERS.items()
+    }
+
+
+def validate_request_data(data, require_model=True):
+    """
+    Validate incoming request data.
+
+    Args:
+        data: Request dictionary with modality, model and payload
+        require_model: Whether a target model must be specified
+
+    Returns:
+        tuple: (error body dict, HTTP status code), or None when valid
+    """
+    return prepare_request(data, require_model)[1]
+
+
+def prepare_request(data, require_model=True):
+    """
+    Validate incoming request data and sanitize its payload.
+
+    The payload is checked against its modality's schema and sanitized in
+    the same pass (see validation.py), before any prompt object is built.
+
+    Args:
+        data: Request dictionary with modality, model and payload
+        require_model: Whether a target model must be specified; fan-out
+            requests compile for every model of the modality instead
+
+    Returns:
+        tuple: (sanitized payload, None) when valid, otherwise
+            (None, (error body dict, HTTP status code)). Payload errors
+            list every offending field under "field_errors".
+    """
+    error = _check_request(data, require_model)
+    if error:
+        return None, (error, 400)
+
+    payload, field_errors = clean_payload(data["modality"], data["payload"])
+    if field_errors:
+        return None, ({"error": field_errors[0]["message"], "field_errors": field_errors}, 400)
+    return payload, None
+
+
+def _check_request(data, require_model):
+    """Error body for a malformed request envelope, or None."""
+    if not data:
+        return {"error": "Request body is required"}
+
+    if not isinstance(data, dict):
+        return {"error": "Request body must be a JSON object"}
+
+    modality = data.get("modality")
+    model = data.get("model")
+    payload = data.get("payload")
+
+    if not modality:
+        return {"error": "Missing required field: modality"}
+
+    if not isinstance(modality, str) or modality not in MODALITIES:
+        return {
+            "error": f"Invalid modality: {modality}. Must be one of: {', '.join(MODALITY_MODELS)}"
+        }
+
+    if not model and require_model:
+        return {"error": "Missing required field: model"}
+
+    if model:
+        entry = MODEL_INDEX.get(model) if isinstance(model, str) else None
+        if entry is None or entry.modality != modality:
+            return {
+                "error": f"Invalid model '{model}' for modality '{modality}'. "
+                f"Available models: {', '.join(MODALITY_MODELS[modality])}"
+            }
+
+    if not payload:
+        return {"error": "Missing required field: payload"}
+
+    if not isinstance(payload, dict):
+        return {"error": "Payload must be a dictionary"}
+
+    return None
+
+
+def build_prompt(modality, payload):
+    """Create the prompt dataclass for a modality from a sanitized payload."""
+    return PROMPT_TYPES[modality].from_payload(payload)
+
+
+def compile_request(data):
+    """
+    Validate, sanitize and compile a single generate request.
+
+    Args:
+        data: Request dictionary with modality, model and payload
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    # Validated and sanitized (to prevent injection) in one pass
+    payload, validation_error = prepare_request(data)
+    if validation_error:
+        return validation_error
+
+    modality = data["modality"]
+    model = data["model"]
+
+    # Token counts and budgets are opt-in: counting scans the whole prompt
+    if data.get("count_tokens") is True or data.get("fit") is True or "max_tokens" in data:
+        return _token_request(data, payload)
+
+    # Build the prompt object (or reuse a cached result) and compile it
+    try:
+        result = compiler.compile_payload(modality, payload, model)
+    except TypeError as e:
+        return {"error": f"Invalid payload: {str(e)}"}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    return {"prompt": result, "model": model, "modality": modality}, 200
+
+
+def _token_request(data, payload):
+    """
+    Compile a validated generate request and count its tokens, shortening
+    optional fields to the model's budget when "fit" (or "max_tokens") is
+    given (see tokens.fit_prompt).
+
+    Returns:
+        tuple: (response body dict, HTTP status code). The body adds
+            "tokens" and "token_budget" (null when the model has none), and
+            "truncated" (the optional fields shortened) when fitting
+    """
+    modality = data["modality"]
+    model = data["model"]
+    try:
+        max_tokens = _positive_int(data, "max_tokens")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    adapter = ADAPTER_REGISTRY[model]
+    budget = max_tokens or token_budget(model, adapter)
+
+    if data.get("fit") is not True and max_tokens is None:
+        try:
+            result = compiler.compile_payload(modality, payload, model)
+        except TypeError as e:
+            return {"error": f"Invalid payload: {str(e)}"}, 400
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        tokens = count_tokens(result)
+        return {
+            "prompt": result,
+            "model": model,
+            "modality": modality,
+            "tokens": tokens,
+            "token_budget": budget,
+        }, 200
+
+    if budget is None:
+        return {"error": f"Model '{model}' has no token budget; set 'max_tokens'"}, 400
+    try:
+        fit = fit_prompt(adapter, build_prompt(modality, payload), budget)
+    except TypeError as e:
+        return {"error": f"Invalid payload: {str(e)}"}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if fit.tokens > budget:
+        return {
+            "error": f"Prompt needs {fit.tokens} tokens without its optional fields, "
+            f"over the budget of {budget} for model '{model}'",
+            "tokens": fit.tokens,
+            "token_budget": budget,
+        }, 400
+    return {
+        "prompt": fit.prompt,
+        "model": model,
+        "modality": modality,
+        "tokens": fit.tokens,
+        "token_budget": budget,
+        "truncated": list(fit.truncated),
+    }, 200
+
+
+def compile_all_request(data):
+    """
+    Validate, sanitize and compile one payload for every model of a modality.
+
+    The payload is validated, sanitized and turned into a prompt object
+    once, then shared by all adapters.
+
+    Args:
+        data: Request dictionary with modality and payload
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    prompt, error = prepare_compile_all(data)
+    if error:
+        return error
+
+    modality = data["modality"]
+    prompts = compiler.compile_all(prompt, modality)
+    return {"prompts": prompts, "modality": modality}, 200
+
+
+def prepare_compile_all(data):
+    """
+    Validate a fan-out request and build its prompt object.
+
+    Args:
+        data: Request dictionary with modality and payload
+
+    Returns:
+        tuple: (prompt object, None) when valid, otherwise
+            (None, (error body dict, HTTP status code))
+    """
+    payload, validation_error = prepare_request(data, require_model=False)
+    if validation_error:
+        return None, validation_error
+
+    try:
+        return build_prompt(data["modality"], payload), None
+    except TypeError as e:
+        return None, ({"error": f"Invalid payload: {str(e)}"}, 400)
+
+
+def stream_batch(items):
+    """
+    Compile batch items lazily, one NDJSON line per item.
+
+    Each line is produced only when the consumer asks for it, so nothing
+    accumulates however long the batch is. Result and error lines follow
+    item order and carry the item's index and status; a final line
+    summarizes the batch.
+
+    Args:
+        items: List of request dictionaries (as for compile_request)
+
+    Yields:
+        bytes: One JSON document followed by a newline
+    """
+    errors = 0
+    for index, item in enumerate(items):
+        try:
+            body, status_code = compile_request(item)
+        except Exception as e:
+            logger.error(f"Unexpected error in batch item {index}: {str(e)}", exc_info=True)
+            body, status_code = {"error": "Internal server error"}, 500
+        if status_code != 200:
+            errors += 1
+        yield dumps({"index": index, "status": status_code, **body}) + b"\n"
+
+    logger.info(f"Streamed batch of {len(items)} prompts ({errors} errors)")
+    yield dumps({"count": len(items), "errors": errors}) + b"\n"
+
+
+def stream_compile_all(prompt, modality):
+    """
+    Compile a prompt for every model of a modality lazily, one NDJSON line
+    per model in catalog order, then a summary line.
+
+    Args:
+        prompt: Prompt object (see prepare_compile_all)
+        modality: Modality whose models to compile for
+
+    Yields:
+        bytes: One JSON document followed by a newline
+    """
+    errors = 0
+    models = MODALITY_MODELS[modality]
+    for model in models:
+        try:
+            line = {"model": model, "prompt": compiler.compile(prompt, model)}
+        except Exception as e:
+            logger.error(f"Unexpected error compiling for {model}: {str(e)}", exc_info=True)
+            line = {"model": model, "error": "Internal server error"}
+            errors += 1
+        yield dumps(line) + b"\n"
+
+    yield dumps({"modality": modality, "count": len(models), "errors": errors}) + b"\n"
+
+
+class VariantRequest(NamedTuple):
+    """A validated variant request (see prepare_variants)."""
+
+    modality: str
+    models: tuple
+    payload: dict  # sanitized base payload, with the first value of each axis
+    space: VariantSpace
+    limit: Optional[int]
+    sample: Optional[int]
+    seed: Optional[int]
+
+
+def _positive_int(data, key):
+    """data[key] when it is a positive integer or absent, else raises ValueError."""
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"Field '{key}' must be a positive integer")
+    return value
+
+
+def target_models(data):
+    """
+    Target models of a multi-model request: "model", "models", or by
+    default every model of the modality.
+
+    Returns:
+        tuple: Model names, or None if they are not a list of strings
+    """
+    if data.get("models") is None:
+        model = data.get("model")
+        return (model,) if model else MODALITY_MODELS.get(data.get("modality"), ())
+    models = data["models"]
+    if not isinstance(models, list) or not all(isinstance(model, str) for model in models):
+        return None
+    return tuple(dict.fromkeys(models))
+
+
+def _check_models(data):
+    """(target models, None), or (None, error body) if any is invalid."""
+    modality = data["modality"]
+    models = target_models(data)
+    if not models:
+        return None, {"error": "Field 'models' must be a non-empty list of model names"}
+    for model in models:
+        entry = MODEL_INDEX.get(model)
+        if entry is None or entry.modality != modality:
+            return None, {
+                "error": f"Invalid model '{model}' for modality '{modality}'. "
+                f"Available models: {', '.join(MODALITY_MODELS[modality])}"
+            }
+    return models, None
+
+
+def prepare_variants(data, max_variants, max_prompts=None):
+    """
+    Validate a variant request and sanitize its base payload and values.
+
+    The request is a /generate request whose "vary" maps field names to
+    lists of values; every combination of one value per field is a
+    variant. "limit" caps the number of variants and "sample" draws that
+    many at random (reproducibly, given "seed"). Each value is validated
+    once, on its own, rather than once per combination it appears in.
+
+    Args:
+        data: Request dictionary with modality, payload, vary and
+            optionally model or models, limit, sample and seed
+        max_variants: Maximum number of variants a request may produce
+        max_prompts: Maximum number of prompts (variants times models) a
+            request may compile, or None for no cap
+
+    Returns:
+        tuple: (VariantRequest, None) when valid, otherwise
+            (None, (error body dict, HTTP status code))
+    """
+    error = _check_request(data, require_model=False)
+    if error:
+        return None, (error, 400)
+
+    modality = data["modality"]
+    models, error = _check_models(data)
+    if error:
+        return None, (error, 400)
+
+    vary = data.get("vary")
+    if not isinstance(vary, dict) or not vary:
+        return None, ({"error": "Field 'vary' must map field names to lists of values"}, 400)
+    for field, values in vary.items():
+        if not isinstance(values, list) or not values:
+            return None, ({"error": f"Values of field '{field}' must be a non-empty list"}, 400)
+
+    try:
+        limit = _positive_int(data, "limit")
+        sample = _positive_int(data, "sample")
+    except ValueError as e:
+        return None, ({"error": str(e)}, 400)
+    seed = data.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        return None, ({"error": "Field 'seed' must be an integer"}, 400)
+
+    # The base payload is validated with the first value of every axis, so
+    # required fields may be varied; the other values are checked one by one
+    validator = PAYLOAD_VALIDATORS[modality]
+    first = {**data["payload"], **{field: values[0] for field, values in vary.items()}}
+    payload, field_errors = validator.clean(first)
+    axes = []
+    for field, values in vary.items():
+        cleaned = [payload.get(field)]
+        for value in values[1:]:
+            if len(field_errors) >= MAX_FIELD_ERRORS:
+                break
+            sanitized, errors = validator.clean({field: value})
+            field_errors.extend(error for error in errors if error["field"] == field)
+            cleaned.append(sanitized.get(field))
+        axes.append((field, cleaned))
+    if field_errors:
+        return None, ({"error": field_errors[0]["message"], "field_errors": field_errors}, 400)
+
+    space = VariantSpace(axes)
+    count = space.count(limit, sample)
+    if count > max_variants:
+        return None, (
+            {
+                "error": f"Request expands to {count} variants; the maximum is {max_variants}. "
+                "Use 'limit' or 'sample' to select fewer."
+            },
+            400,
+        )
+    if max_prompts is not None and count * len(models) > max_prompts:
+        return None, (
+            {
+                "error": f"Request compiles {count * len(models)} prompts ({count} variants "
+                f"for {len(models)} models); the maximum is {max_prompts}. Use 'limit', "
+                "'sample' or fewer models to compile fewer."
+            },
+            400,
+        )
+
+    try:
+        build_prompt(modality, payload)
+    except TypeError as e:
+        return None, ({"error": f"Invalid payload: {str(e)}"}, 400)
+    return VariantRequest(modality, models, payload, space, limit, sample, seed), None
+
+
+def variant_payload(payload, fields, values):
+    """Base payload with one variant's values; None values fall back to the defaults."""
+    variant = dict(payload)
+    for field, value in zip(fields, values):
+        if value is None:
+            variant.pop(field, None)
+        else:
+            variant[field] = value
+    return variant
+
+
+def stream_variants(variants):
+    """
+    Compile every selected variant lazily, one NDJSON line per variant
+    with its values and one prompt per model, then a summary line.
+
+    Adapters render from plans specialized to the base prompt (see
+    PromptCompiler.variant_compilers), so the parts of each prompt that
+    do not depend on the varied fields are rendered once per request.
+
+    Args:
+        variants: VariantRequest from prepare_variants
+
+    Yields:
+        bytes: One JSON document followed by a newline
+    """
+    modality, models, payload, space = variants[:4]
+    compilers = compiler.variant_compilers(
+        build_prompt(modality, payload), models, space.fields
+    )
+
+    count = errors = 0
+    for index, values in space.expand(variants.limit, variants.sample, variants.seed):
+        count += 1
+        try:
+            prompt = build_prompt(modality, variant_payload(payload, space.fields, values))
+            line = {
+                "variant": index,
+                "values": dict(zip(space.fields, values)),
+                "prompts": {model: render(prompt) for model, render in compilers.items()},
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error in variant {index}: {str(e)}", exc_info=True)
+            line = {"variant": index, "error": "Internal server error"}
+            errors += 1
+        yield dumps(line) + b"\n"
+
+    logger.info(f"Streamed {count} variants for {len(models)} models ({errors} errors)")
+    yield dumps(
+        {
+            "modality": modality,
+            "models": list(models),
+            "combinations": space.size,
+            "count": count,
+            "errors": errors,
+        }
+    ) + b"\n"
+
+
+def open_session(data):
+    """
+    Validate a payload and compile a session for it.
+
+    Args:
+        data: Request dictionary with modality, payload and optionally
+            model or models (default: every model of the modality)
+
+    Returns:
+        tuple: (CompileSession, None) when valid, otherwise
+            (None, (error body dict, HTTP status code))
+    """
+    payload, validation_error = prepare_request(data, require_model=False)
+    if validation_error:
+        return None, validation_error
+    models, error = _check_models(data)
+    if error:
+        return None, (error, 400)
+
+    try:
+        return CompileSession(data["modality"], models, payload), None
+    except TypeError as e:
+        return None, ({"error": f"Invalid payload: {str(e)}"}, 400)
+
+
+def session_changes(session, data):
+    """
+    Validate and sanitize the field changes of a session update.
+
+    Only the changed fields are validated; unset (null) fields only fail
+    when they are required.
+
+    Args:
+        session: CompileSession the changes apply to
+        data: Request dictionary with "changes": field -> new value, or
+            null to unset the field
+
+    Returns:
+        tuple: (changes dict for CompileSession.update, None) when valid,
+            otherwise (None, (error body dict, HTTP status code))
+    """
+    changes = data.get("changes") if isinstance(data, dict) else None
+    if not isinstance(changes, dict) or not changes:
+        return None, ({"error": "Field 'changes' must be a non-empty object"}, 400)
+
+    sanitized, field_errors = PAYLOAD_VALIDATORS[session.modality].clean(changes)
+    field_errors = [error for error in field_errors if error["field"] in changes]
+    if field_errors:
+        return None, ({"error": field_errors[0]["message"], "field_errors": field_errors}, 400)
+    return {field: sanitized.get(field) for field in changes}, None
+
+
+_process_token = (None, None)
+
+
+def _session_process():
+    """Token naming this process in session IDs, renewed in forked workers."""
+    global _process_token
+    pid, token = _process_token
+    if pid != os.getpid():
+        pid, token = os.getpid(), secrets.token_hex(4)
+        _process_token = pid, token
+    return token
+
+
+def _session_not_found(session_id):
+    """
+    Error response for a session this process does not hold.
+
+    Returns:
+        tuple: (error body dict, HTTP status code): 421 when the session was
+            opened by another process, 404 when it is unknown or expired
+    """
+    if session_id.partition(".")[0] != _session_process():
+        return {
+            "error": "Session not held by this worker",
+            "message": (
+                "Sessions are kept in the worker process that opened them; "
+                "serve /sessions from one worker or route each session to one worker."
+            ),
+        }, 421
+    return {"error": "Session not found or expired"}, 404
+
+
+def create_session_request(data):
+    """
+    Validate a payload and open a compile session for it.
+
+    Args:
+        data: Request dictionary with modality, payload and optionally
+            model or models (default: every model of the modality)
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    session, error = open_session(data)
+    if error:
+        return error
+
+    session.id = f"{_session_process()}.{session.id}"
+    session_store.set(session.id, session)
+    return {
+        "session": session.id,
+        "version": session.version,
+        "modality": session.modality,
+        "prompts": dict(session.prompts),
+    }, 201
+
+
+def update_session_request(session_id, data):
+    """
+    Apply field changes to a session's payload.
+
+    Only the changed fields are validated, and only the prompt segments
+    that read them are re-rendered (see sessions.CompileSession).
+
+    Args:
+        session_id: Session ID from create_session_request
+        data: Request dictionary with "changes": field -> new value, or
+            null to unset the field
+
+    Returns:
+        tuple: (response body dict, HTTP status code). The body lists the
+            fields that changed and, for each prompt that changed, its new
+            text under "prompts" and the edit from the old one under "edits"
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        return _session_not_found(session_id)
+
+    changes, error = session_changes(session, data)
+    if error:
+        return error
+
+    try:
+        body = session.update(changes)
+    except TypeError as e:
+        return {"error": f"Invalid payload: {str(e)}"}, 400
+
+    # Storing the session again restarts its TTL
+    session_store.set(session.id, session)
+    return {"session": session.id, **body}, 200
+
+
+def delete_session_request(session_id):
+    """
+    Close a session.
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    if not session_store.delete(session_id):
+        return _session_not_found(session_id)
+    return {}, 204
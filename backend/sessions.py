@@ -0,0 +1,192 @@
+"""
+Compile sessions for live preview.
+
+A session holds a sanitized payload, the prompts compiled from it for a set
+of models and, for spec adapters, the rendered text of each segment of
+those prompts. Updates are field-level changes against the session's
+payload: only the segments that read a changed field are re-rendered, and
+each changed prompt is reported both in full and as a single text edit
+against the previous one, so clients re-sending a form as the user types
+do not pay for a full rebuild (or re-download) on every keystroke.
+"""
+
+import secrets
+import threading
+
+from registry import ADAPTER_REGISTRY
+from schema import PROMPT_TYPES
+
+
+def text_edit(old, new):
+    """
+    The edit turning old into new, found by trimming their common prefix
+    and suffix.
+
+    Args:
+        old: Previous text
+        new: Current text
+
+    Returns:
+        dict: {"start", "end", "text"}: replace old[start:end] with text;
+            None when the texts are equal
+    """
+    if old == new:
+        return None
+    # Binary searches over slice comparisons: a dozen memory compares for a
+    # prompt of a few thousand characters instead of a loop per character.
+    # Only the part not yet known to match is compared, so the slices
+    # copied halve at every step
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    start = low
+    low, high = 0, min(len(old), len(new)) - start
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle : len(old) - low] == new[len(new) - middle : len(new) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return {"start": start, "end": len(old) - low, "text": new[start : len(new) - low]}
+
+
+def segment_edit(plan, old, new, previous, segments):
+    """
+    text_edit(old, new) for two renders of one plan, searching only the
+    text between the segments they share at either end.
+
+    Args:
+        plan: RenderPlan both texts were joined by
+        old: plan.join(previous)
+        new: plan.join(segments)
+        previous: Previous segments (see RenderPlan.segments)
+        segments: Current segments, reusing the unchanged ones of previous
+
+    Returns:
+        dict: As text_edit; the same edit may be placed differently when
+            the changed text repeats at its boundary
+    """
+    if all(text is None for text in previous) or all(text is None for text in segments):
+        return text_edit(old, new)  # either may be the plan's text for no segments
+    sep = len(plan.spec.sep)
+    # Unchanged segments are the very same objects; the texts share the
+    # leading ones (and the separators between them) and likewise the
+    # trailing ones plus the plan's suffix
+    prefix = -sep
+    for a, b in zip(previous, segments):
+        if a is not b:
+            break
+        if a is not None:
+            prefix += len(a) + sep
+    suffix = len(plan.spec.suffix) - sep
+    for a, b in zip(reversed(previous), reversed(segments)):
+        if a is not b:
+            break
+        if a is not None:
+            suffix += len(a) + sep
+    prefix = max(prefix, 0)
+    suffix = max(suffix, len(plan.spec.suffix))
+    edit = text_edit(old[prefix : len(old) - suffix], new[prefix : len(new) - suffix])
+    if edit is not None:
+        edit["start"] += prefix
+        edit["end"] += prefix
+    return edit
+
+
+class CompileSession:
+    """
+    A payload and its compiled prompts, updated by field changes.
+
+    Args:
+        modality: API modality of the payload
+        models: Models to compile for
+        payload: Sanitized payload dictionary
+    """
+
+    def __init__(self, modality, models, payload):
+        self.id = secrets.token_urlsafe(16)
+        self.modality = modality
+        self.models = tuple(models)
+        self.payload = dict(payload)
+        self.version = 0
+        self._lock = threading.Lock()
+
+        # Spec adapters render by segment; others (including subclasses that
+        # override compile() around their plan) recompile in full
+        self._plans = {}
+        for model in self.models:
+            adapter = ADAPTER_REGISTRY[model]
+            plan = getattr(adapter, "plan", None)
+            if plan is not None and adapter.compile is plan.render:
+                self._plans[model] = plan
+
+        prompt = PROMPT_TYPES[modality].from_payload(self.payload)
+        self._segments = {model: plan.segments(prompt) for model, plan in self._plans.items()}
+        self.prompts = {model: self._compile(model, prompt) for model in self.models}
+
+    def _compile(self, model, prompt):
+        plan = self._plans.get(model)
+        if plan is None:
+            return ADAPTER_REGISTRY[model].compile(prompt)
+        return plan.join(self._segments[model])
+
+    def update(self, changes):
+        """
+        Apply field changes and re-render what they affect.
+
+        Args:
+            changes: Field name -> sanitized new value, or None to unset
+                the field
+
+        Returns:
+            dict: New "version", the "changed" field names, and for every
+                prompt that changed, its text under "prompts" and the
+                text_edit from the previous one under "edits"
+
+        Raises:
+            TypeError: If the changes leave the payload invalid for the
+                modality's schema (the session is then left unchanged)
+        """
+        with self._lock:
+            payload = dict(self.payload)
+            for field, value in changes.items():
+                if value is None:
+                    payload.pop(field, None)
+                else:
+                    payload[field] = value
+            changed = {field for field in changes if payload.get(field) != self.payload.get(field)}
+            if not changed:
+                return {"version": self.version, "changed": [], "prompts": {}, "edits": {}}
+
+            prompt = PROMPT_TYPES[self.modality].from_payload(payload)
+            prompts = {}
+            edits = {}
+            for model in self.models:
+                plan = self._plans.get(model)
+                old = self.prompts[model]
+                if plan is None:
+                    new = ADAPTER_REGISTRY[model].compile(prompt)
+                    edit = text_edit(old, new)
+                else:
+                    previous = self._segments[model]
+                    segments = self._segments[model] = plan.segments(prompt, previous, changed)
+                    if segments == previous:
+                        continue
+                    new = plan.join(segments)
+                    edit = segment_edit(plan, old, new, previous, segments)
+                if edit is not None:
+                    prompts[model] = self.prompts[model] = new
+                    edits[model] = edit
+
+            self.payload = payload
+            self.version += 1
+            return {
+                "version": self.version,
+                "changed": sorted(changed),
+                "prompts": prompts,
+                "edits": edits,
+            }
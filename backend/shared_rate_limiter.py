@@ -0,0 +1,256 @@
+"""
+Rate limiter backed by a shared memory-mapped file.
+All worker processes that open the same file share one set of counters, so
+limits hold across gunicorn workers instead of being multiplied by them.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from rate_limiter import (
+    RateLimitDecision,
+    gcra_remaining,
+    gcra_reset_time,
+    gcra_update,
+)
+
+_MAGIC = b"PGRL0002"
+_HEADER = struct.Struct("<8sII")
+_HEADER_SIZE = 64
+# key hash, theoretical arrival time (GCRA state)
+_SLOT = struct.Struct("<Qd")
+
+
+def default_shm_path():
+    """Default location of the shared counter file (RAM-backed when possible)."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "prompt-generator-ratelimit")
+
+
+def _key_hash(key):
+    """Stable 64-bit hash of a key; 0 marks an empty slot."""
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedRateLimiter:
+    """
+    GCRA rate limiter shared between processes.
+
+    Keys hash into fixed-size slots grouped into stripes. Each stripe is
+    guarded by a byte-range file lock (across processes) and a thread lock
+    (within a process), so unrelated keys rarely contend. A new key takes an
+    empty slot or that of an idle client (whose budget is full, so nothing
+    is lost); when every client in its stripe is active, it is rejected
+    until one goes idle, so new keys cannot push out a throttled one.
+    """
+
+    def __init__(
+        self,
+        max_requests=60,
+        window_seconds=60,
+        path=None,
+        stripes=64,
+        slots_per_stripe=256,
+    ):
+        """
+        Initialize shared rate limiter.
+
+        Args:
+            max_requests: Maximum requests allowed in time window
+            window_seconds: Time window in seconds
+            path: Shared counter file; created if missing
+            stripes: Number of independently locked slot groups
+            slots_per_stripe: Slots per group; bounds tracked clients
+        """
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.emission_interval = window_seconds / max_requests
+        self.path = path or default_shm_path()
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.stripes, self.slots_per_stripe = self._init_file(stripes, slots_per_stripe)
+        size = _HEADER_SIZE + self.stripes * self.slots_per_stripe * _SLOT.size
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+    def _init_file(self, stripes, slots_per_stripe):
+        """Create the file layout, or adopt the layout of an existing file."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size:
+                magic, file_stripes, file_slots = _HEADER.unpack(header)
+                if magic == _MAGIC:
+                    return file_stripes, file_slots
+
+            size = _HEADER_SIZE + stripes * slots_per_stripe * _SLOT.size
+            os.ftruncate(self._fd, 0)
+            os.ftruncate(self._fd, size)
+            os.pwrite(self._fd, _HEADER.pack(_MAGIC, stripes, slots_per_stripe), 0)
+            return stripes, slots_per_stripe
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _locked(self, key, update):
+        """
+        Run update(slot_offset, key_hash, tat) with the key's stripe locked.
+
+        The slot is the key's existing slot, an empty one, or that of an
+        idle client (arrival time in the past), which is evicted. tat is
+        None for a key without stored state. When the stripe holds only
+        active clients, slot_offset is None and tat is the earliest time
+        one of them goes idle.
+        """
+        h = _key_hash(key)
+        stripe = h % self.stripes
+        first = (h >> 32) % self.slots_per_stripe
+        base = _HEADER_SIZE + stripe * self.slots_per_stripe * _SLOT.size
+
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                now = time.time()
+                victim = None
+                earliest = None
+                for i in range(self.slots_per_stripe):
+                    offset = base + ((first + i) % self.slots_per_stripe) * _SLOT.size
+                    slot_hash, tat = _SLOT.unpack_from(self._map, offset)
+                    if slot_hash == h:
+                        return update(offset, h, tat)
+                    if slot_hash == 0:
+                        return update(offset, h, None)
+                    if tat > now:
+                        earliest = tat if earliest is None else min(earliest, tat)
+                    elif victim is None:
+                        victim = offset
+
+                if victim is not None:
+                    return update(victim, h, None)
+                return update(None, h, earliest)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def check(self, key, cost=1):
+        """
+        Check and record a request in a single pass.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Number of request slots this call consumes
+
+        Returns:
+            RateLimitDecision: Whether the request is allowed, plus the
+            remaining budget, limit and reset time after this call
+        """
+
+        def update(offset, h, tat):
+            now = time.time()
+            if offset is None:
+                return RateLimitDecision(False, 0, self.max_requests, self._wait_for_slot(tat))
+            allowed, tat = gcra_update(
+                tat, now, self.emission_interval, self.window_seconds, cost
+            )
+            if allowed:
+                _SLOT.pack_into(self._map, offset, h, tat)
+            return RateLimitDecision(
+                allowed,
+                gcra_remaining(tat, now, self.emission_interval, self.window_seconds),
+                self.max_requests,
+                gcra_reset_time(
+                    tat, now, self.emission_interval, self.window_seconds, 1 if allowed else cost
+                ),
+            )
+
+        return self._locked(key, update)
+
+    def is_allowed(self, key, cost=1):
+        """
+        Check if request is allowed for given key (e.g., IP address).
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Number of request slots this call consumes
+
+        Returns:
+            bool: True if request is allowed, False otherwise
+        """
+        return self.check(key, cost).allowed
+
+    def get_remaining(self, key):
+        """
+        Get remaining requests for key.
+
+        Args:
+            key: Identifier for rate limiting
+
+        Returns:
+            int: Number of remaining requests
+        """
+
+        def update(offset, h, tat):
+            if offset is None:
+                return 0
+            return gcra_remaining(
+                tat, time.time(), self.emission_interval, self.window_seconds
+            )
+
+        return self._locked(key, update)
+
+    def get_reset_time(self, key):
+        """
+        Get time until rate limit resets.
+
+        Args:
+            key: Identifier for rate limiting
+
+        Returns:
+            int: Seconds until the next request is allowed
+        """
+
+        def update(offset, h, tat):
+            if offset is None:
+                return self._wait_for_slot(tat)
+            return gcra_reset_time(
+                tat, time.time(), self.emission_interval, self.window_seconds
+            )
+
+        return self._locked(key, update)
+
+    @staticmethod
+    def _wait_for_slot(earliest):
+        """Whole seconds until a slot of a full stripe goes idle (at least 1)."""
+        return max(1, math.ceil(earliest - time.time()))
+
+    def stats(self):
+        """
+        Get gauges for tracked clients.
+
+        Returns:
+            dict: Clients with live state, slot capacity and mapped size
+        """
+        now = time.time()
+        capacity = self.stripes * self.slots_per_stripe
+        tracked = 0
+        for offset in range(_HEADER_SIZE, _HEADER_SIZE + capacity * _SLOT.size, _SLOT.size):
+            slot_hash, tat = _SLOT.unpack_from(self._map, offset)
+            if slot_hash and tat > now:
+                tracked += 1
+        return {
+            "backend": "shared",
+            "tracked_keys": tracked,
+            "max_keys": capacity,
+            "memory_bytes": len(self._map),
+        }
+
+    def close(self):
+        """Release the mapping and file descriptor."""
+        self._map.close()
+        os.close(self._fd)
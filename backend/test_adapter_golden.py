@@ -0,0 +1,149 @@
+"""
+Golden tests: every adapter's output is pinned byte-for-byte.
+
+Regenerate the golden file (only when an output change is intended) with:
+    UPDATE_GOLDEN=1 pytest test_adapter_golden.py
+"""
+
+import dataclasses
+import json
+import os
+import random
+
+import pytest
+
+from adapters import audio, image, text, video, voice
+from schema import ImagePrompt, TextPrompt, VideoPrompt, VoicePrompt
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "testdata", "adapter_golden.json")
+
+ADAPTERS = {
+    ImagePrompt: [
+        image.DalleAdapter,
+        image.MidjourneyAdapter,
+        image.StableDiffusionAdapter,
+        image.ImagenAdapter,
+        image.FireflyAdapter,
+    ],
+    VideoPrompt: [
+        video.SoraAdapter,
+        video.RunwayAdapter,
+        video.PikaAdapter,
+        video.VeoAdapter,
+        video.StableVideoDiffusionAdapter,
+    ],
+    VoicePrompt: [
+        audio.OpenAIAudioAdapter,
+        audio.ElevenLabsAdapter,
+        audio.SeamlessM4TAdapter,
+        audio.IndicTTSAdapter,
+        audio.CoquiTTSAdapter,
+        voice.OpenAIVoiceAdapter,
+        voice.ElevenLabsAdapter,
+        voice.PlayHTAdapter,
+        voice.AzureVoiceAdapter,
+        voice.MurfAIAdapter,
+        voice.WellSaidAdapter,
+    ],
+    TextPrompt: [
+        text.GPT4Adapter,
+        text.LlamaAdapter,
+        text.MistralAdapter,
+        text.GeminiAdapter,
+        text.ClaudeAdapter,
+    ],
+}
+
+LIST_FIELDS = {"constraints", "negative_constraints"}
+REQUIRED_FIELDS = {"modality", "goal", "subject"}
+
+
+def sample_value(name, rng):
+    """A representative value for a prompt field."""
+    if name == "duration_seconds":
+        return rng.choice([1, 5, 10, 60])
+    if name in LIST_FIELDS:
+        return rng.choice([[], ["one"], ["first item", "second item", "third"]])
+    return rng.choice([f"{name} value", f"Multi word {name.replace('_', ' ')}", ""])
+
+
+def build_cases(prompt_cls, rng):
+    """Minimal, full, one-field-at-a-time and random field combinations."""
+    optional = [
+        f.name for f in dataclasses.fields(prompt_cls) if f.name not in REQUIRED_FIELDS
+    ]
+    base = {
+        "modality": prompt_cls.__name__,
+        "goal": "write a haiku",
+        "subject": "autumn rain",
+    }
+
+    def fixed_value(name, label):
+        if name in LIST_FIELDS:
+            return [label, "b"]
+        return 7 if name == "duration_seconds" else f"{label} {name}"
+
+    cases = [dict(base), dict(base, goal="", subject="")]
+    cases.append(dict(base, **{name: fixed_value(name, "full") for name in optional}))
+    for name in optional:
+        cases.append(dict(base, **{name: fixed_value(name, "only")}))
+
+    for _ in range(40):
+        case = dict(base)
+        for name in optional:
+            if rng.random() < 0.5:
+                case[name] = sample_value(name, rng)
+        cases.append(case)
+    return cases
+
+
+def compute_golden():
+    rng = random.Random(20241017)
+    golden = []
+    for prompt_cls, adapter_classes in ADAPTERS.items():
+        for fields in build_cases(prompt_cls, rng):
+            prompt = prompt_cls(**fields)
+            for adapter_cls in adapter_classes:
+                golden.append(
+                    {
+                        "adapter": f"{adapter_cls.__module__}.{adapter_cls.__name__}",
+                        "prompt_type": prompt_cls.__name__,
+                        "fields": fields,
+                        "expected": adapter_cls().compile(prompt),
+                    }
+                )
+    return golden
+
+
+def load_golden():
+    if os.getenv("UPDATE_GOLDEN"):
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(compute_golden(), f, indent=1, ensure_ascii=False)
+            f.write("\n")
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+PROMPT_TYPES = {cls.__name__: cls for cls in ADAPTERS}
+ADAPTER_CLASSES = {
+    f"{cls.__module__}.{cls.__name__}": cls
+    for classes in ADAPTERS.values()
+    for cls in classes
+}
+GOLDEN = load_golden()
+
+
+@pytest.mark.parametrize("adapter_name", sorted(ADAPTER_CLASSES))
+def test_adapter_output_is_unchanged(adapter_name):
+    adapter = ADAPTER_CLASSES[adapter_name]()
+    cases = [case for case in GOLDEN if case["adapter"] == adapter_name]
+    assert cases
+
+    for case in cases:
+        prompt = PROMPT_TYPES[case["prompt_type"]](**case["fields"])
+        assert adapter.compile(prompt) == case["expected"], case["fields"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
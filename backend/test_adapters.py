@@ -4,6 +4,7 @@ Unit tests for prompt adapters.
 
 import pytest
 from schema import ImagePrompt, VideoPrompt, VoicePrompt
+from adapters.render import SpecAdapter
 from adapters.image import (
     DalleAdapter,
     MidjourneyAdapter,
@@ -256,6 +257,13 @@ class TestAdapterEdgeCases:
         # Should have default negative constraints
         assert "Negative:" in result
 
+    def test_spec_adapter_without_spec(self):
+        class UnfinishedAdapter(SpecAdapter):
+            modality = "image"
+
+        with pytest.raises(TypeError, match="UnfinishedAdapter must define `spec`"):
+            UnfinishedAdapter().compile(ImagePrompt(modality="image", goal="test", subject="x"))
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,7 +4,10 @@ Integration tests for Flask API.
 
 import pytest
 import json
+
+import rate_limiter
 from app import app
+from service import MODELS_ETAG
 
 
 @pytest.fixture
@@ -46,6 +49,58 @@ class TestModelsEndpoint:
         assert "openai-voice" in data["models"]["voice"]
 
 
+class TestModelsCaching:
+    """Conditional GET for the models endpoint."""
+
+    def test_etag_and_cache_control(self, client):
+        response = client.get("/models")
+
+        assert response.headers["ETag"] == MODELS_ETAG
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+    def test_not_modified(self, client):
+        response = client.get("/models", headers={"If-None-Match": MODELS_ETAG})
+
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == MODELS_ETAG
+
+    @pytest.mark.parametrize("header", ['"other", {etag}', "W/{etag}", "*"])
+    def test_not_modified_header_forms(self, client, header):
+        response = client.get("/models", headers={"If-None-Match": header.format(etag=MODELS_ETAG)})
+        assert response.status_code == 304
+
+    def test_stale_etag_gets_body(self, client):
+        response = client.get("/models", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == 200
+        assert "models" in json.loads(response.data)
+
+
+class TestStatsEndpoint:
+    """Tests for the stats endpoint."""
+
+    def test_cache_counters(self, client):
+        payload = {
+            "modality": "image",
+            "model": "firefly",
+            "payload": {"modality": "image", "goal": "test", "subject": "a stats mug"},
+        }
+
+        for _ in range(2):
+            client.post(
+                "/generate", data=json.dumps(payload), content_type="application/json"
+            )
+
+        response = client.get("/stats")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["compile_cache"]["hits"] >= 1
+        assert data["compile_cache"]["entries"] >= 1
+        assert data["rate_limiter"]["generate:default"]["tracked_keys"] >= 1
+
+
 class TestGenerateEndpoint:
     """Tests for the prompt generation endpoint."""
 
@@ -145,6 +200,24 @@ class TestGenerateEndpoint:
         assert "error" in data
         assert "modality" in data["error"].lower()
 
+    @pytest.mark.parametrize(
+        "modality, model, fragment",
+        [
+            (["image"], "dalle", "Invalid modality"),
+            ("image", ["dalle"], "Invalid model"),
+            ("image", "sora", "Invalid model"),
+        ],
+    )
+    def test_invalid_envelope_values(self, client, modality, model, fragment):
+        response = client.post(
+            "/generate",
+            data=json.dumps({"modality": modality, "model": model, "payload": {"subject": "x"}}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        assert fragment in json.loads(response.data)["error"]
+
     def test_missing_model(self, client):
         payload = {
             "modality": "image",
@@ -241,6 +314,499 @@ class TestGenerateEndpoint:
         assert "error" in data
 
 
+class TestTokenBudgets:
+    """Tests for token counts and budget fitting on /generate."""
+
+    PAYLOAD = {
+        "modality": "text",
+        "goal": "Summarize",
+        "subject": "the quarterly report",
+        "context": ("Revenue grew by 12 percent while costs fell sharply. " * 40)[:2000],
+        "tone": "formal",
+    }
+
+    def generate(self, client, model="gpt-4", **options):
+        request = {"modality": "text", "model": model, "payload": self.PAYLOAD, **options}
+        response = client.post(
+            "/generate", data=json.dumps(request), content_type="application/json"
+        )
+        return response.status_code, json.loads(response.data)
+
+    def test_counts_are_opt_in(self, client):
+        status, data = self.generate(client)
+        assert status == 200 and "tokens" not in data
+
+        status, data = self.generate(client, count_tokens=True)
+        assert status == 200
+        assert 300 < data["tokens"] < 500
+        assert data["token_budget"] == 8192
+
+    def test_fit_to_max_tokens(self, client):
+        status, data = self.generate(client, max_tokens=100)
+
+        assert status == 200
+        assert data["tokens"] <= data["token_budget"] == 100
+        assert data["truncated"] == ["context"]
+        assert "formal" in data["prompt"]
+
+    def test_fit_errors(self, client):
+        status, data = self.generate(client, max_tokens=0)
+        assert status == 400 and "'max_tokens'" in data["error"]
+
+        status, data = self.generate(client, max_tokens=3)
+        assert status == 400
+        assert data["token_budget"] == 3 and data["tokens"] > 3
+
+        request = {
+            "modality": "video",
+            "model": "sora",
+            "payload": {"modality": "video", "goal": "g", "subject": "s"},
+            "fit": True,
+        }
+        response = client.post(
+            "/generate", data=json.dumps(request), content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert "no token budget" in json.loads(response.data)["error"]
+
+    @pytest.mark.parametrize("options", [{}, {"count_tokens": True}])
+    def test_compile_value_errors_are_bad_requests(self, client, monkeypatch, options):
+        import service
+
+        def reject(*args, **kwargs):
+            raise ValueError("Unsupported model: gpt-4")
+
+        monkeypatch.setattr(service.compiler, "compile_payload", reject)
+        status, data = self.generate(client, **options)
+
+        assert (status, data["error"]) == (400, "Unsupported model: gpt-4")
+
+
+class TestBatchEndpoint:
+    """Tests for the batch generation endpoint."""
+
+    def test_batch_generates_in_order(self, client):
+        items = [
+            {
+                "modality": "image",
+                "model": "midjourney",
+                "payload": {"modality": "image", "goal": "test", "subject": "a dragon"},
+            },
+            {
+                "modality": "video",
+                "model": "pika",
+                "payload": {
+                    "modality": "video",
+                    "goal": "test",
+                    "subject": "test",
+                    "scene": "forest",
+                },
+            },
+        ]
+
+        response = client.post(
+            "/generate/batch",
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["count"] == 2
+        assert data["errors"] == 0
+        assert "dragon" in data["results"][0]["prompt"]
+        assert data["results"][1]["model"] == "pika"
+        assert "forest" in data["results"][1]["prompt"]
+
+    def test_batch_reports_item_errors(self, client):
+        items = [
+            {"modality": "image", "model": "invalid-model", "payload": {"subject": "x"}},
+            {
+                "modality": "image",
+                "model": "imagen",
+                "payload": {"modality": "image", "goal": "test", "subject": "a cat"},
+            },
+        ]
+
+        response = client.post(
+            "/generate/batch",
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["errors"] == 1
+        assert "error" in data["results"][0]
+        assert "cat" in data["results"][1]["prompt"]
+
+    def test_batch_requires_items(self, client):
+        response = client.post(
+            "/generate/batch", data=json.dumps({}), content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert "items" in data["error"]
+
+    def test_batch_of_maximum_size(self, client):
+        from app import MAX_BATCH_SIZE
+
+        item = {
+            "modality": "text",
+            "model": "claude",
+            "payload": {"modality": "text", "goal": "test", "subject": "tides"},
+        }
+        response = client.post(
+            "/generate/batch",
+            data=json.dumps({"items": [item] * MAX_BATCH_SIZE}),
+            content_type="application/json",
+            headers={"X-Forwarded-For": "10.1.0.1"},
+        )
+
+        assert response.status_code == 200
+        assert json.loads(response.data)["count"] == MAX_BATCH_SIZE
+
+    def test_batch_too_large(self, client, monkeypatch):
+        monkeypatch.setattr("app.MAX_BATCH_SIZE", 2)
+
+        items = [{"modality": "image"}] * 3
+        response = client.post(
+            "/generate/batch",
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert "maximum size" in data["error"]
+
+
+def ndjson_lines(response):
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+class TestStreaming:
+    """Tests for NDJSON streaming of batch and fan-out results."""
+
+    ITEMS = [
+        {
+            "modality": "image",
+            "model": "midjourney",
+            "payload": {"modality": "image", "goal": "test", "subject": "a dragon"},
+        },
+        {"modality": "image", "model": "invalid-model", "payload": {"subject": "x"}},
+        {
+            "modality": "text",
+            "model": "claude",
+            "payload": {"modality": "text", "goal": "test", "subject": "tides"},
+        },
+    ]
+
+    def test_batch_stream_in_order(self, client):
+        response = client.post(
+            "/generate/batch?stream=1",
+            data=json.dumps({"items": self.ITEMS}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = ndjson_lines(response)
+        assert [(line["index"], line["status"]) for line in lines[:3]] == [
+            (0, 200),
+            (1, 400),
+            (2, 200),
+        ]
+        assert "dragon" in lines[0]["prompt"]
+        assert "invalid-model" in lines[1]["error"]
+        assert lines[3] == {"count": 3, "errors": 1}
+
+    def test_batch_stream_is_lazy(self, client):
+        response = client.post(
+            "/generate/batch?stream=1",
+            data=json.dumps({"items": self.ITEMS}),
+            content_type="application/json",
+            buffered=False,
+        )
+        chunks = iter(response.response)
+
+        first = json.loads(next(chunks))
+        assert first["index"] == 0
+        response.close()
+
+    def test_accept_header_selects_stream(self, client):
+        response = client.post(
+            "/generate/batch",
+            data=json.dumps({"items": self.ITEMS[:1]}),
+            content_type="application/json",
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert response.mimetype == "application/x-ndjson"
+        assert len(ndjson_lines(response)) == 2
+
+    def test_stream_batch_of_maximum_size(self, client):
+        from app import MAX_STREAM_BATCH_SIZE
+
+        response = client.post(
+            "/generate/batch?stream=1",
+            data=json.dumps({"items": self.ITEMS[:1] * MAX_STREAM_BATCH_SIZE}),
+            content_type="application/json",
+            headers={"X-Forwarded-For": "10.1.0.2"},
+        )
+
+        assert response.status_code == 200
+        assert ndjson_lines(response)[-1] == {"count": MAX_STREAM_BATCH_SIZE, "errors": 0}
+
+    def test_stream_batch_size_limit(self, client, monkeypatch):
+        monkeypatch.setattr("app.MAX_BATCH_SIZE", 1)
+        monkeypatch.setattr("app.MAX_STREAM_BATCH_SIZE", 2)
+
+        ok = client.post(
+            "/generate/batch?stream=1",
+            data=json.dumps({"items": self.ITEMS[:2]}),
+            content_type="application/json",
+        )
+        too_large = client.post(
+            "/generate/batch?stream=1",
+            data=json.dumps({"items": self.ITEMS}),
+            content_type="application/json",
+        )
+
+        assert ok.status_code == 200
+        assert too_large.status_code == 400
+
+    def test_fan_out_stream(self, client):
+        response = client.post(
+            "/generate/all?stream=true",
+            data=json.dumps(
+                {"modality": "text", "payload": {"modality": "text", "goal": "g", "subject": "s"}}
+            ),
+            content_type="application/json",
+        )
+
+        lines = ndjson_lines(response)
+        assert [line["model"] for line in lines[:-1]] == [
+            "gpt-4",
+            "llama-3",
+            "mistral",
+            "gemini",
+            "claude",
+        ]
+        assert lines[-1] == {"modality": "text", "count": 5, "errors": 0}
+
+    def test_fan_out_stream_validation_error(self, client):
+        response = client.post(
+            "/generate/all?stream=1",
+            data=json.dumps({"modality": "text", "payload": {"modality": "text"}}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        assert response.mimetype == "application/json"
+
+
+class TestFanOutEndpoint:
+    """Tests for the compile-to-all-models endpoint."""
+
+    def test_generate_all_image_models(self, client):
+        payload = {
+            "modality": "image",
+            "payload": {
+                "modality": "image",
+                "goal": "test",
+                "subject": "a lighthouse",
+                "style": "watercolor",
+            },
+        }
+
+        response = client.post(
+            "/generate/all", data=json.dumps(payload), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["modality"] == "image"
+        assert set(data["prompts"]) == {
+            "dalle",
+            "stable-diffusion",
+            "midjourney",
+            "imagen",
+            "firefly",
+        }
+        assert all("lighthouse" in prompt for prompt in data["prompts"].values())
+
+    def test_generate_all_invalid_modality(self, client):
+        payload = {"modality": "invalid", "payload": {"subject": "a cat"}}
+
+        response = client.post(
+            "/generate/all", data=json.dumps(payload), content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert "modality" in data["error"].lower()
+
+
+class TestVariantsEndpoint:
+    """Tests for the variant expansion endpoint."""
+
+    REQUEST = {
+        "modality": "image",
+        "model": "midjourney",
+        "payload": {"modality": "image", "goal": "test", "subject": "a lighthouse"},
+        "vary": {"lighting": ["dawn", "dusk"], "style": ["ink", "oil", "watercolor"]},
+    }
+
+    def test_streams_every_combination(self, client):
+        response = client.post(
+            "/generate/variants", data=json.dumps(self.REQUEST), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = ndjson_lines(response)
+        assert [line["values"] for line in lines[:2]] == [
+            {"lighting": "dawn", "style": "ink"},
+            {"lighting": "dawn", "style": "oil"},
+        ]
+        assert lines[1]["prompts"] == {
+            "midjourney": "a lighthouse, oil, dawn --ar 16:9 --v 6 --q 2"
+        }
+        assert lines[-1]["combinations"] == lines[-1]["count"] == 6
+
+    def test_sample(self, client):
+        response = client.post(
+            "/generate/variants",
+            data=json.dumps({**self.REQUEST, "sample": 2, "seed": 7}),
+            content_type="application/json",
+        )
+
+        lines = ndjson_lines(response)
+        assert len(lines) == 3
+        assert lines[-1]["count"] == 2
+
+    def test_too_many_variants(self, client, monkeypatch):
+        monkeypatch.setattr("app.MAX_VARIANTS", 5)
+
+        response = client.post(
+            "/generate/variants", data=json.dumps(self.REQUEST), content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        assert "6 variants" in json.loads(response.data)["error"]
+
+    def test_maximum_is_reachable(self, client):
+        from app import BATCH_RATE_LIMIT, MAX_VARIANTS
+
+        values = [f"style {i}" for i in range(MAX_VARIANTS)]
+        response = client.post(
+            "/generate/variants",
+            data=json.dumps({**self.REQUEST, "vary": {"style": values}}),
+            content_type="application/json",
+            headers={"X-Forwarded-For": "10.1.0.3"},
+        )
+        two_models = {**self.REQUEST, "models": ["midjourney", "dalle"], "vary": {"style": values}}
+        too_many = client.post(
+            "/generate/variants",
+            data=json.dumps(two_models),
+            content_type="application/json",
+            headers={"X-Forwarded-For": "10.1.0.4"},
+        )
+
+        assert response.status_code == 200
+        assert ndjson_lines(response)[-1]["count"] == MAX_VARIANTS
+        assert too_many.status_code == 400
+        assert f"the maximum is {BATCH_RATE_LIMIT}" in json.loads(too_many.data)["error"]
+
+
+class TestSessionsEndpoint:
+    """Tests for live-preview compile sessions."""
+
+    REQUEST = {
+        "modality": "image",
+        "models": ["midjourney", "dalle"],
+        "payload": {"modality": "image", "goal": "test", "subject": "a lighthouse"},
+    }
+
+    def open_session(self, client):
+        response = client.post(
+            "/sessions", data=json.dumps(self.REQUEST), content_type="application/json"
+        )
+        assert response.status_code == 201
+        return json.loads(response.data)
+
+    def patch(self, client, session, changes):
+        return client.patch(
+            f"/sessions/{session}",
+            data=json.dumps({"changes": changes}),
+            content_type="application/json",
+        )
+
+    def test_open_and_update(self, client):
+        opened = self.open_session(client)
+        assert opened["prompts"]["midjourney"] == "a lighthouse --ar 16:9 --v 6 --q 2"
+
+        response = self.patch(client, opened["session"], {"lighting": "  dusk "})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["version"] == 1
+        assert data["changed"] == ["lighting"]
+        assert data["prompts"]["midjourney"] == "a lighthouse, dusk --ar 16:9 --v 6 --q 2"
+        assert data["edits"]["midjourney"] == {"start": 12, "end": 12, "text": ", dusk"}
+
+    def test_invalid_changes(self, client):
+        session = self.open_session(client)["session"]
+
+        response = self.patch(client, session, {"subject": None, "duration_seconds": 5})
+
+        assert response.status_code == 400
+        fields = [error["field"] for error in json.loads(response.data)["field_errors"]]
+        assert fields == ["duration_seconds", "subject"]
+
+    def test_unknown_and_closed_sessions(self, client):
+        session = self.open_session(client)["session"]
+
+        assert client.delete(f"/sessions/{session}").status_code == 204
+        assert self.patch(client, session, {"mood": "calm"}).status_code == 404
+        assert client.delete(f"/sessions/{session}").status_code == 404
+
+    def test_session_of_another_worker(self, client):
+        session = self.open_session(client)["session"]
+        _, token = session.split(".", 1)
+
+        response = self.patch(client, f"0000ffff.{token}", {"mood": "calm"})
+
+        assert response.status_code == 421
+        assert "one worker" in json.loads(response.data)["message"]
+        assert client.delete(f"/sessions/0000ffff.{token}").status_code == 421
+
+    def test_delete_is_rate_limited(self, client, monkeypatch):
+        monkeypatch.setattr(rate_limiter, "_rate_limiters", {})
+        monkeypatch.setitem(
+            rate_limiter._rate_limiters,
+            ("sessions", "default"),
+            rate_limiter.RateLimiter(max_requests=2, window_seconds=60),
+        )
+        session = self.open_session(client)["session"]
+
+        assert self.patch(client, session, {"mood": "calm"}).status_code == 200
+        assert client.delete(f"/sessions/{session}").status_code == 204
+        assert client.delete(f"/sessions/{session}").status_code == 429
+
+    def test_invalid_models(self, client):
+        response = client.post(
+            "/sessions",
+            data=json.dumps({**self.REQUEST, "models": ["sora"]}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        assert "sora" in json.loads(response.data)["error"]
+
+
 class TestErrorHandlers:
     """Tests for error handlers."""
 
@@ -0,0 +1,481 @@
+"""
+Integration tests for the ASGI app.
+Mirrors the expectations of test_api.py against the async serving mode.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import asgi
+import rate_limiter
+from asgi import app
+from service import MODELS_ETAG, RATE_LIMIT, compile_request
+
+
+class ASGIResponse:
+    """Minimal response object shaped like Flask's test response."""
+
+    def __init__(self, status_code, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+
+class ASGITestClient:
+    """Drive the ASGI app in-process, one request per event loop run."""
+
+    def request(self, method, path, data=b"", headers=None, content_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        raw_headers = [(b"host", b"testserver")]
+        if content_type:
+            raw_headers.append((b"content-type", content_type.encode()))
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        messages = [{"type": "http.request", "body": data, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app(scope, receive, send))
+
+        start = sent[0]
+        headers = {
+            name.decode().lower(): value.decode() for name, value in start["headers"]
+        }
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+        return ASGIResponse(start["status"], headers, body)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def websocket(self, path, messages, headers=None, extensions=None):
+        """
+        Run a WebSocket connection and return the messages the app sent.
+
+        Each entry of messages is sent as a text frame (strings as is,
+        anything else JSON-encoded), except integers, which wait until the
+        app has sent that many frames; the client hangs up once messages
+        run out and every frame it waited for has arrived.
+        """
+        raw_headers = [(b"host", b"testserver")]
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+            "subprotocols": [],
+            "extensions": extensions or {},
+        }
+        incoming = [{"type": "websocket.connect"}, *messages]
+        sent = []
+
+        async def receive():
+            while incoming and isinstance(incoming[0], int):
+                count = incoming.pop(0)
+                while sum(m["type"] == "websocket.send" for m in sent) < count:
+                    await asyncio.sleep(0.001)
+            if not incoming:
+                await asyncio.sleep(0.001)
+                return {"type": "websocket.disconnect", "code": 1000}
+            message = incoming.pop(0)
+            if message == {"type": "websocket.connect"}:
+                return message
+            text = message if isinstance(message, str) else json.dumps(message)
+            return {"type": "websocket.receive", "text": text}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(asyncio.wait_for(app(scope, receive, send), 5))
+        return sent
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create a test client with fresh rate limiter state."""
+    monkeypatch.setattr(rate_limiter, "_rate_limiters", {})
+    return ASGITestClient()
+
+
+def post_json(client, payload):
+    return client.post(
+        "/generate", data=json.dumps(payload), content_type="application/json"
+    )
+
+
+class TestHealthEndpoint:
+    """Tests for the health check endpoint."""
+
+    def test_health_check(self, client):
+        response = client.get("/health")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["status"] == "healthy"
+        assert "timestamp" in data
+
+
+class TestModelsEndpoint:
+    """Tests for the models endpoint."""
+
+    def test_get_models(self, client):
+        response = client.get("/models")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert set(data["models"]) == {"text", "image", "video", "audio"}
+        assert "dalle" in data["models"]["image"]
+        assert "runway" in data["models"]["video"]
+        assert "elevenlabs" in data["models"]["audio"]
+
+    def test_cache_headers(self, client):
+        response = client.get("/models")
+
+        assert response.headers["etag"] == MODELS_ETAG
+        assert response.headers["cache-control"].startswith("public, max-age=")
+
+    def test_not_modified(self, client):
+        response = client.get("/models", headers={"If-None-Match": MODELS_ETAG})
+
+        assert response.status_code == 304
+        assert response.data == b""
+        assert "content-length" not in response.headers
+        assert response.headers["etag"] == MODELS_ETAG
+
+
+class TestGenerateEndpoint:
+    """Tests for the prompt generation endpoint."""
+
+    def test_generate_image_prompt(self, client):
+        response = post_json(
+            client,
+            {
+                "modality": "image",
+                "model": "dalle",
+                "payload": {
+                    "modality": "image",
+                    "goal": "test",
+                    "subject": "a cat",
+                    "style": "photorealistic",
+                },
+            },
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert "cat" in data["prompt"]
+        assert response.headers["x-ratelimit-limit"] == str(RATE_LIMIT)
+
+    def test_generate_video_prompt_sora(self, client):
+        response = post_json(
+            client,
+            {
+                "modality": "video",
+                "model": "sora",
+                "payload": {
+                    "modality": "video",
+                    "goal": "test",
+                    "subject": "test",
+                    "scene": "city street",
+                    "action": "people walking",
+                    "duration_seconds": 10,
+                },
+            },
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert "city street" in data["prompt"]
+
+    def test_generate_audio_prompt_elevenlabs(self, client):
+        response = post_json(
+            client,
+            {
+                "modality": "audio",
+                "model": "elevenlabs",
+                "payload": {
+                    "modality": "audio",
+                    "goal": "test",
+                    "subject": "test",
+                    "accent": "American",
+                    "emotion": "calm",
+                },
+            },
+        )
+
+        assert response.status_code == 200
+        assert "Accent: American" in json.loads(response.data)["prompt"]
+
+    @pytest.mark.parametrize(
+        "payload, fragment",
+        [
+            ({"model": "dalle", "payload": {"subject": "a cat"}}, "modality"),
+            (
+                {"modality": "invalid", "model": "dalle", "payload": {"subject": "a"}},
+                "modality",
+            ),
+            ({"modality": "image", "payload": {"subject": "a cat"}}, "model"),
+            (
+                {"modality": "image", "model": "invalid-model", "payload": {"subject": "a"}},
+                "model",
+            ),
+            ({"modality": "image", "model": "dalle"}, "payload"),
+            ({}, "required"),
+        ],
+    )
+    def test_validation_errors(self, client, payload, fragment):
+        response = post_json(client, payload)
+
+        assert response.status_code == 400
+        assert fragment in json.loads(response.data)["error"].lower()
+
+    def test_text_field_too_long(self, client):
+        response = post_json(
+            client,
+            {
+                "modality": "image",
+                "model": "dalle",
+                "payload": {"modality": "image", "goal": "test", "subject": "a" * 3000},
+            },
+        )
+
+        assert response.status_code == 400
+        assert "length" in json.loads(response.data)["error"].lower()
+
+    def test_invalid_duration(self, client):
+        response = post_json(
+            client,
+            {
+                "modality": "video",
+                "model": "sora",
+                "payload": {
+                    "modality": "video",
+                    "goal": "test",
+                    "subject": "test",
+                    "scene": "city",
+                    "duration_seconds": 1000,
+                },
+            },
+        )
+
+        assert response.status_code == 400
+
+    def test_invalid_json(self, client):
+        response = client.post(
+            "/generate", data="{not json", content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        assert "error" in json.loads(response.data)
+
+    def test_rate_limit(self, client, monkeypatch):
+        monkeypatch.setitem(
+            rate_limiter._rate_limiters,
+            ("generate", "default"),
+            rate_limiter.RateLimiter(max_requests=1, window_seconds=60),
+        )
+        payload = {
+            "modality": "image",
+            "model": "imagen",
+            "payload": {"modality": "image", "goal": "test", "subject": "a cat"},
+        }
+
+        assert post_json(client, payload).status_code == 200
+        response = post_json(client, payload)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) > 0
+
+
+class TestLivePreview:
+    """Tests for the live-preview WebSocket."""
+
+    OPEN = {
+        "modality": "image",
+        "models": ["midjourney", "dalle"],
+        "payload": {"modality": "image", "goal": "test", "subject": "a cat"},
+    }
+
+    @staticmethod
+    def frames(sent):
+        return [json.loads(m["text"]) for m in sent if m["type"] == "websocket.send"]
+
+    def test_changes_are_coalesced(self, client):
+        sent = client.websocket(
+            "/live",
+            [
+                self.OPEN,
+                {"changes": {"lighting": "d"}},
+                {"changes": {"lighting": "  dusk  "}},
+                {"changes": {"mood": "calm"}},
+                2,
+            ],
+        )
+
+        assert sent[0]["type"] == "websocket.accept"
+        opened, update = self.frames(sent)
+        assert opened["type"] == "session" and opened["version"] == 0
+        assert update["type"] == "update"
+        assert (update["version"], update["merged"]) == (1, 3)
+        assert update["changed"] == ["lighting", "mood"]
+        for model, prompt in update["prompts"].items():
+            payload = {**self.OPEN["payload"], "lighting": "dusk", "mood": "calm"}
+            body, _ = compile_request({"modality": "image", "model": model, "payload": payload})
+            assert prompt == body["prompt"]
+
+    @pytest.mark.parametrize("rate", [1000, 0])
+    def test_each_settled_change_is_pushed(self, client, monkeypatch, rate):
+        monkeypatch.setattr(asgi, "LIVE_MAX_UPDATES_PER_SECOND", rate)
+        sent = client.websocket(
+            "/live",
+            [self.OPEN, 1, {"changes": {"lighting": "dusk"}}, 2, {"changes": {"mood": "calm"}}, 3],
+        )
+
+        updates = self.frames(sent)[1:]
+        assert [(u["version"], u["merged"], u["changed"]) for u in updates] == [
+            (1, 1, ["lighting"]),
+            (2, 1, ["mood"]),
+        ]
+        assert updates[1]["edits"]["midjourney"]["text"] == ", calm"
+
+    def test_errors_keep_the_connection_open(self, client):
+        sent = client.websocket(
+            "/live",
+            [
+                {"changes": {"mood": "calm"}},
+                1,
+                "not json",
+                2,
+                self.OPEN,
+                3,
+                {"changes": {"mood": 3}},
+                4,
+            ],
+        )
+
+        frames = self.frames(sent)
+        assert "before any changes" in frames[0]["error"]
+        assert frames[1] == {"type": "error", "error": "Messages must be valid JSON"}
+        assert frames[2]["type"] == "session"
+        assert frames[3]["field_errors"][0]["field"] == "mood"
+
+    def test_payloads_are_coalesced(self, client, monkeypatch):
+        opened = []
+        original = asgi.open_session
+
+        def open_session(data):
+            opened.append(data["payload"]["subject"])
+            return original(data)
+
+        monkeypatch.setattr(asgi, "open_session", open_session)
+        payloads = [
+            {**self.OPEN, "payload": {**self.OPEN["payload"], "subject": subject}}
+            for subject in ("a cat", "a dog", "a fox")
+        ]
+        sent = client.websocket("/live", [*payloads, {"changes": {"mood": "calm"}}, 2])
+
+        assert opened == ["a fox"]
+        opened_frame, update = self.frames(sent)
+        assert opened_frame["type"] == "session"
+        assert "a fox" in opened_frame["prompts"]["dalle"]
+        assert (update["version"], update["merged"], update["changed"]) == (1, 1, ["mood"])
+
+    def test_reopens_are_rate_limited(self, client, monkeypatch):
+        monkeypatch.setitem(
+            rate_limiter._rate_limiters,
+            ("live", "default"),
+            rate_limiter.RateLimiter(max_requests=2, window_seconds=60),
+        )
+
+        sent = client.websocket(
+            "/live",
+            [self.OPEN, 1, self.OPEN, 2, self.OPEN, {"changes": {"mood": "calm"}}, 4],
+        )
+
+        frames = self.frames(sent)
+        assert [frame["type"] for frame in frames] == ["session", "session", "error", "update"]
+        assert frames[2]["error"] == "Rate limit exceeded"
+        # The changes sent after the rejected payload apply to the open session
+        assert (frames[3]["version"], frames[3]["changed"]) == (1, ["mood"])
+
+    def test_message_too_large(self, client, monkeypatch):
+        monkeypatch.setattr(asgi, "MAX_BODY_BYTES", 64)
+        sent = client.websocket("/live", [self.OPEN])
+
+        assert sent[-1] == {"type": "websocket.close", "code": 1009}
+
+    def test_rate_limit_charges_connections(self, client, monkeypatch):
+        monkeypatch.setitem(
+            rate_limiter._rate_limiters,
+            ("live", "default"),
+            rate_limiter.RateLimiter(max_requests=1, window_seconds=60),
+        )
+
+        sent = client.websocket("/live", [self.OPEN, {"changes": {"mood": "calm"}}, 2])
+        assert sent[0]["type"] == "websocket.accept"
+        assert len(self.frames(sent)) == 2
+
+        assert client.websocket("/live", []) == [{"type": "websocket.close", "code": 1008}]
+        sent = client.websocket("/live", [], extensions={"websocket.http.response": {}})
+        assert sent[0]["status"] == 429
+        assert "retry-after" in dict((k.decode(), v) for k, v in sent[0]["headers"])
+
+    def test_unknown_origin_rejected(self, client):
+        sent = client.websocket("/live", [], headers={"Origin": "http://evil.example"})
+        assert sent == [{"type": "websocket.close", "code": 1008}]
+
+
+class TestErrorHandlers:
+    """Tests for error handlers and CORS."""
+
+    def test_404_error(self, client):
+        response = client.get("/nonexistent")
+        assert response.status_code == 404
+        assert "error" in json.loads(response.data)
+
+    def test_405_error(self, client):
+        response = client.get("/generate")
+        assert response.status_code == 405
+        assert "error" in json.loads(response.data)
+
+    def test_cors_allowed_origin(self, client):
+        response = client.get("/health", headers={"Origin": "http://localhost:3000"})
+        assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+
+    def test_cors_unknown_origin(self, client):
+        response = client.get("/health", headers={"Origin": "http://evil.example"})
+        assert "access-control-allow-origin" not in response.headers
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
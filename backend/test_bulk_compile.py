@@ -0,0 +1,276 @@
+"""
+Tests for the offline bulk compile CLI.
+Run with: pytest test_bulk_compile.py -v
+"""
+
+import csv
+import json
+
+import pytest
+
+from bulk_compile import bulk_compile, main
+from service import compile_request
+
+ROWS = [
+    {"modality": "image", "model": "midjourney", "goal": "g", "subject": "a mug"},
+    {"modality": "image", "model": "nope", "goal": "g", "subject": "a mug"},
+    {
+        "modality": "text",
+        "model": "claude",
+        "payload": {"modality": "text", "goal": "g", "subject": "tides"},
+    },
+    {"modality": "video", "model": "sora", "goal": "g", "subject": "a train", "scene": "snow"},
+]
+
+
+def write_jsonl(path, rows, extra=b""):
+    with open(path, "wb") as f:
+        for row in rows:
+            f.write(json.dumps(row).encode() + b"\n")
+        f.write(extra)
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def many_rows():
+    return [
+        {"modality": "image", "model": "dalle", "goal": "g", "subject": f"mug {i}"}
+        if i % 7
+        else {"modality": "image", "model": "dalle", "subject": f"mug {i}"}
+        for i in range(250)
+    ]
+
+
+class TestBulkCompile:
+    """Tests for bulk_compile."""
+
+    def test_matches_compile_request(self, tmp_path):
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        write_jsonl(source, ROWS, extra=b"not json\n\n")
+
+        stats = bulk_compile(str(source), str(output), workers=0, chunk_size=2)
+
+        lines = read_output(output)
+        assert [line["row"] for line in lines] == [0, 1, 2, 3, 4]
+        request = {
+            "modality": "image",
+            "model": "midjourney",
+            "payload": {"modality": "image", "goal": "g", "subject": "a mug"},
+        }
+        assert lines[0]["prompt"] == compile_request(request)[0]["prompt"]
+        assert lines[1]["status"] == 400 and "nope" in lines[1]["error"]
+        assert "tides" in lines[2]["prompt"]
+        assert lines[4] == {"row": 4, "status": 400, "error": "Row is not valid JSON"}
+        assert (stats["rows"], stats["errors"]) == (5, 2)
+
+    def test_process_pool_keeps_order(self, tmp_path, many_rows):
+        source = tmp_path / "in.jsonl"
+        write_jsonl(source, many_rows)
+
+        bulk_compile(str(source), str(tmp_path / "inline.jsonl"), workers=0, chunk_size=16)
+        bulk_compile(str(source), str(tmp_path / "pool.jsonl"), workers=2, chunk_size=16)
+
+        assert read_output(tmp_path / "pool.jsonl") == read_output(tmp_path / "inline.jsonl")
+
+    def test_unordered_writes_every_row_once(self, tmp_path, many_rows):
+        source = tmp_path / "in.jsonl"
+        write_jsonl(source, many_rows)
+
+        bulk_compile(str(source), str(tmp_path / "ordered.jsonl"), workers=0, chunk_size=16)
+        bulk_compile(
+            str(source), str(tmp_path / "unordered.jsonl"), workers=2, chunk_size=16, ordered=False
+        )
+
+        unordered = sorted(read_output(tmp_path / "unordered.jsonl"), key=lambda line: line["row"])
+        assert unordered == read_output(tmp_path / "ordered.jsonl")
+
+    def test_unexpected_error_fails_only_its_row(self, tmp_path, monkeypatch):
+        import bulk_compile as module
+
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        write_jsonl(source, ROWS)
+
+        def compile_or_crash(request):
+            if request["model"] == "claude":
+                raise OverflowError("cannot convert float infinity to integer")
+            return compile_request(request)
+
+        monkeypatch.setattr(module, "compile_request", compile_or_crash)
+        stats = bulk_compile(str(source), str(output), workers=0)
+
+        lines = read_output(output)
+        assert [line["row"] for line in lines] == [0, 1, 2, 3]
+        assert lines[2]["status"] == 500 and "OverflowError" in lines[2]["error"]
+        assert "prompt" in lines[3]
+        assert stats["errors"] == 2
+
+    def test_csv_rows(self, tmp_path):
+        source, output = tmp_path / "in.csv", tmp_path / "out.jsonl"
+        with open(source, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["modality", "model", "goal", "subject", "style", "negative_constraints"]
+            )
+            writer.writerow(["image", "dalle", "g", "a mug", "", "blurry | text"])
+            writer.writerow(["image", "dalle", "g", "a mug\non two lines", "ink", ""])
+
+        bulk_compile(str(source), str(output), workers=0)
+
+        first, second = read_output(output)
+        expected = compile_request(
+            {
+                "modality": "image",
+                "model": "dalle",
+                "payload": {
+                    "modality": "image",
+                    "goal": "g",
+                    "subject": "a mug",
+                    "negative_constraints": ["blurry", "text"],
+                },
+            }
+        )[0]["prompt"]
+        assert first["prompt"] == expected
+        assert second["row"] == 1 and "a mug on two lines" in second["prompt"]
+
+
+class TestResume:
+    """Checkpoints let an interrupted or extended run continue."""
+
+    @pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+    def test_resume_continues_after_checkpoint(self, tmp_path, many_rows, fmt):
+        source = tmp_path / f"in.{fmt}"
+        output, checkpoint = tmp_path / "out.jsonl", tmp_path / "run.ckpt"
+
+        def write_input(rows):
+            if fmt == "jsonl":
+                write_jsonl(source, rows)
+                return
+            with open(source, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, ["modality", "model", "goal", "subject"])
+                writer.writeheader()
+                writer.writerows(rows)
+
+        write_input(many_rows[:100])
+        bulk_compile(
+            str(source), str(output), workers=0, chunk_size=30, checkpoint_path=str(checkpoint)
+        )
+        assert json.loads(checkpoint.read_text())["row"] == 100
+
+        # The input grows and a crash left half a chunk after the checkpoint
+        write_input(many_rows)
+        with open(output, "ab") as f:
+            f.write(b'{"row": 100, "partial')
+
+        stats = bulk_compile(
+            str(source),
+            str(output),
+            workers=0,
+            chunk_size=30,
+            checkpoint_path=str(checkpoint),
+            resume=True,
+        )
+
+        bulk_compile(str(source), str(tmp_path / "fresh.jsonl"), workers=0)
+        assert stats["rows"] == 150
+        assert read_output(output) == read_output(tmp_path / "fresh.jsonl")
+
+    def test_checkpoint_for_other_input_rejected(self, tmp_path):
+        first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+        write_jsonl(first, ROWS)
+        write_jsonl(second, ROWS)
+        checkpoint = str(tmp_path / "run.ckpt")
+        bulk_compile(str(first), str(tmp_path / "out.jsonl"), workers=0, checkpoint_path=checkpoint)
+
+        with pytest.raises(ValueError, match="a.jsonl"):
+            bulk_compile(
+                str(second),
+                str(tmp_path / "out.jsonl"),
+                workers=0,
+                checkpoint_path=checkpoint,
+                resume=True,
+            )
+
+
+    def test_unordered_resume_skips_rows_already_written(self, tmp_path, many_rows):
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        checkpoint = tmp_path / "run.ckpt"
+        write_jsonl(source, many_rows[:100])
+        bulk_compile(str(source), str(tmp_path / "fresh.jsonl"), workers=0)
+        fresh = (tmp_path / "fresh.jsonl").read_bytes().splitlines(keepends=True)
+
+        # An unordered run with 30-row chunks stopped after writing rows 0-29
+        # and 60-89; the partial last chunk, rows 90-99, finished too
+        output.write_bytes(b"".join(fresh[:30] + fresh[60:]))
+        checkpoint.write_text(
+            json.dumps(
+                {
+                    "input": str(source),
+                    "row": 30,
+                    "offset": sum(len(json.dumps(row)) + 1 for row in many_rows[:30]),
+                    "output_bytes": output.stat().st_size,
+                    "chunk_size": 30,
+                    "finished": [[60, 90], [90, 100]],
+                }
+            )
+        )
+        write_jsonl(source, many_rows)
+
+        stats = bulk_compile(
+            str(source),
+            str(output),
+            workers=0,
+            chunk_size=30,
+            checkpoint_path=str(checkpoint),
+            resume=True,
+            ordered=False,
+        )
+
+        bulk_compile(str(source), str(tmp_path / "fresh.jsonl"), workers=0)
+        assert stats["rows"] == 30 + 150
+        rows = sorted(read_output(output), key=lambda line: line["row"])
+        assert rows == read_output(tmp_path / "fresh.jsonl")
+        assert json.loads(checkpoint.read_text())["finished"] == []
+
+        # Other chunk boundaries would not line up with the rows it lists
+        checkpoint.write_text(
+            json.dumps({**json.loads(checkpoint.read_text()), "finished": [[300, 330]]})
+        )
+        with pytest.raises(ValueError, match="--chunk-size 30"):
+            bulk_compile(
+                str(source), str(output), workers=0, checkpoint_path=str(checkpoint), resume=True
+            )
+
+    @pytest.mark.parametrize("damage", ["missing", "short"])
+    def test_resume_without_checkpointed_output_rejected(self, tmp_path, damage):
+        source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+        checkpoint = tmp_path / "run.ckpt"
+        write_jsonl(source, ROWS)
+        bulk_compile(str(source), str(output), workers=0, checkpoint_path=str(checkpoint))
+        if damage == "missing":
+            output.unlink()
+        else:
+            output.write_bytes(output.read_bytes()[:10])
+
+        with pytest.raises(ValueError, match="missing or shorter"):
+            bulk_compile(
+                str(source), str(output), workers=0, checkpoint_path=str(checkpoint), resume=True
+            )
+        assert not output.exists() or output.stat().st_size == 10
+
+
+def test_cli(tmp_path, capsys):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(source, ROWS)
+
+    assert main([str(source), "-o", str(output), "--workers", "0"]) == 0
+
+    assert len(read_output(output)) == 4
+    assert "rows/sec" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""
+Unit tests for the compile cache.
+"""
+
+import pytest
+from cache import CompileCache, payload_key
+
+
+class TestPayloadKey:
+    """Tests for cache key construction."""
+
+    def test_key_ignores_field_order(self):
+        a = payload_key("dalle", {"subject": "a cat", "style": "oil"})
+        b = payload_key("dalle", {"style": "oil", "subject": "a cat"})
+
+        assert a == b
+
+    def test_key_depends_on_model_and_values(self):
+        base = payload_key("dalle", {"subject": "a cat"})
+
+        assert base != payload_key("imagen", {"subject": "a cat"})
+        assert base != payload_key("dalle", {"subject": "a dog"})
+
+
+class TestCompileCache:
+    """Tests for CompileCache eviction and counters."""
+
+    def test_hit_and_miss_counters(self):
+        cache = CompileCache(max_entries=10)
+
+        assert cache.get("k") is None
+        cache.set("k", "prompt")
+        assert cache.get("k") == "prompt"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_lru_eviction(self):
+        cache = CompileCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+        cache = CompileCache(max_entries=10, ttl_seconds=5)
+        cache.set("k", "prompt")
+
+        now[0] += 4
+        assert cache.get("k") == "prompt"
+        now[0] += 2
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_byte_cap(self):
+        cache = CompileCache(max_entries=100, max_bytes=300)
+        for i in range(10):
+            cache.set(i, "x" * 50)
+
+        stats = cache.stats()
+        assert stats["bytes"] <= 300
+        assert stats["entries"] < 10
+        assert cache.get(9) is not None
+
+    def test_delete(self):
+        cache = CompileCache(max_entries=10)
+        cache.set("k", "prompt")
+
+        assert cache.delete("k") is True
+        assert cache.delete("k") is False
+        assert cache.get("k") is None
+        assert cache.stats()["bytes"] == 0
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = CompileCache(max_entries=0)
+        cache.set("k", "prompt")
+
+        assert cache.get("k") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
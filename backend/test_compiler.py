@@ -0,0 +1,123 @@
+"""
+Unit tests for the prompt compiler.
+"""
+
+import sys
+
+import pytest
+from adapters.render import Line, Spec, SpecAdapter
+from cache import CompileCache
+from compiler import PromptCompiler, adapter_version
+from registry import ADAPTER_REGISTRY
+from schema import TextPrompt
+
+
+def frame_count(duration_seconds):
+    return duration_seconds * 24
+
+
+def frame_count_at_30_fps(duration_seconds):
+    return duration_seconds * 30
+
+
+def clip_adapter():
+    """A fresh adapter class, so its plan is fingerprinted anew."""
+
+    class ClipAdapter(SpecAdapter):
+        modality = "video"
+        spec = Spec(
+            [Line("Frames: {duration_seconds}", transforms={"duration_seconds": frame_count})]
+        )
+
+    return ClipAdapter()
+
+
+@pytest.fixture
+def text_prompt():
+    return TextPrompt(
+        modality="text",
+        goal="Summarize",
+        subject="quarterly results",
+        tone="formal",
+    )
+
+
+class TestPromptCompiler:
+    """Tests for PromptCompiler."""
+
+    def test_compile_single_model(self, text_prompt):
+        result = PromptCompiler().compile(text_prompt, "claude")
+
+        assert result == ADAPTER_REGISTRY["claude"].compile(text_prompt)
+
+    def test_compile_unknown_model(self, text_prompt):
+        with pytest.raises(ValueError):
+            PromptCompiler().compile(text_prompt, "unknown")
+
+    def test_compile_all_matches_individual_calls(self, text_prompt):
+        compiler = PromptCompiler()
+        results = compiler.compile_all(text_prompt, "text")
+
+        assert list(results) == ["gpt-4", "llama-3", "mistral", "gemini", "claude"]
+        for model, prompt in results.items():
+            assert prompt == compiler.compile(text_prompt, model)
+
+    def test_compile_all_unknown_modality(self, text_prompt):
+        with pytest.raises(ValueError):
+            PromptCompiler().compile_all(text_prompt, "smell")
+
+    def test_compile_payload_uses_cache(self, monkeypatch):
+        compiler = PromptCompiler(cache=CompileCache(max_entries=10))
+        payload = {"modality": "text", "goal": "Explain", "subject": "tides"}
+
+        first = compiler.compile_payload("text", payload, "gemini")
+        monkeypatch.setattr(compiler, "compile", None)
+        second = compiler.compile_payload("text", dict(payload), "gemini")
+
+        assert first == second
+        assert compiler.cache.stats()["hits"] == 1
+
+    def test_compile_payload_rejects_unknown_fields(self):
+        compiler = PromptCompiler(cache=CompileCache(max_entries=10))
+        payload = {"modality": "text", "goal": "x", "subject": "y", "bogus": 1}
+
+        with pytest.raises(TypeError):
+            compiler.compile_payload("text", payload, "gemini")
+        assert len(compiler.cache) == 0
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="prompt store requires POSIX file locks")
+    def test_compile_payload_reads_through_store(self, tmp_path, monkeypatch):
+        from prompt_store import PromptStore
+
+        store = PromptStore(str(tmp_path / "prompts"))
+        payload = {"modality": "text", "goal": "Explain", "subject": "tides"}
+        first = PromptCompiler(store=store).compile_payload("text", payload, "gemini")
+
+        # A new process: empty cache, prompts served from disk
+        compiler = PromptCompiler(cache=CompileCache(max_entries=10), store=store)
+        monkeypatch.setattr(compiler, "compile", None)
+        assert compiler.compile_payload("text", dict(payload), "gemini") == first
+        assert store.stats()["hits"] == 1
+        assert compiler.cache.stats()["entries"] == 1
+
+    def test_adapter_version_changes_with_spec(self, monkeypatch):
+        adapter = ADAPTER_REGISTRY["gemini"]
+        version = adapter_version(adapter)
+
+        assert version == adapter.plan.fingerprint
+        assert version != adapter_version(ADAPTER_REGISTRY["claude"])
+        monkeypatch.setattr(adapter, "version", "2024-06")
+        assert adapter_version(adapter) == "2024-06"
+
+    def test_adapter_version_changes_with_transform_code(self, monkeypatch):
+        version = adapter_version(clip_adapter())
+        assert adapter_version(clip_adapter()) == version
+
+        # Same transform, same name, new body
+        monkeypatch.setattr(frame_count, "__code__", frame_count_at_30_fps.__code__)
+
+        assert adapter_version(clip_adapter()) != version
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,92 @@
+"""
+Tests for the JSON codec and the Flask JSON provider.
+Run with: pytest test_jsoncodec.py -v
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import jsoncodec
+from app import app
+from registry import get_available_models_by_modality
+
+DOCUMENTS = [
+    {"prompt": "a ceramic mug", "model": "dalle", "modality": "image"},
+    {"error": "Missing required field: goal", "field_errors": [{"field": "goal"}]},
+    {"z": 1, "a": [1, 2.5, True, None], "m": {"nested": "é 字 \U0001f600 \"quoted\"\n"}},
+    {"prompt": "x" * 2000, "count": 2**40},
+    [],
+]
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask app."""
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+class TestCodec:
+    """dumps/loads agree with the stdlib json module."""
+
+    @pytest.mark.parametrize("obj", DOCUMENTS)
+    def test_backends_encode_identically(self, obj):
+        assert jsoncodec.dumps(obj) == jsoncodec.stdlib_dumps(obj)
+
+    @pytest.mark.parametrize("obj", DOCUMENTS)
+    def test_round_trip(self, obj):
+        data = jsoncodec.dumps(obj)
+        assert isinstance(data, bytes)
+        assert jsoncodec.loads(data) == json.loads(data) == obj
+
+    def test_key_order_is_preserved(self):
+        assert jsoncodec.dumps({"b": 1, "a": 2}) == b'{"b":1,"a":2}'
+
+    def test_dates_use_http_format(self):
+        when = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        assert jsoncodec.dumps({"at": when}) == jsoncodec.stdlib_dumps({"at": when})
+
+    def test_invalid_json_raises_value_error(self):
+        with pytest.raises(ValueError):
+            jsoncodec.loads(b'{"modality": ')
+
+
+class TestProvider:
+    """The Flask app encodes and decodes through jsoncodec."""
+
+    def test_app_uses_provider(self):
+        assert isinstance(app.json, jsoncodec.FastJSONProvider)
+
+    def test_models_served_pre_encoded(self, client):
+        response = client.get("/models")
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        assert response.data == jsoncodec.dumps({"models": get_available_models_by_modality()})
+
+    def test_stats_reports_backend(self, client):
+        assert client.get("/stats").get_json()["json_backend"] == jsoncodec.BACKEND
+
+    def test_request_body_round_trip(self, client):
+        subject = "a mug with a é and 字"
+        response = client.post(
+            "/generate",
+            data=jsoncodec.dumps(
+                {
+                    "modality": "image",
+                    "model": "midjourney",
+                    "payload": {"modality": "image", "goal": "g", "subject": subject},
+                }
+            ),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert subject in response.get_json()["prompt"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,189 @@
+"""
+Tests for adapter plugin discovery.
+Plugins are real distribution metadata directories on sys.path.
+Run with: pytest test_plugins.py -v
+"""
+
+import json
+import os
+import stat
+
+import pytest
+
+import plugins
+from plugins import discover_adapters, scan_entry_points
+from registry import ADAPTER_PATHS, AdapterRegistry, register_plugins
+from schema import PROMPT_TYPES, ImagePrompt
+
+PLUGIN_MODULE = '''
+from adapters.render import Field, Line, Spec, SpecAdapter
+
+
+class HouseStyleAdapter(SpecAdapter):
+    model_name = "house-style"
+    modality = "image"
+
+    spec = Spec([Line("{subject}"), Field("style", "in house style {}")], sep=", ")
+'''
+
+
+def install(site, name, entry_points, module=None):
+    """Write a distribution's metadata (and optionally its module) into `site`."""
+    dist_info = site / f"{name}-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n")
+    lines = [f"{key} = {value}" for key, value in entry_points.items()]
+    (dist_info / "entry_points.txt").write_text(
+        "[prompt_generator.adapters]\n" + "\n".join(lines) + "\n"
+    )
+    if module is not None:
+        (site / f"{name}.py").write_text(module)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A site directory on sys.path for test distributions."""
+    path = tmp_path / "site"
+    path.mkdir()
+    monkeypatch.syspath_prepend(str(path))
+    return path
+
+
+class TestScan:
+    """Tests for reading entry points."""
+
+    def test_discovers_entry_points(self, site):
+        install(site, "house_plugins", {"image.house-style": "house_plugins:HouseStyleAdapter"})
+
+        adapters = discover_adapters(modalities=PROMPT_TYPES, index_path="")
+
+        assert adapters["house-style"] == ("image", "house_plugins:HouseStyleAdapter")
+
+    def test_invalid_entries_skipped(self, site):
+        install(
+            site,
+            "odd_plugins",
+            {
+                "no-modality": "odd_plugins:Adapter",
+                "image.no-class": "odd_plugins",
+                "smell.nose": "odd_plugins:NoseAdapter",
+                "text.fine": "odd_plugins:FineAdapter",
+            },
+        )
+
+        adapters = scan_entry_points(modalities=PROMPT_TYPES)
+
+        assert adapters["fine"] == ("text", "odd_plugins:FineAdapter")
+        assert not {"no-modality", "no-class", "nose"} & set(adapters)
+
+
+class TestIndexCache:
+    """The discovered index is reused until installed distributions change."""
+
+    def test_reused_while_unchanged(self, site, tmp_path, monkeypatch):
+        install(site, "house_plugins", {"image.house-style": "house_plugins:HouseStyleAdapter"})
+        index_path = str(tmp_path / "index.json")
+        first = discover_adapters(index_path=index_path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("entry points rescanned")
+
+        monkeypatch.setattr(plugins, "scan_entry_points", fail)
+        assert discover_adapters(index_path=index_path) == first
+
+    def test_invalidated_by_install(self, site, tmp_path):
+        index_path = str(tmp_path / "index.json")
+        assert "late" not in discover_adapters(index_path=index_path)
+
+        install(site, "late_plugins", {"text.late": "late_plugins:LateAdapter"})
+
+        adapters = discover_adapters(index_path=index_path)
+        assert adapters["late"] == ("text", "late_plugins:LateAdapter")
+
+    def test_corrupt_index_ignored(self, site, tmp_path):
+        index_path = tmp_path / "index.json"
+        index_path.write_text("{not json")
+        install(site, "house_plugins", {"image.house-style": "house_plugins:HouseStyleAdapter"})
+
+        assert "house-style" in discover_adapters(index_path=str(index_path))
+
+    def test_default_path_is_per_user(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        assert plugins.default_index_path() == str(
+            tmp_path / "cache" / "prompt-generator" / "adapter-index.json"
+        )
+
+        monkeypatch.delenv("XDG_CACHE_HOME")
+        monkeypatch.setenv("HOME", str(tmp_path))
+        assert plugins.default_index_path().startswith(str(tmp_path / ".cache"))
+
+    def test_no_cache_without_home(self, monkeypatch):
+        monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+        monkeypatch.setattr(os.path, "expanduser", lambda path: path)
+        assert plugins.default_index_path() == ""
+
+    def test_unwritable_cache_dir_skipped(self, site, tmp_path, caplog):
+        # A read-only deployment: the cache directory cannot be created
+        (tmp_path / "ro").write_text("")
+        index_path = tmp_path / "ro" / "prompt-generator" / "index.json"
+        install(site, "house_plugins", {"image.house-style": "house_plugins:HouseStyleAdapter"})
+
+        with caplog.at_level("WARNING", logger="plugins"):
+            assert "house-style" in discover_adapters(index_path=str(index_path))
+
+        assert not index_path.exists()
+        assert not caplog.records
+
+    @pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX file ownership")
+    def test_index_is_private(self, site, tmp_path):
+        index_path = tmp_path / "cache" / "prompt-generator" / "index.json"
+        discover_adapters(index_path=str(index_path))
+
+        assert stat.S_IMODE(index_path.stat().st_mode) == 0o600
+        assert stat.S_IMODE(index_path.parent.stat().st_mode) == 0o700
+
+    @pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX file ownership")
+    @pytest.mark.parametrize("foreign", ["owner", "mode"])
+    def test_untrusted_index_ignored(self, site, tmp_path, monkeypatch, foreign):
+        # An index planted by someone else names classes that are not installed
+        index_path = tmp_path / "index.json"
+        discover_adapters(index_path=str(index_path))
+        index = json.loads(index_path.read_text())
+        index["adapters"] = {"planted": ["text", "evil:Adapter"]}
+        index_path.write_text(json.dumps(index))
+        if foreign == "owner":
+            monkeypatch.setattr(plugins.os, "getuid", lambda: index_path.stat().st_uid + 1)
+        else:
+            index_path.chmod(0o666)
+
+        assert "planted" not in discover_adapters(index_path=str(index_path))
+
+
+class TestRegisterPlugins:
+    """Discovered plugins join the registry like built-in adapters."""
+
+    def test_plugin_loaded_on_first_use(self, site):
+        install(
+            site,
+            "house_adapters",
+            {"image.house-style": "house_adapters:HouseStyleAdapter"},
+            module=PLUGIN_MODULE,
+        )
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        register_plugins(registry, discover_adapters(index_path=""))
+        assert not registry.is_loaded("house-style")
+
+        prompt = ImagePrompt(modality="image", goal="g", subject="a mug", style="bold")
+
+        assert registry["house-style"].compile(prompt) == "a mug, in house style bold"
+        assert registry.index()["house-style"].modality == "image"
+
+    def test_builtin_models_not_replaced(self):
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        register_plugins(registry, {"claude": ("text", "elsewhere:ClaudeAdapter")})
+
+        assert registry.index()["claude"].target == ADAPTER_PATHS["claude"][1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
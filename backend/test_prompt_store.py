@@ -0,0 +1,192 @@
+"""
+Tests for the persistent prompt store.
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="prompt store requires POSIX file locks"
+)
+
+from cache import payload_key, store_key  # noqa: E402
+from prompt_store import PromptStore, main  # noqa: E402
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "prompts")
+
+
+def key(i, version="v1"):
+    return store_key(("gpt-4", i.to_bytes(16, "little")), version)
+
+
+def _fill(path, first, count):
+    """Worker: open the store independently and write a range of keys."""
+    store = PromptStore(path, min_slots=16)
+    try:
+        return sum(store.put(key(i), "gpt-4", "v1", f"prompt {i}") for i in range(first, count))
+    finally:
+        store.close()
+
+
+class TestPromptStore:
+    """Tests for PromptStore."""
+
+    def test_put_and_get(self, store_path):
+        store = PromptStore(store_path)
+
+        assert store.get(key(1)) is None
+        assert store.put(key(1), "gpt-4", "v1", "Goal: café menu")
+        assert not store.put(key(1), "gpt-4", "v1", "something else")
+
+        assert store.get(key(1)) == "Goal: café menu"
+        assert store.get(key(1, version="v2")) is None
+        record = store.record(key(1))
+        assert (record.model, record.version, record.prompt) == ("gpt-4", "v1", "Goal: café menu")
+        assert store.stats()["hits"] == 1
+        assert store.stats()["writes"] == 1
+
+    def test_persists_and_grows(self, store_path):
+        store = PromptStore(store_path, min_slots=16)
+        for i in range(500):
+            store.put(key(i), "gpt-4", "v1", f"prompt {i}")
+        store.close()
+
+        reopened = PromptStore(store_path, min_slots=16)
+        assert len(reopened) == 500
+        assert reopened.stats()["slots"] == 1024
+        assert all(reopened.get(key(i)) == f"prompt {i}" for i in range(500))
+
+    def test_index_is_rebuilt_from_segment(self, store_path):
+        store = PromptStore(store_path)
+        store.put(key(1), "gpt-4", "v1", "one")
+        store.close()
+        with open(store_path + ".idx", "r+b") as f:
+            f.write(b"garbage!")
+
+        assert PromptStore(store_path).get(key(1)) == "one"
+
+    def test_unindexed_and_torn_records_are_recovered(self, store_path):
+        store = PromptStore(store_path)
+        store.put(key(1), "gpt-4", "v1", "one")
+        store.close()
+        # An indexed copy of the store, then a record the index never saw
+        # and half of another, as if their writers had died
+        with open(store_path + ".idx", "rb") as f:
+            index = f.read()
+        store = PromptStore(store_path)
+        store.put(key(2), "gpt-4", "v1", "two")
+        store.close()
+        with open(store_path + ".idx", "wb") as f:
+            f.write(index)
+        with open(store_path, "ab") as f:
+            f.write(b"\x01" * 20)
+
+        store = PromptStore(store_path)
+
+        assert (store.get(key(1)), store.get(key(2))) == ("one", "two")
+        assert os.path.getsize(store_path) == store.stats()["segment_bytes"]
+
+    def test_compact(self, store_path):
+        store = PromptStore(store_path)
+        for i in range(10):
+            store.put(key(i), "gpt-4", "v1", f"prompt {i}")
+        other = PromptStore(store_path)
+
+        result = store.compact(lambda record: record.prompt[-1] in "02468")
+
+        assert (result["kept"], result["dropped"]) == (5, 5)
+        assert result["bytes_after"] < result["bytes_before"]
+        assert store.get(key(2)) == "prompt 2" and store.get(key(3)) is None
+        # Another instance switches to the compacted files on its next write
+        assert other.put(key(3), "gpt-4", "v1", "again")
+        assert len(other) == 6 and store.get(key(3)) == "again"
+
+    @pytest.mark.parametrize("lookup", ["get", "record"])
+    def test_read_from_the_segment_the_key_was_found_in(self, store_path, monkeypatch, lookup):
+        store = PromptStore(store_path)
+        for i in range(10):
+            store.put(key(i), "gpt-4", "v1", f"prompt {i}")
+        find = store._find
+
+        def find_then_compact(k):
+            found = find(k)
+            # Another thread compacts between the lookup and the read,
+            # moving every record after the first
+            store.compact(lambda record: record.prompt != "prompt 0")
+            return found
+
+        monkeypatch.setattr(store, "_find", find_then_compact)
+        result = getattr(store, lookup)(key(5))
+
+        assert (result if lookup == "get" else result.prompt) == "prompt 5"
+
+    def test_reader_remaps_while_files_are_reopened(self, store_path, monkeypatch):
+        store = PromptStore(store_path)
+        store.put(key(1), "gpt-4", "v1", "one")
+        close_files = store._close_files
+        errors = []
+        readers = []
+
+        def remap():
+            try:
+                # Past the end of any map: always remaps
+                store._segment_covering(2**40)
+            except Exception as e:
+                errors.append(e)
+
+        def close_files_during_remap():
+            close_files()
+            # A reader that has outgrown its map remaps now, between the old
+            # files being closed and the new ones being installed
+            readers.append(threading.Thread(target=remap))
+            readers[-1].start()
+            time.sleep(0.05)
+
+        monkeypatch.setattr(store, "_close_files", close_files_during_remap)
+        store.compact()
+        for reader in readers:
+            reader.join()
+
+        assert errors == []
+        assert store.get(key(1)) == "one"
+
+    def test_shared_across_processes(self, store_path):
+        # Four workers write overlapping ranges; each key is stored once
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(4) as pool:
+            written = pool.starmap(_fill, [(store_path, i * 50, i * 50 + 100) for i in range(4)])
+
+        store = PromptStore(store_path)
+        assert sum(written) == len(store) == 250
+        assert all(store.get(key(i)) == f"prompt {i}" for i in range(250))
+
+    def test_cli_get(self, store_path, tmp_path, capsys):
+        request = {
+            "modality": "text",
+            "model": "claude",
+            "payload": {"modality": "text", "goal": "Explain", "subject": "tides"},
+        }
+        request_path = tmp_path / "request.json"
+        request_path.write_text(json.dumps(request))
+        store = PromptStore(store_path)
+        store.put(
+            store_key(payload_key("claude", request["payload"]), "old"), "claude", "old", "then"
+        )
+        store.close()
+
+        assert main(["get", store_path, str(request_path)]) == 1
+        assert main(["get", store_path, str(request_path), "--version", "old"]) == 0
+        assert json.loads(capsys.readouterr().out)["prompt"] == "then"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,279 @@
+"""
+Unit tests for the rate limiter.
+"""
+
+import sys
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+import rate_limiter
+from rate_limiter import RateLimiter, rate_limit
+
+
+class TestRateLimiter:
+    """Tests for the in-memory rate limiter."""
+
+    def test_allows_up_to_limit(self):
+        limiter = RateLimiter(max_requests=3, window_seconds=60)
+
+        assert all(limiter.is_allowed("client") for _ in range(3))
+        assert not limiter.is_allowed("client")
+        assert limiter.get_remaining("client") == 0
+
+    def test_keys_are_independent(self):
+        limiter = RateLimiter(max_requests=1, window_seconds=60)
+
+        assert limiter.is_allowed("a")
+        assert limiter.is_allowed("b")
+        assert not limiter.is_allowed("a")
+
+    def test_weighted_cost(self):
+        limiter = RateLimiter(max_requests=10, window_seconds=60)
+
+        assert limiter.is_allowed("client", cost=7)
+        assert limiter.get_remaining("client") == 3
+        assert not limiter.is_allowed("client", cost=4)
+        assert limiter.is_allowed("client", cost=3)
+        assert limiter.get_remaining("client") == 0
+
+    def test_budget_refills_evenly(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("rate_limiter.time.time", lambda: now[0])
+        limiter = RateLimiter(max_requests=6, window_seconds=60)
+
+        assert limiter.is_allowed("client", cost=6)
+        assert not limiter.is_allowed("client")
+        assert limiter.get_reset_time("client") == 10
+
+        now[0] += 10
+        assert limiter.get_remaining("client") == 1
+        assert limiter.is_allowed("client")
+        assert not limiter.is_allowed("client")
+
+        now[0] += 60
+        assert limiter.get_remaining("client") == 6
+
+    def test_state_is_constant_per_key(self, monkeypatch):
+        monkeypatch.setattr("rate_limiter.time.time", lambda: 1000.0)
+        limiter = RateLimiter(max_requests=6000, window_seconds=60)
+        for _ in range(5000):
+            limiter.is_allowed("client")
+
+        assert limiter.tats == {"client": limiter.tats["client"]}
+        assert limiter.get_remaining("client") == 1000
+
+    def test_reads_do_not_track_unseen_keys(self):
+        limiter = RateLimiter(max_requests=5, window_seconds=60)
+
+        assert limiter.get_remaining("unseen") == 5
+        assert limiter.get_reset_time("unseen") == 0
+        assert "unseen" not in limiter.tats
+
+    def test_idle_keys_are_swept(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("rate_limiter.time.time", lambda: now[0])
+        limiter = RateLimiter(max_requests=10, window_seconds=60)
+        for i in range(100):
+            limiter.is_allowed(f"10.0.0.{i}")
+
+        # One request per key refills within 6 seconds; new arrivals sweep
+        now[0] += 10
+        for i in range(100):
+            limiter.is_allowed(f"10.0.1.{i}")
+
+        assert len(limiter.tats) == 100
+        assert all(key.startswith("10.0.1.") for key in limiter.tats)
+        assert limiter.evicted_keys == 0
+
+    def test_max_keys_evicts_least_recently_seen(self):
+        limiter = RateLimiter(max_requests=1, window_seconds=60, max_keys=3)
+        for key in ("a", "b", "c"):
+            limiter.is_allowed(key)
+        limiter.is_allowed("a")
+        limiter.is_allowed("d")
+
+        assert list(limiter.tats) == ["c", "a", "d"]
+        assert limiter.evicted_keys == 1
+
+    def test_hostile_cardinality_stays_bounded(self):
+        limiter = RateLimiter(max_requests=60, window_seconds=60, max_keys=1000)
+        for i in range(20000):
+            limiter.is_allowed(f"spoofed-{i}")
+
+        stats = limiter.stats()
+        assert stats["tracked_keys"] == 1000
+        assert stats["evicted_keys"] == 19000
+        assert stats["memory_bytes"] > 0
+
+    def test_concurrent_checks(self):
+        # One key shared by all threads, and enough other keys to keep the
+        # sweep and max_keys eviction busy while stats() iterates
+        limiter = RateLimiter(max_requests=1000, window_seconds=3600)
+        churned = RateLimiter(max_requests=10, window_seconds=3600, max_keys=50)
+        allowed = []
+        errors = []
+
+        def hammer(worker):
+            try:
+                count = 0
+                for i in range(400):
+                    count += limiter.is_allowed("shared")
+                    churned.check(f"10.{worker}.0.{i}")
+                    churned.stats()
+                allowed.append(count)
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getswitchinterval()
+        # Switch threads as often as possible to interleave the checks
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=hammer, args=(w,)) for w in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert sum(allowed) == 1000
+        assert len(churned.tats) <= 50
+
+    def test_check_returns_full_decision(self, monkeypatch):
+        monkeypatch.setattr("rate_limiter.time.time", lambda: 1000.0)
+        limiter = RateLimiter(max_requests=4, window_seconds=60)
+
+        decision = limiter.check("client", cost=3)
+        assert decision.allowed
+        assert decision.remaining == 1
+        assert decision.limit == 4
+        assert decision.reset == 0
+
+        # Rejected: the reset is when both slots fit, not when one does
+        decision = limiter.check("client", cost=2)
+        assert not decision.allowed
+        assert decision.remaining == 1
+        assert decision.reset == 15
+
+        limiter.check("client")
+        decision = limiter.check("client")
+        assert not decision.allowed
+        assert decision.remaining == 0
+        assert decision.reset == 15
+
+    def test_check_matches_separate_calls(self):
+        limiter = RateLimiter(max_requests=10, window_seconds=60)
+        reference = RateLimiter(max_requests=10, window_seconds=60)
+
+        for _ in range(12):
+            decision = limiter.check("client")
+            allowed = reference.is_allowed("client")
+            assert decision.allowed == allowed
+            assert decision.remaining == reference.get_remaining("client")
+
+
+@pytest.fixture
+def limited_app(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_rate_limiters", {})
+    monkeypatch.setattr(rate_limiter, "API_KEY_TIERS", {"secret": "pro"})
+    app = Flask(__name__)
+
+    @app.route("/ping")
+    @rate_limit(max_requests=2, window_seconds=60, tiers={"pro": 5})
+    def ping():
+        return jsonify({"ok": True})
+
+    @app.route("/pong")
+    @rate_limit(max_requests=1, window_seconds=60)
+    def pong():
+        return jsonify({"ok": True})
+
+    @app.route("/bulk/<int:size>")
+    @rate_limit(max_requests=10, window_seconds=60, cost=lambda: int(request.view_args["size"]))
+    def bulk(size):
+        return jsonify({"ok": True})
+
+    return app
+
+
+class TestRateLimitDecorator:
+    """Tests for the rate_limit decorator."""
+
+    def test_headers_and_rejection(self, limited_app):
+        client = limited_app.test_client()
+
+        first = client.get("/ping")
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "2"
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+
+        client.get("/ping")
+        rejected = client.get("/ping")
+        assert rejected.status_code == 429
+        assert rejected.headers["X-RateLimit-Remaining"] == "0"
+        assert int(rejected.headers["Retry-After"]) > 0
+
+    def test_cost_over_limit_is_rejected_outright(self, limited_app):
+        client = limited_app.test_client()
+
+        response = client.get("/bulk/11")
+
+        assert response.status_code == 413
+        assert "over the limit of 10" in response.get_json()["message"]
+        assert "Retry-After" not in response.headers
+        assert client.get("/bulk/10").status_code == 200
+
+    def test_retry_after_covers_the_request_cost(self, limited_app):
+        client = limited_app.test_client()
+        assert client.get("/bulk/6").status_code == 200
+
+        rejected = client.get("/bulk/8")
+
+        # 4 slots are left; 4 more refill at one per 6 seconds
+        assert rejected.status_code == 429
+        assert 23 <= int(rejected.headers["Retry-After"]) <= 24
+        assert "try again in 0 seconds" not in rejected.get_json()["message"]
+
+    def test_single_check_per_request(self, limited_app, monkeypatch):
+        calls = []
+        limiter = rate_limiter.get_rate_limiter(2, 60, scope="ping")
+        for name in ("get_remaining", "get_reset_time"):
+            monkeypatch.setattr(limiter, name, lambda *a, n=name: calls.append(n))
+
+        client = limited_app.test_client()
+        for _ in range(3):
+            client.get("/ping")
+
+        assert calls == []
+
+    def test_routes_have_independent_budgets(self, limited_app):
+        client = limited_app.test_client()
+
+        assert client.get("/pong").status_code == 200
+        assert client.get("/pong").status_code == 429
+        assert client.get("/ping").status_code == 200
+        assert client.get("/ping").headers["X-RateLimit-Limit"] == "2"
+
+    def test_api_key_tier_gets_own_budget(self, limited_app):
+        client = limited_app.test_client()
+        for _ in range(2):
+            client.get("/ping")
+        assert client.get("/ping").status_code == 429
+
+        response = client.get("/ping", headers={"X-API-Key": "secret"})
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Limit"] == "5"
+        assert set(rate_limiter.rate_limiter_stats()) == {"ping:default", "ping:pro"}
+
+    def test_unknown_api_key_uses_default_tier(self, limited_app):
+        client = limited_app.test_client()
+        response = client.get("/ping", headers={"X-API-Key": "guess"})
+
+        assert response.headers["X-RateLimit-Limit"] == "2"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
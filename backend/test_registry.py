@@ -0,0 +1,140 @@
+"""
+Tests for the adapter registry and the catalog derived from it.
+Run with: pytest test_registry.py -v
+"""
+
+import pytest
+
+from registry import (
+    ADAPTER_PATHS,
+    ADAPTER_REGISTRY,
+    MODALITIES,
+    MODALITY_MODELS,
+    MODEL_INDEX,
+    AdapterRegistry,
+    build_catalog,
+    get_available_models_by_modality,
+    load_adapter_class,
+)
+from schema import PROMPT_TYPES
+from service import compile_request
+
+
+class TestModelIndex:
+    """Tests for MODEL_INDEX."""
+
+    def test_covers_registry(self):
+        assert list(MODEL_INDEX) == list(ADAPTER_REGISTRY)
+        for model, entry in MODEL_INDEX.items():
+            assert entry.modality == type(ADAPTER_REGISTRY[model]).modality
+
+    def test_every_modality_has_a_schema(self):
+        assert MODALITIES <= set(PROMPT_TYPES)
+
+    def test_adapter_without_modality_rejected(self):
+        class Bare:
+            def compile(self, p):
+                return ""
+
+        with pytest.raises(TypeError, match="bare-model"):
+            AdapterRegistry().register("bare-model", Bare())
+
+
+class TestLazyLoading:
+    """Adapters registered by path load on first lookup."""
+
+    def test_loaded_on_first_lookup(self):
+        registry = AdapterRegistry({"claude": ADAPTER_PATHS["claude"]})
+        assert not registry.is_loaded("claude")
+        assert "claude" in registry
+
+        adapter = registry["claude"]
+
+        assert registry.is_loaded("claude")
+        assert registry.get("claude") is adapter
+        assert type(adapter) is type(ADAPTER_REGISTRY["claude"])
+
+    def test_unknown_model(self):
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        assert registry.get("unknown") is None
+        with pytest.raises(KeyError):
+            registry["unknown"]
+
+    def test_preload(self):
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        registry.preload()
+        assert all(registry.is_loaded(model) for model in ADAPTER_PATHS)
+
+    @pytest.mark.parametrize("model", list(ADAPTER_PATHS))
+    def test_builtin_paths_declare_their_modality(self, model):
+        modality, path = ADAPTER_PATHS[model]
+        assert load_adapter_class(path).modality == modality
+
+    def test_modality_mismatch_rejected(self):
+        registry = AdapterRegistry({"claude": ("image", "adapters.text:ClaudeAdapter")})
+        with pytest.raises(RuntimeError, match="registered as 'image'"):
+            registry["claude"]
+
+    def test_modality_mismatch_is_not_a_bad_request(self, monkeypatch):
+        # compile_request turns TypeError into a 400; a misregistered
+        # adapter must instead reach the route's 500 handler
+        registry = AdapterRegistry({"claude": ("text", "adapters.image:DalleAdapter")})
+        monkeypatch.setattr("compiler.ADAPTER_REGISTRY", registry)
+        with pytest.raises(RuntimeError):
+            compile_request(
+                {
+                    "modality": "text",
+                    "model": "claude",
+                    "payload": {"modality": "text", "goal": "g", "subject": "misregistered"},
+                }
+            )
+
+    def test_registry_is_frozen_after_startup(self):
+        with pytest.raises(TypeError, match="frozen"):
+            ADAPTER_REGISTRY.register("late", "adapters.text:ClaudeAdapter", "text")
+        with pytest.raises(TypeError, match="frozen"):
+            ADAPTER_REGISTRY["claude"] = ADAPTER_REGISTRY["claude"]
+        with pytest.raises(TypeError, match="frozen"):
+            del ADAPTER_REGISTRY["claude"]
+
+        assert list(ADAPTER_REGISTRY) == list(MODEL_INDEX)
+
+    def test_instances_replace_paths(self):
+        class Extra:
+            modality = "text"
+
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        registry["claude"] = extra = Extra()
+        registry["new-model"] = Extra()
+
+        assert registry["claude"] is extra
+        assert registry.index()["new-model"].modality == "text"
+
+
+class TestCatalog:
+    """Tests for the model catalog."""
+
+    def test_grouped_in_registry_order(self):
+        assert get_available_models_by_modality() == {
+            "text": ["gpt-4", "llama-3", "mistral", "gemini", "claude"],
+            "image": ["dalle", "stable-diffusion", "midjourney", "imagen", "firefly"],
+            "video": ["sora", "runway", "pika", "veo", "stable-video-diffusion"],
+            "audio": ["openai-audio", "elevenlabs", "seamless-m4t", "indic-tts", "coqui-tts"],
+        }
+
+    def test_catalog_copies_are_independent(self):
+        get_available_models_by_modality()["text"].append("bogus")
+        assert "bogus" not in get_available_models_by_modality()["text"]
+        assert "bogus" not in MODALITY_MODELS["text"]
+
+    def test_new_adapter_appears_under_its_modality(self):
+        class Extra:
+            modality = "image"
+
+        registry = AdapterRegistry(ADAPTER_PATHS)
+        registry["extra"] = Extra()
+        assert build_catalog(registry.index())["image"][-1] == "extra"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,98 @@
+"""
+Tests for the prompt dataclasses.
+Run with: pytest test_schema.py -v
+"""
+
+import dataclasses
+import sys
+import tracemalloc
+
+import pytest
+
+from schema import PROMPT_TYPES, ImagePrompt, TextPrompt, VideoPrompt
+
+PAYLOAD = {
+    "modality": "image",
+    "goal": "product shot",
+    "subject": "a ceramic mug",
+    "style": "photorealistic",
+    "lighting": "soft window light",
+    "negative_constraints": ["text"],
+}
+
+slotted = pytest.mark.skipif(
+    sys.version_info < (3, 10), reason="dataclass slots need Python 3.10+"
+)
+
+
+def unslotted_copy(cls):
+    """An equivalent dataclass that keeps a per-instance __dict__."""
+    return dataclasses.make_dataclass(
+        f"Dict{cls.__name__}",
+        [(f.name, f.type, dataclasses.field(default=f.default)) for f in dataclasses.fields(cls)],
+    )
+
+
+def bytes_per_instance(factory, count=2000):
+    """Bytes still allocated per object after building `count` of them."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        objects = [factory() for _ in range(count)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    assert len(objects) == count
+    return total / count
+
+
+class TestFromPayload:
+    """Tests for building prompts from sanitized payloads."""
+
+    def test_matches_keyword_construction(self):
+        assert ImagePrompt.from_payload(PAYLOAD) == ImagePrompt(**PAYLOAD)
+
+    def test_defaults_apply(self):
+        prompt = VideoPrompt.from_payload(
+            {"modality": "video", "goal": "g", "subject": "s"}
+        )
+        assert prompt.duration_seconds == 5
+        assert prompt.scene == ""
+
+    def test_unknown_field(self):
+        with pytest.raises(TypeError, match="unknown field.*bogus"):
+            TextPrompt.from_payload({"modality": "text", "goal": "g", "subject": "s", "bogus": 1})
+
+    def test_missing_required_field(self):
+        with pytest.raises(TypeError, match="missing required field.*subject"):
+            TextPrompt.from_payload({"modality": "text", "goal": "g"})
+
+    def test_field_names_recorded(self):
+        for cls in PROMPT_TYPES.values():
+            assert cls.FIELD_NAMES == {f.name for f in dataclasses.fields(cls)}
+            assert cls.REQUIRED_FIELDS == {"modality", "goal", "subject"}
+
+
+@slotted
+class TestSlots:
+    """Prompt objects carry no per-instance __dict__."""
+
+    @pytest.mark.parametrize("cls", list(PROMPT_TYPES.values()))
+    def test_no_instance_dict(self, cls):
+        prompt = cls(modality="x", goal="g", subject="s")
+        assert not hasattr(prompt, "__dict__")
+        with pytest.raises(AttributeError):
+            prompt.not_a_field = 1
+
+    def test_fewer_bytes_per_request(self):
+        legacy = unslotted_copy(ImagePrompt)
+
+        slotted_bytes = bytes_per_instance(lambda: ImagePrompt.from_payload(PAYLOAD))
+        dict_bytes = bytes_per_instance(lambda: legacy(**PAYLOAD))
+
+        assert slotted_bytes < dict_bytes
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,132 @@
+"""
+Tests for compile sessions: incremental re-rendering and text edits.
+Run with: pytest test_sessions.py -v
+"""
+
+import dataclasses
+import random
+
+import pytest
+
+from registry import ADAPTER_REGISTRY, MODALITY_MODELS, MODEL_INDEX
+from schema import PROMPT_TYPES
+from sessions import CompileSession, text_edit
+from test_variants import random_value
+
+
+def apply_edit(old, edit):
+    return old[: edit["start"]] + edit["text"] + old[edit["end"] :]
+
+
+class TestTextEdit:
+    """Tests for text_edit."""
+
+    def test_equal_texts(self):
+        assert text_edit("same", "same") is None
+
+    @pytest.mark.parametrize(
+        "old, new, edit",
+        [
+            ("a mug", "a mug, soft", {"start": 5, "end": 5, "text": ", soft"}),
+            ("a red mug", "a mug", {"start": 2, "end": 6, "text": ""}),
+            ("aaaa", "aa", {"start": 2, "end": 4, "text": ""}),
+            ("", "new", {"start": 0, "end": 0, "text": "new"}),
+        ],
+    )
+    def test_minimal_edit(self, old, new, edit):
+        assert text_edit(old, new) == edit
+
+    def test_edit_applies(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            old = "".join(rng.choice("ab, ") for _ in range(rng.randint(0, 300)))
+            cut = rng.randint(0, len(old))
+            new = old[:cut] + rng.choice(["", "x", "b, a"]) + old[rng.randint(cut, len(old)) :]
+            edit = text_edit(old, new)
+            assert new == old if edit is None else apply_edit(old, edit) == new
+
+
+class TestSegments:
+    """RenderPlan.segments/join are render() split by segment."""
+
+    @pytest.mark.parametrize("model", list(MODEL_INDEX))
+    def test_join_matches_render(self, model):
+        rng = random.Random(model)
+        plan = ADAPTER_REGISTRY[model].plan
+        modality = MODEL_INDEX[model].modality
+        fields = [f for f in dataclasses.fields(PROMPT_TYPES[modality]) if f.name != "modality"]
+
+        previous = None
+        prompt = PROMPT_TYPES[modality](
+            modality=modality, **{f.name: random_value(rng, f) for f in fields}
+        )
+        for _ in range(100):
+            changed = {f.name for f in rng.sample(fields, rng.randint(1, 2))}
+            prompt = dataclasses.replace(
+                prompt, **{f.name: random_value(rng, f) for f in fields if f.name in changed}
+            )
+            segments = plan.segments(prompt, previous, changed)
+            assert plan.join(segments) == plan.render(prompt)
+            assert segments == plan.segments(prompt)
+            previous = segments
+
+    def test_unaffected_segments_reused(self):
+        plan = ADAPTER_REGISTRY["dalle"].plan
+        prompt = PROMPT_TYPES["image"](modality="image", goal="g", subject="a mug", mood="calm")
+        first = plan.segments(prompt)
+
+        second = plan.segments(dataclasses.replace(prompt, mood="tense"), first, {"mood"})
+
+        reads_mood = ["mood" in item.fields() for item in plan.spec.items]
+        assert reads_mood == [False, False, True, False]
+        assert [a is b for a, b in zip(first, second)] == [True, True, False, True]
+
+
+class TestCompileSession:
+    """Tests for CompileSession."""
+
+    PAYLOAD = {"modality": "image", "goal": "g", "subject": "a mug"}
+
+    def test_updates_match_full_compile(self):
+        rng = random.Random(1)
+        models = MODALITY_MODELS["image"]
+        fields = [f for f in dataclasses.fields(PROMPT_TYPES["image"]) if f.name != "modality"]
+        session = CompileSession("image", models, self.PAYLOAD)
+
+        for version in range(1, 201):
+            old = dict(session.prompts)
+            changes = {
+                f.name: random_value(rng, f)
+                for f in rng.sample(fields, rng.randint(1, 3))
+                if f.name != "subject"
+            }
+            body = session.update(changes)
+
+            prompt = PROMPT_TYPES["image"].from_payload(session.payload)
+            for model in models:
+                assert session.prompts[model] == ADAPTER_REGISTRY[model].compile(prompt)
+                if model in body["edits"]:
+                    assert apply_edit(old[model], body["edits"][model]) == body["prompts"][model]
+                else:
+                    assert session.prompts[model] == old[model]
+            if body["changed"]:
+                assert body["version"] == session.version
+
+    def test_unchanged_values_are_not_a_change(self):
+        session = CompileSession("image", ["dalle"], {**self.PAYLOAD, "mood": "calm"})
+
+        body = session.update({"mood": "calm", "lighting": None})
+
+        assert body == {"version": 0, "changed": [], "prompts": {}, "edits": {}}
+
+    def test_invalid_update_leaves_session(self):
+        session = CompileSession("image", ["dalle"], self.PAYLOAD)
+
+        with pytest.raises(TypeError):
+            session.update({"subject": None})
+        assert session.payload == self.PAYLOAD
+        assert session.version == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+"""
+Tests for the shared-memory rate limiter.
+"""
+
+import multiprocessing
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="shared limiter requires POSIX file locks"
+)
+
+from shared_rate_limiter import SharedRateLimiter  # noqa: E402
+
+
+@pytest.fixture
+def shm_path(tmp_path):
+    return str(tmp_path / "ratelimit")
+
+
+def _hammer(path, key, attempts):
+    """Worker: open the shared file independently and count allowed calls."""
+    limiter = SharedRateLimiter(max_requests=100, window_seconds=60, path=path)
+    try:
+        return sum(limiter.is_allowed(key) for _ in range(attempts))
+    finally:
+        limiter.close()
+
+
+class TestSharedRateLimiter:
+    """Tests for SharedRateLimiter."""
+
+    def test_allows_up_to_limit(self, shm_path):
+        limiter = SharedRateLimiter(max_requests=3, window_seconds=60, path=shm_path)
+
+        assert all(limiter.is_allowed("client") for _ in range(3))
+        assert not limiter.is_allowed("client")
+        assert limiter.get_remaining("client") == 0
+        assert limiter.get_remaining("other") == 3
+
+    def test_weighted_cost(self, shm_path):
+        limiter = SharedRateLimiter(max_requests=10, window_seconds=60, path=shm_path)
+
+        assert limiter.is_allowed("client", cost=8)
+        assert not limiter.is_allowed("client", cost=3)
+        assert limiter.get_remaining("client") == 2
+
+    def test_check_returns_full_decision(self, shm_path):
+        limiter = SharedRateLimiter(max_requests=3, window_seconds=60, path=shm_path)
+
+        decision = limiter.check("client", cost=3)
+        assert decision.allowed
+        assert decision.remaining == 0
+        assert decision.limit == 3
+
+        decision = limiter.check("client")
+        assert not decision.allowed
+        assert decision.reset > 0
+
+    def test_instances_share_counters(self, shm_path):
+        first = SharedRateLimiter(max_requests=2, window_seconds=60, path=shm_path)
+        second = SharedRateLimiter(max_requests=2, window_seconds=60, path=shm_path)
+
+        assert first.is_allowed("client")
+        assert second.is_allowed("client")
+        assert not first.is_allowed("client")
+
+    def test_full_stripe_keeps_throttled_clients(self, shm_path, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("shared_rate_limiter.time.time", lambda: now[0])
+        limiter = SharedRateLimiter(
+            max_requests=1, window_seconds=60, path=shm_path, stripes=1, slots_per_stripe=4
+        )
+        assert all(limiter.is_allowed(f"client-{i}") for i in range(4))
+
+        # New keys cannot push out the throttled ones while they are active
+        now[0] += 30
+        decision = limiter.check("sprayed-0")
+        assert (decision.allowed, decision.remaining, decision.reset) == (False, 0, 30)
+        assert not any(limiter.is_allowed(f"sprayed-{i}") for i in range(20))
+        assert not any(limiter.is_allowed(f"client-{i}") for i in range(4))
+
+        # Once idle, their slots are reused
+        now[0] += 30
+        assert all(limiter.is_allowed(f"sprayed-{i}") for i in range(4))
+        assert not limiter.is_allowed("sprayed-4")
+
+    def test_stats(self, shm_path):
+        limiter = SharedRateLimiter(
+            max_requests=5, window_seconds=60, path=shm_path, stripes=2, slots_per_stripe=8
+        )
+        limiter.is_allowed("a")
+        limiter.is_allowed("b")
+
+        stats = limiter.stats()
+        assert stats["tracked_keys"] == 2
+        assert stats["max_keys"] == 16
+
+    def test_limit_holds_across_processes(self, shm_path):
+        # Four workers each try 60 requests against one shared limit of 100.
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(4) as pool:
+            allowed = pool.starmap(_hammer, [(shm_path, "shared-client", 60)] * 4)
+
+        assert sum(allowed) == 100
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
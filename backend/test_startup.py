@@ -0,0 +1,97 @@
+"""
+Cold start tests: what importing the app loads, and time to first response.
+Each test starts a fresh interpreter. Run with: pytest test_startup.py -v -s
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imports the app, serves one /generate request and reports timings and
+# which adapter modules were loaded along the way
+FIRST_RESPONSE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+loaded_at_import = sorted(m for m in sys.modules if m.startswith("adapters"))
+response = app.app.test_client().post("/generate", json={
+    "modality": "image", "model": "midjourney",
+    "payload": {"modality": "image", "goal": "g", "subject": "a mug"},
+})
+done = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_ms": (imported - start) * 1e3,
+    "first_response_ms": (done - start) * 1e3,
+    "loaded_at_import": loaded_at_import,
+    "loaded": sorted(m for m in sys.modules if m.startswith("adapters")),
+}))
+"""
+
+
+def run(args, **env):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_times(stderr):
+    """Parse `python -X importtime` output into {module: cumulative microseconds}."""
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def first_response(**env):
+    result = json.loads(run(["-c", FIRST_RESPONSE], **env).stdout.splitlines()[-1])
+    print(
+        f"\nimport {result['import_ms']:.1f} ms, "
+        f"first response {result['first_response_ms']:.1f} ms "
+        f"({'preload' if env else 'lazy'})"
+    )
+    return result
+
+
+class TestColdStart:
+    """Adapters stay unloaded until a request needs them."""
+
+    def test_import_loads_no_adapters(self):
+        times = import_times(run(["-X", "importtime", "-c", "import app"]).stderr)
+
+        app_ms, registry_ms = times["app"] / 1e3, times["registry"] / 1e3
+        print(f"\nimport app {app_ms:.1f} ms, registry {registry_ms:.1f} ms")
+        assert not [name for name in times if name.startswith("adapters")]
+
+    def test_first_response_loads_one_modality(self):
+        result = first_response()
+
+        assert result["status"] == 200
+        assert result["loaded_at_import"] == []
+        assert result["loaded"] == ["adapters", "adapters.image", "adapters.render"]
+
+    def test_preload_loads_everything_at_import(self):
+        result = first_response(PRELOAD_ADAPTERS="true")
+
+        assert result["status"] == 200
+        assert {"adapters.audio", "adapters.image", "adapters.text", "adapters.video"} <= set(
+            result["loaded_at_import"]
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,116 @@
+"""
+Tests for token estimation and per-model prompt budgets.
+Run with: pytest test_tokens.py -v
+"""
+
+import importlib.util
+
+import pytest
+
+import tokens
+from registry import ADAPTER_REGISTRY
+from schema import ImagePrompt, TextPrompt
+from tokens import PIECE, approx_tokens, count_tokens, fit_prompt, token_budget
+
+CONTEXT = ("The company grew revenue by 12 percent while costs fell sharply. " * 40)[:2000]
+
+
+def text_prompt(**fields):
+    return TextPrompt(modality="text", goal="Summarize", subject="the quarterly report", **fields)
+
+
+class TestEstimation:
+    """Tests for the offline estimator."""
+
+    def test_pieces(self):
+        assert PIECE.findall("don't") == ["don", "'t"]
+        assert PIECE.findall("12345,") == ["123", "45", ","]
+        assert PIECE.findall("--ar") == ["--", "ar"]
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("", 0),
+            ("a cat", 2),
+            ("photorealistic", 3),
+            ("--ar 16:9", 5),
+            ("猫の写真", 4),
+            ("Goal\n\nSubject\nStyle", 5),
+        ],
+    )
+    def test_counts(self, text, expected):
+        assert approx_tokens(text) == expected
+
+    def test_english_sentence(self):
+        # One token per word and for the final period, as in cl100k_base
+        assert approx_tokens(CONTEXT[:64]) == 12
+
+    def test_counts_are_cached(self):
+        count_tokens.cache_clear()
+        count_tokens(CONTEXT)
+        count_tokens(CONTEXT)
+
+        assert count_tokens.cache_info().hits == 1
+
+    @pytest.mark.skipif(importlib.util.find_spec("tiktoken") is not None, reason="installed")
+    def test_missing_tiktoken_falls_back(self, monkeypatch):
+        monkeypatch.setattr(tokens, "TOKENIZER", "tiktoken:cl100k_base")
+
+        assert tokens._count(CONTEXT) == approx_tokens(CONTEXT)
+
+
+class TestBudgets:
+    """Tests for token_budget and fit_prompt."""
+
+    def test_budget_sources(self, monkeypatch):
+        assert token_budget("stable-diffusion", ADAPTER_REGISTRY["stable-diffusion"]) == 77
+        assert token_budget("sora", ADAPTER_REGISTRY["sora"]) is None
+
+        monkeypatch.setitem(tokens.MODEL_TOKEN_BUDGETS, "sora", 300)
+        assert token_budget("sora", ADAPTER_REGISTRY["sora"]) == 300
+
+    def test_fitting_prompt_is_untouched(self):
+        adapter = ADAPTER_REGISTRY["gpt-4"]
+        prompt = text_prompt(context=CONTEXT)
+
+        fit = fit_prompt(adapter, prompt, 10000)
+
+        assert fit == (adapter.compile(prompt), count_tokens(adapter.compile(prompt)), ())
+
+    @pytest.mark.parametrize("model", ["gpt-4", "llama-3", "mistral", "gemini", "claude"])
+    @pytest.mark.parametrize("budget", [40, 120, 300])
+    def test_shortens_longest_field_first(self, model, budget):
+        adapter = ADAPTER_REGISTRY[model]
+        prompt = text_prompt(context=CONTEXT, tone="formal", constraints=["bullets", "numbers"])
+
+        fit = fit_prompt(adapter, prompt, budget)
+
+        assert fit.tokens == count_tokens(fit.prompt) <= budget
+        assert fit.truncated[0] == "context"
+        assert "Summarize" in fit.prompt and "the quarterly report" in fit.prompt
+        if fit.truncated == ("context",):
+            # Only the tail of the context was cut, at a piece boundary
+            assert "formal" in fit.prompt
+            kept = fit.prompt.count("The company grew revenue")
+            assert 0 < kept < 40 or budget == 40
+
+    def test_list_items_dropped_from_the_end(self):
+        adapter = ADAPTER_REGISTRY["claude"]
+        prompt = text_prompt(constraints=[f"requirement number {i}" for i in range(30)])
+        full = count_tokens(adapter.compile(prompt))
+
+        fit = fit_prompt(adapter, prompt, full - 10)
+
+        assert fit.truncated == ("constraints",)
+        assert "requirement number 0" in fit.prompt
+        assert "requirement number 29" not in fit.prompt
+
+    def test_unreachable_budget(self):
+        adapter = ADAPTER_REGISTRY["stable-diffusion"]
+        prompt = ImagePrompt(modality="image", goal="g", subject="mug " * 100, mood="calm")
+
+        fit = fit_prompt(adapter, prompt, 77)
+
+        assert fit.tokens > 77
+        assert fit.truncated == ("mood",)
+        assert "calm" not in fit.prompt
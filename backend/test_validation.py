@@ -0,0 +1,232 @@
+"""
+Tests for the schema-generated payload validators.
+Run with: pytest test_validation.py -v
+"""
+
+import json
+import random
+import sys
+
+import pytest
+
+import validation
+from rate_limiter import sanitize_input, sanitize_payload
+from schema import MAX_TEXT_LENGTH, PROMPT_TYPES
+from service import compile_request
+from validation import (
+    PAYLOAD_VALIDATORS,
+    clean_payload,
+    clean_text,
+    is_clean_text,
+    validate_payload,
+)
+
+WHITESPACE = [chr(c) for c in range(sys.maxunicode + 1) if chr(c).isspace()]
+ALPHABET = WHITESPACE + ["\x00", "\u200b", "a", "b", "Z", "7", ".", "é", "字", "\U0001f600"]
+
+
+def image_payload(**fields):
+    return {"modality": "image", "goal": "test", "subject": "a cat", **fields}
+
+
+def video_payload(**fields):
+    return {"modality": "video", "goal": "test", "subject": "test", "scene": "city", **fields}
+
+
+class TestValidatePayload:
+    """Tests for validate_payload."""
+
+    def test_valid_payload(self):
+        payload = image_payload(style="photo", negative_constraints=["x"])
+        assert validate_payload("image", payload) == []
+
+    def test_none_values_are_ignored(self):
+        assert validate_payload("image", image_payload(style=None)) == []
+
+    def test_unknown_field(self):
+        errors = validate_payload(
+            "text", {"modality": "text", "goal": "g", "subject": "s", "bogus": 1}
+        )
+        assert errors == [
+            {"field": "bogus", "code": "unknown", "message": "Unknown field 'bogus'"}
+        ]
+
+    def test_field_of_another_modality(self):
+        errors = validate_payload(
+            "text", {"modality": "text", "goal": "g", "subject": "s", "lighting": "x"}
+        )
+        assert [e["field"] for e in errors] == ["lighting"]
+
+    def test_missing_required_fields(self):
+        errors = validate_payload("image", {"modality": "image", "subject": None})
+        assert [(e["field"], e["code"]) for e in errors] == [
+            ("goal", "required"),
+            ("subject", "required"),
+        ]
+
+    def test_text_too_long(self):
+        errors = validate_payload("image", image_payload(subject="a" * 2001))
+        assert errors[0]["code"] == "max_length"
+        assert "length" in errors[0]["message"]
+
+    @pytest.mark.parametrize(
+        "field, value",
+        [("style", 5), ("style", {"a": 1}), ("constraints", "text"), ("negative_constraints", [1])],
+    )
+    def test_wrong_type(self, field, value):
+        errors = validate_payload("image", image_payload(**{field: value}))
+        assert [(e["field"], e["code"]) for e in errors] == [(field, "type")]
+
+    @pytest.mark.parametrize("duration", [5, "10", 60, 1])
+    def test_duration_in_range(self, duration):
+        assert validate_payload("video", video_payload(duration_seconds=duration)) == []
+
+    @pytest.mark.parametrize(
+        "duration, code",
+        [
+            (0, "range"),
+            (61, "range"),
+            ("soon", "type"),
+            (True, "type"),
+            ([5], "type"),
+            (float("inf"), "type"),
+            (float("-inf"), "type"),
+            (float("nan"), "type"),
+        ],
+    )
+    def test_duration_rejected(self, duration, code):
+        errors = validate_payload("video", video_payload(duration_seconds=duration))
+        assert [(e["field"], e["code"]) for e in errors] == [("duration_seconds", code)]
+
+    @pytest.mark.parametrize("duration", ["3", " 3 ", 3.0])
+    def test_numeric_strings_become_integers(self, duration):
+        sanitized, errors = clean_payload("video", video_payload(duration_seconds=duration))
+
+        assert errors == []
+        assert sanitized["duration_seconds"] == 3
+        assert type(sanitized["duration_seconds"]) is int
+
+    def test_numeric_string_duration_compiles(self):
+        body, status = compile_request(
+            {
+                "modality": "video",
+                "model": "stable-video-diffusion",
+                "payload": video_payload(duration_seconds="3"),
+            }
+        )
+
+        assert status == 200
+        assert "Frames: 72" in body["prompt"]
+
+    def test_stops_after_max_errors(self, monkeypatch):
+        monkeypatch.setattr(validation, "MAX_FIELD_ERRORS", 3)
+        payload = image_payload(**{f"junk{i}": i for i in range(100)})
+
+        assert len(validate_payload("image", payload)) == 3
+
+
+class TestCompileRequestErrors:
+    """Validation errors surface as structured 400 responses."""
+
+    def test_field_errors_in_response(self):
+        body, status = compile_request(
+            {
+                "modality": "image",
+                "model": "dalle",
+                "payload": image_payload(bogus="x", style=3),
+            }
+        )
+
+        assert status == 400
+        assert body["error"] == "Unknown field 'bogus'"
+        assert [e["field"] for e in body["field_errors"]] == ["bogus", "style"]
+
+    def test_infinite_number_is_a_field_error(self):
+        # The stdlib JSON decoder (used without orjson) parses Infinity
+        request = json.loads(
+            '{"modality": "video", "model": "sora", "payload": {"modality": "video", '
+            '"goal": "g", "subject": "s", "scene": "city", "duration_seconds": Infinity}}'
+        )
+        body, status = compile_request(request)
+
+        assert status == 400
+        assert body["field_errors"][0]["field"] == "duration_seconds"
+
+    def test_rejected_before_compiling(self, monkeypatch):
+        import service
+
+        def fail(*args, **kwargs):
+            raise AssertionError("payload reached the compiler")
+
+        monkeypatch.setattr(service.compiler, "compile_payload", fail)
+        body, status = compile_request(
+            {"modality": "image", "model": "dalle", "payload": image_payload(bogus="x")}
+        )
+        assert status == 400
+
+
+def random_text(rng, max_size=40):
+    """Short string biased towards whitespace, null bytes and runs of spaces."""
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_size)))
+
+
+def random_payload(rng, modality):
+    """Valid payload for a modality with messy strings in every text field."""
+    payload = {}
+    for name, rule in PAYLOAD_VALIDATORS[modality].rules.items():
+        if name in ("modality", "goal", "subject") or rng.random() < 0.6:
+            if rule.kind == validation.TEXT:
+                payload[name] = random_text(rng)
+            elif rule.kind == validation.TEXT_LIST:
+                count = rng.randint(0, 4)
+                payload[name] = [random_text(rng, MAX_TEXT_LENGTH // 10) for _ in range(count)]
+            else:
+                payload[name] = rng.choice([1, 30, 60, " 12 ", "5"])
+    payload["goal"] = payload["goal"] or "g"
+    payload["subject"] = payload["subject"] or "s"
+    return payload
+
+
+class TestFusedSanitize:
+    """The fused pass sanitizes exactly like rate_limiter.sanitize_payload."""
+
+    def test_only_space_is_printable_whitespace(self):
+        assert [c for c in WHITESPACE if c.isprintable()] == [" "]
+        assert not "\x00".isprintable()
+        assert all(f"a{c}b".split() == ["a", "b"] for c in WHITESPACE)
+
+    @pytest.mark.parametrize("text", ["a\u200bb", "\u00ad", "a\ue000"])
+    def test_other_unprintables_take_slow_path(self, text):
+        assert not is_clean_text(text)
+        assert clean_text(text) == sanitize_input(text, MAX_TEXT_LENGTH)
+
+    def test_clean_text_matches_sanitize_input(self):
+        rng = random.Random(1301)
+        for _ in range(20000):
+            text = random_text(rng)
+            max_length = rng.randint(0, 45)
+            assert clean_text(text, max_length) == sanitize_input(text, max_length), repr(text)
+
+    @pytest.mark.parametrize("text", ["", "a", "two words", "é 字 \U0001f600", "x" * 2000])
+    def test_clean_strings_returned_as_is(self, text):
+        assert clean_text(text) is text
+
+    @pytest.mark.parametrize("modality", sorted(PROMPT_TYPES))
+    def test_clean_payload_matches_sanitize_payload(self, modality):
+        rng = random.Random(modality)
+        for _ in range(500):
+            payload = random_payload(rng, modality)
+            sanitized, errors = clean_payload(modality, payload)
+
+            # Integer fields are the one difference: numeric strings become ints
+            expected = sanitize_payload(payload, MAX_TEXT_LENGTH)
+            for name, rule in PAYLOAD_VALIDATORS[modality].rules.items():
+                if rule.kind == validation.INTEGER and name in expected:
+                    expected[name] = int(expected[name])
+
+            assert errors == []
+            assert sanitized == expected, payload
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
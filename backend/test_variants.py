@@ -0,0 +1,217 @@
+"""
+Tests for variant expansion and render plans specialized to a base prompt.
+Run with: pytest test_variants.py -v
+"""
+
+import dataclasses
+import itertools
+import random
+import typing
+
+import pytest
+
+from adapters.render import Field, Group, Line, Spec, compile_spec
+from jsoncodec import loads
+from registry import ADAPTER_REGISTRY, MODEL_INDEX
+from schema import PROMPT_TYPES
+from service import compile_request, prepare_variants, stream_variants
+from variants import VariantSpace
+
+AXES = [
+    ("lighting", ["soft", "hard", "neon", "golden hour"]),
+    ("style", list("abcde")),
+    ("camera", ["35mm", "macro", None]),
+]
+
+# Awkward but valid values: empty, braces (literal text in a specialized
+# plan) and separators
+TEXTS = ["", "x", "y {z}", "w}", "a, b"]
+
+
+class TestVariantSpace:
+    """Tests for VariantSpace."""
+
+    def test_expand_matches_product(self):
+        space = VariantSpace(AXES)
+
+        assert space.size == 60
+        assert list(space.expand()) == list(
+            enumerate(itertools.product(*(values for _, values in AXES)))
+        )
+
+    def test_combination_decodes_any_index(self):
+        space = VariantSpace(AXES)
+
+        for index, values in space.expand():
+            assert space.combination(index) == values
+        with pytest.raises(IndexError):
+            space.combination(60)
+
+    def test_limit_and_sample(self):
+        space = VariantSpace(AXES)
+
+        assert [index for index, _ in space.expand(limit=7)] == list(range(7))
+        sample = [index for index, _ in space.expand(sample=10, seed=3)]
+        assert sample == sorted(set(sample)) and len(sample) == 10
+        assert sample == [index for index, _ in space.expand(sample=10, seed=3)]
+        assert len(list(space.expand(limit=4, sample=10))) == space.count(limit=4, sample=10) == 4
+        assert len(list(space.expand(sample=100))) == space.count(sample=100) == 60
+
+    def test_sample_from_huge_space(self):
+        space = VariantSpace([(f"f{i}", list(range(100))) for i in range(15)])
+
+        assert space.size == 100**15
+        drawn = list(space.expand(sample=5, seed=1))
+        assert len({index for index, _ in drawn}) == 5
+        for index, values in drawn:
+            # With 100 values per field, the digits are the index in base 100
+            assert values == tuple(index // 100 ** (14 - i) % 100 for i in range(15))
+
+
+def random_value(rng, f):
+    annotation = f.type
+    if typing.get_origin(annotation) is typing.Union:
+        annotation = typing.get_args(annotation)[0]
+    if annotation is int:
+        return rng.choice([1, 5, 10])
+    if rng.random() < 0.3 and f.default is not dataclasses.MISSING:
+        return None
+    if typing.get_origin(annotation) is list:
+        return rng.sample(TEXTS, rng.randint(0, 2))
+    return rng.choice(TEXTS)
+
+
+class TestSpecializedPlans:
+    """A specialized plan renders every variant exactly like the full plan."""
+
+    @pytest.mark.parametrize("model", list(MODEL_INDEX))
+    def test_matches_full_render(self, model):
+        rng = random.Random(model)
+        adapter = ADAPTER_REGISTRY[model]
+        prompt_cls = PROMPT_TYPES[MODEL_INDEX[model].modality]
+        fields = [f for f in dataclasses.fields(prompt_cls) if f.name != "modality"]
+
+        for _ in range(100):
+            base = prompt_cls(
+                modality=MODEL_INDEX[model].modality,
+                **{f.name: random_value(rng, f) for f in fields},
+            )
+            varying = rng.sample(fields, rng.randint(1, 3))
+            plan = adapter.plan.specialize(base, [f.name for f in varying])
+            for _ in range(5):
+                variant = dataclasses.replace(
+                    base, **{f.name: random_value(rng, f) for f in varying}
+                )
+                assert plan.render(variant) == adapter.plan.render(variant)
+
+    def test_fixed_segments_become_literals(self):
+        plan = compile_spec(
+            Spec(
+                [
+                    Line("Subject: {subject}"),
+                    Group([Field("style"), Field("lighting")], sep=", ", template="({})"),
+                    Field("mood", "Mood: {}"),
+                ],
+                sep=". ",
+            )
+        )
+        base = PROMPT_TYPES["image"](modality="image", goal="g", subject="a {mug}", style="oil")
+
+        specialized = plan.specialize(base, ["lighting"])
+
+        assert specialized.fields == ("lighting",)
+        assert specialized.render(dataclasses.replace(base, lighting="dim")) == (
+            "Subject: a {mug}. (oil, dim)"
+        )
+
+    def test_unread_fields_give_constant_plan(self):
+        adapter = ADAPTER_REGISTRY["seamless-m4t"]
+        base = PROMPT_TYPES["audio"](modality="audio", goal="g", subject="s")
+
+        plan = adapter.plan.specialize(base, ["quality_level"])
+
+        assert plan.fields == ()
+        assert plan.render(base) == "Generate multilingual speech"
+
+
+class TestStreamVariants:
+    """Tests for prepare_variants and stream_variants."""
+
+    REQUEST = {
+        "modality": "image",
+        "models": ["midjourney", "dalle"],
+        "payload": {"modality": "image", "goal": "g", "subject": "a mug", "lighting": "flat"},
+        "vary": dict(AXES),
+    }
+
+    def test_every_variant_matches_generate(self):
+        variants, error = prepare_variants(self.REQUEST, max_variants=100)
+        assert error is None
+        lines = [loads(line) for line in stream_variants(variants)]
+
+        assert [line["variant"] for line in lines[:-1]] == list(range(60))
+        for line in lines[:-1]:
+            payload = dict(self.REQUEST["payload"])
+            payload.update((k, v) for k, v in line["values"].items() if v is not None)
+            for model, prompt in line["prompts"].items():
+                body, status = compile_request(
+                    {"modality": "image", "model": model, "payload": payload}
+                )
+                assert (status, body["prompt"]) == (200, prompt)
+        assert lines[-1] == {
+            "modality": "image",
+            "models": ["midjourney", "dalle"],
+            "combinations": 60,
+            "count": 60,
+            "errors": 0,
+        }
+
+    def test_values_are_validated_and_sanitized(self):
+        request = {**self.REQUEST, "vary": {"lighting": ["  soft   light "], "mood": ["ok", 3]}}
+
+        _, (body, status) = prepare_variants(request, max_variants=100)
+        assert status == 400
+        assert body["field_errors"] == [
+            {"field": "mood", "code": "type", "message": "Field 'mood' must be a string"}
+        ]
+
+        request["vary"]["mood"] = ["ok", None]
+        variants, error = prepare_variants(request, max_variants=100)
+        assert error is None
+        assert variants.space.values == (("soft light",), ("ok", None))
+
+    @pytest.mark.parametrize(
+        "changes, fragment",
+        [
+            ({"vary": {}}, "'vary'"),
+            ({"vary": {"lighting": []}}, "non-empty list"),
+            ({"models": ["sora"]}, "Invalid model 'sora'"),
+            ({"models": []}, "'models'"),
+            ({"limit": 0}, "'limit'"),
+            ({"sample": "3"}, "'sample'"),
+            ({"seed": 1.5}, "'seed'"),
+            ({"payload": {"modality": "image", "goal": "g"}}, "subject"),
+        ],
+    )
+    def test_invalid_requests(self, changes, fragment):
+        _, (body, status) = prepare_variants({**self.REQUEST, **changes}, max_variants=100)
+
+        assert status == 400
+        assert fragment in body["error"]
+
+    def test_too_many_variants(self):
+        _, (body, status) = prepare_variants(self.REQUEST, max_variants=59)
+        assert status == 400
+        assert "60 variants" in body["error"]
+
+        variants, error = prepare_variants({**self.REQUEST, "sample": 59}, max_variants=59)
+        assert error is None
+        assert len(list(stream_variants(variants))) == 60
+
+    def test_too_many_prompts(self):
+        request = {**self.REQUEST, "models": ["midjourney", "dalle"]}
+        _, (body, status) = prepare_variants(request, max_variants=100, max_prompts=100)
+
+        assert status == 400
+        assert "120 prompts (60 variants for 2 models); the maximum is 100" in body["error"]
+        assert prepare_variants(request, max_variants=100, max_prompts=120)[1] is None
@@ -0,0 +1,232 @@
+"""
+Offline token-count estimation and per-model prompt budgets.
+
+Counts are estimated without any model vocabulary. Each whitespace-
+delimited word is split the way BPE tokenizers pre-tokenize text (letter
+runs, digits in threes, punctuation runs) and each piece is costed by a
+length heuristic; a leading space merges into a word's first token, so it
+is free. Words repeat heavily across prompts, so each word is costed once,
+and the counts of whole strings are cached too. Set
+TOKENIZER=tiktoken:<encoding> to count with tiktoken instead when it is
+installed (its BPE files are loaded on first use, from TIKTOKEN_CACHE_DIR
+when working offline).
+
+Adapters declare the prompt budget of their model in `max_prompt_tokens`;
+fit_prompt() shortens a prompt's optional fields until it fits one.
+"""
+
+import dataclasses
+import functools
+import logging
+import os
+import re
+from typing import NamedTuple, Tuple
+
+from rate_limiter import parse_tier_mapping
+
+logger = logging.getLogger(__name__)
+
+# Counting backend: "approx" (built in) or "tiktoken:<encoding>"
+TOKENIZER = os.getenv("TOKENIZER", "approx")
+
+# Whole strings whose counts are kept
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+
+# Budget overrides, e.g. MODEL_TOKEN_BUDGETS="gpt-4:6000,stable-diffusion:75"
+MODEL_TOKEN_BUDGETS = {
+    model: int(budget)
+    for model, budget in parse_tier_mapping(os.getenv("MODEL_TOKEN_BUDGETS", "")).items()
+}
+
+# Pieces of a word in the style of GPT BPE pre-tokenization, in stdlib re:
+# contractions, letter runs, up to three digits, punctuation runs
+PIECE = re.compile(r"'(?:s|t|re|ve|m|ll|d)|[^\W\d_]+|\d{1,3}|[^\s\w]+")
+
+# Costs of the words seen so far, cleared when full
+MAX_COSTED_WORDS = 100000
+_word_costs = {}
+
+
+def piece_tokens(piece):
+    """Estimated tokens of one piece of a word."""
+    if not piece[0].isalpha():
+        # Digit groups are single tokens, punctuation pairs up
+        return 1 if piece[0].isdigit() else (len(piece) + 1) // 2
+    if not piece.isascii():
+        # Roughly a token per three UTF-8 bytes (one per CJK character)
+        return max(1, (len(piece.encode("utf-8")) + 2) // 3)
+    # Common words are single tokens; long and rare ones split in chunks
+    return 1 if len(piece) <= 7 else (len(piece) + 4) // 5
+
+
+def approx_tokens(text):
+    """
+    Estimate the tokens of text without a vocabulary.
+
+    Counting is a split and a dict lookup per word (see word_tokens), plus
+    a token per run of line breaks (runs of three or more count extra).
+    """
+    return sum(word_tokens(text.split())) + text.count("\n") - text.count("\n\n")
+
+
+def word_tokens(words):
+    """
+    Estimated tokens of each of a list of whitespace-free words.
+
+    A word is costed by its pieces the first time it is seen; after that
+    its cost is a dict lookup.
+    """
+    costs = _word_costs
+    try:
+        return list(map(costs.__getitem__, words))
+    except KeyError:
+        if len(costs) >= MAX_COSTED_WORDS:
+            costs.clear()
+        counts = []
+        for word in words:
+            cost = costs.get(word)
+            if cost is None:
+                cost = costs[word] = sum(map(piece_tokens, PIECE.findall(word)))
+            counts.append(cost)
+        return counts
+
+
+@functools.lru_cache(maxsize=None)
+def _tiktoken_encoding(name):
+    """tiktoken encoding by name, loaded on first use; None if unavailable."""
+    try:
+        import tiktoken
+    except ImportError:  # optional dependency
+        logger.warning("TOKENIZER=%s but tiktoken is not installed; estimating", TOKENIZER)
+        return None
+    return tiktoken.get_encoding(name)
+
+
+def _encoding():
+    """The tiktoken encoding TOKENIZER selects, or None to estimate."""
+    if TOKENIZER.startswith("tiktoken:"):
+        return _tiktoken_encoding(TOKENIZER.partition(":")[2])
+    return None
+
+
+def _count(text):
+    """Token count of text with the configured backend."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return approx_tokens(text)
+
+
+count_tokens = functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)(_count)
+count_tokens.__doc__ = """
+    Token count of text with the configured backend (cached per string).
+
+    Args:
+        text: Text to count
+
+    Returns:
+        int: Number of tokens (estimated unless TOKENIZER selects tiktoken)
+    """
+
+
+def token_budget(model, adapter):
+    """
+    Prompt token budget of a model: MODEL_TOKEN_BUDGETS, else the
+    adapter's max_prompt_tokens.
+
+    Returns:
+        int: Budget, or None when the model has none
+    """
+    budget = MODEL_TOKEN_BUDGETS.get(model)
+    if budget is None:
+        budget = getattr(adapter, "max_prompt_tokens", None)
+    return budget
+
+
+class TokenFit(NamedTuple):
+    """A compiled prompt shortened to a token budget."""
+
+    prompt: str
+    tokens: int
+    truncated: Tuple[str, ...]  # optional fields shortened or dropped, in order
+
+
+def fit_prompt(adapter, prompt, budget):
+    """
+    Compile a prompt, shortening optional fields until it fits a budget.
+
+    Fields are shortened longest first (by their own tokens): each is cut
+    back a word (or a list item) at a time until the prompt fits, or
+    dropped when that is not enough, before moving on to the next.
+    Required fields are never touched, so the result can still exceed the
+    budget; callers check TokenFit.tokens.
+
+    Args:
+        adapter: Adapter compiling the prompt
+        prompt: Prompt dataclass instance
+        budget: Maximum tokens for the compiled prompt
+
+    Returns:
+        TokenFit: The prompt that was compiled last and its token count
+    """
+    text = adapter.compile(prompt)
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return TokenFit(text, tokens, ())
+
+    truncated = []
+    for name, default, parts, counts in _optional_fields(adapter, prompt):
+        truncated.append(name)
+        # Counts are additive under the estimator, so each guess removes
+        # about the excess; the recount corrects for template boundaries
+        keep = len(parts)
+        excess = tokens - budget
+        while excess > 0 and keep > 0:
+            while excess > 0 and keep > 0:
+                keep -= 1
+                excess -= counts[keep]
+            if not keep:
+                value = default
+            elif isinstance(parts, tuple):
+                value = " ".join(parts[:keep])
+            else:
+                value = parts[:keep]
+            prompt = dataclasses.replace(prompt, **{name: value})
+            text = adapter.compile(prompt)
+            tokens = count_tokens(text)
+            excess = tokens - budget
+        if excess <= 0:
+            break
+    return TokenFit(text, tokens, tuple(truncated))
+
+
+def _optional_fields(adapter, prompt):
+    """
+    (name, default, parts, counts) of the prompt's set optional fields that
+    the adapter reads, longest first, where counts are the tokens of each
+    part: the words of a string, as a tuple (payloads are whitespace-
+    collapsed, so kept words are rejoined by single spaces), or the items
+    of a list.
+    """
+    plan = getattr(adapter, "plan", None)
+    read = set(plan.fields) if plan is not None else None
+    required = type(prompt).REQUIRED_FIELDS
+    found = []
+    for f in dataclasses.fields(prompt):
+        value = getattr(prompt, f.name)
+        if f.name in required or not value or (read is not None and f.name not in read):
+            continue
+        if isinstance(value, str):
+            parts = tuple(value.split())
+            if _encoding() is None:
+                counts = word_tokens(parts)
+            else:
+                counts = [_count(" " + word) for word in parts]
+        elif isinstance(value, list):
+            parts = value
+            counts = [_count(item) + 1 for item in value]
+        else:
+            continue  # integers are not shortened
+        found.append((sum(counts), f.name, f.default, parts, counts))
+    found.sort(key=lambda entry: -entry[0])
+    return [entry[1:] for entry in found]
@@ -0,0 +1,263 @@
+"""
+Payload validators generated from the prompt dataclasses in schema.py.
+
+Each modality gets a validator built once from its dataclass: the allowed
+keys, the kind of value each field takes, the required fields, and the
+length and range bounds from field metadata. A validator checks a raw
+payload in a single pass, before any object construction, and returns
+structured field errors; the same pass also sanitizes the payload,
+producing exactly what rate_limiter.sanitize_payload would.
+"""
+
+import dataclasses
+import typing
+from typing import NamedTuple, Optional
+
+from schema import MAX_TEXT_LENGTH, PROMPT_TYPES
+
+# Stop scanning a payload after this many errors, so junk-heavy payloads
+# are rejected without walking every key
+MAX_FIELD_ERRORS = 10
+
+# Kinds of value a field accepts
+TEXT = "text"
+TEXT_LIST = "text_list"
+INTEGER = "integer"
+
+
+def is_clean_text(text):
+    """
+    Whether sanitization would leave a string unchanged.
+
+    Every whitespace character other than the space, and the null byte, is
+    non-printable (checked over every code point in test_validation.py), so
+    a printable string only needs its spaces checked. Strings with other
+    non-printable characters are reported unclean, which is safe: they just
+    take the slow path.
+    """
+    return text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " "
+
+
+def clean_text(text, max_length=MAX_TEXT_LENGTH):
+    """
+    Sanitize a string exactly like rate_limiter.sanitize_input.
+
+    Truncates, drops null bytes and collapses whitespace; strings that are
+    already clean are returned as is without being rebuilt.
+
+    Args:
+        text: String to sanitize
+        max_length: Maximum allowed length
+
+    Returns:
+        str: Sanitized text
+    """
+    if len(text) <= max_length and is_clean_text(text):
+        return text
+    return " ".join(text[:max_length].replace("\x00", "").split())
+
+
+class FieldRule(NamedTuple):
+    """Validation rule for one payload field."""
+
+    kind: str
+    max_length: int
+    minimum: Optional[int]
+    maximum: Optional[int]
+
+
+def field_error(field, code, message):
+    """Structured error for one payload field."""
+    return {"field": field, "code": code, "message": message}
+
+
+def field_rule(f):
+    """
+    Build the validation rule for a dataclass field.
+
+    Args:
+        f: dataclasses.Field of a prompt dataclass
+
+    Returns:
+        FieldRule: Rule derived from the field's type and metadata
+
+    Raises:
+        TypeError: If the field's type has no validator
+    """
+    annotation = f.type
+    if typing.get_origin(annotation) is typing.Union:
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+
+    if typing.get_origin(annotation) is list:
+        kind = TEXT_LIST
+    elif annotation is int:
+        kind = INTEGER
+    elif annotation is str:
+        kind = TEXT
+    else:
+        raise TypeError(f"No validator for field '{f.name}' of type {f.type!r}")
+
+    return FieldRule(
+        kind,
+        f.metadata.get("max_length", MAX_TEXT_LENGTH),
+        f.metadata.get("min"),
+        f.metadata.get("max"),
+    )
+
+
+class PayloadValidator:
+    """
+    Validator for the payload of one prompt dataclass.
+
+    Args:
+        prompt_cls: Prompt dataclass (see schema.PROMPT_TYPES)
+    """
+
+    def __init__(self, prompt_cls):
+        self.prompt_cls = prompt_cls
+        self.rules = {f.name: field_rule(f) for f in dataclasses.fields(prompt_cls)}
+        self.required = tuple(
+            f.name for f in dataclasses.fields(prompt_cls) if f.name in prompt_cls.REQUIRED_FIELDS
+        )
+
+    def __call__(self, payload):
+        """
+        Validate a raw payload.
+
+        Args:
+            payload: Payload dictionary as received
+
+        Returns:
+            list: Field error dicts (empty when the payload is valid)
+        """
+        return self.clean(payload)[1]
+
+    def clean(self, payload):
+        """
+        Validate and sanitize a raw payload in one pass.
+
+        Each string is scanned once: clean strings are kept as they are,
+        others are truncated, stripped of null bytes and whitespace-collapsed.
+        For a valid payload the result equals sanitize_payload(payload).
+
+        Args:
+            payload: Payload dictionary as received
+
+        Returns:
+            tuple: (sanitized payload dict, list of field error dicts); the
+                payload is only meaningful when there are no errors
+        """
+        errors = []
+        sanitized = {}
+        rules = self.rules
+
+        for key, value in payload.items():
+            rule = rules.get(key)
+            if rule is None:
+                errors.append(field_error(key, "unknown", f"Unknown field '{key}'"))
+            elif value is None:
+                continue
+            elif rule.kind is TEXT:
+                if not isinstance(value, str):
+                    errors.append(field_error(key, "type", f"Field '{key}' must be a string"))
+                elif len(value) > rule.max_length:
+                    errors.append(
+                        field_error(
+                            key,
+                            "max_length",
+                            f"Field '{key}' exceeds maximum length of {rule.max_length}",
+                        )
+                    )
+                elif is_clean_text(value):
+                    sanitized[key] = value
+                else:
+                    sanitized[key] = " ".join(value.replace("\x00", "").split())
+            elif rule.kind is TEXT_LIST:
+                items = self._clean_list(value, rule)
+                if items is None:
+                    errors.append(
+                        field_error(key, "type", f"Field '{key}' must be a list of strings")
+                    )
+                else:
+                    sanitized[key] = items
+            else:
+                number, error = self._check_integer(key, value, rule)
+                if error:
+                    errors.append(error)
+                else:
+                    sanitized[key] = number
+
+            if len(errors) >= MAX_FIELD_ERRORS:
+                return sanitized, errors
+
+        for name in self.required:
+            if payload.get(name) is None:
+                errors.append(field_error(name, "required", f"Missing required field: {name}"))
+        return sanitized, errors
+
+    @staticmethod
+    def _clean_list(value, rule):
+        """Sanitized copy of a list of strings, or None if it isn't one."""
+        if not isinstance(value, list):
+            return None
+        items = []
+        for item in value:
+            if not isinstance(item, str):
+                return None
+            items.append(clean_text(item, rule.max_length))
+        return items
+
+    @staticmethod
+    def _check_integer(key, value, rule):
+        """(int value, None), or (None, error) if the value is out of range."""
+        # Numeric strings are accepted, as form inputs send them, and
+        # converted so adapters never see "3" where they expect 3
+        if isinstance(value, bool):
+            return None, field_error(key, "type", f"{key} must be a valid integer")
+        try:
+            number = int(value)
+        except (ValueError, TypeError, OverflowError):
+            # OverflowError: JSON Infinity, which the stdlib decoder accepts
+            return None, field_error(key, "type", f"{key} must be a valid integer")
+
+        if (rule.minimum is not None and number < rule.minimum) or (
+            rule.maximum is not None and number > rule.maximum
+        ):
+            return None, field_error(
+                key, "range", f"{key} must be between {rule.minimum} and {rule.maximum}"
+            )
+        return number, None
+
+
+# One validator per API modality, generated at import
+PAYLOAD_VALIDATORS = {
+    modality: PayloadValidator(prompt_cls) for modality, prompt_cls in PROMPT_TYPES.items()
+}
+
+
+def validate_payload(modality, payload):
+    """
+    Validate a payload against the schema of a modality.
+
+    Args:
+        modality: API modality (a key of PAYLOAD_VALIDATORS)
+        payload: Payload dictionary as received
+
+    Returns:
+        list: Field error dicts (empty when the payload is valid)
+    """
+    return PAYLOAD_VALIDATORS[modality](payload)
+
+
+def clean_payload(modality, payload):
+    """
+    Validate and sanitize a payload against the schema of a modality.
+
+    Args:
+        modality: API modality (a key of PAYLOAD_VALIDATORS)
+        payload: Payload dictionary as received
+
+    Returns:
+        tuple: (sanitized payload dict, list of field error dicts)
+    """
+    return PAYLOAD_VALIDATORS[modality].clean(payload)
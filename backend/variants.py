@@ -0,0 +1,97 @@
+"""
+Cartesian variant expansion for prompt A/B matrices.
+
+A variant request names a base payload and, per field, a list of values to
+try; every combination of one value per field is a variant. The space is
+never materialized: variants are numbered in itertools.product order and
+generated lazily, and any variant can be decoded directly from its number
+(a mixed-radix number whose digits index the value lists), so a random
+sample costs only the variants drawn, however large the matrix is.
+"""
+
+import itertools
+import random
+import sys
+
+
+class VariantSpace:
+    """
+    Cross product of per-field value lists.
+
+    Args:
+        axes: (field name, list of values) pairs; the last field varies
+            fastest, as in itertools.product
+    """
+
+    def __init__(self, axes):
+        self.fields = tuple(name for name, _ in axes)
+        self.values = tuple(tuple(values) for _, values in axes)
+        self.size = 1
+        for values in self.values:
+            self.size *= len(values)
+
+    def combination(self, index):
+        """
+        Values of the variant with the given number.
+
+        Args:
+            index: Variant number, 0 <= index < size
+
+        Returns:
+            tuple: One value per field, in field order
+        """
+        if not 0 <= index < self.size:
+            raise IndexError(f"Variant {index} out of range for {self.size} variants")
+        digits = []
+        for values in reversed(self.values):
+            index, digit = divmod(index, len(values))
+            digits.append(values[digit])
+        return tuple(reversed(digits))
+
+    def sample_indices(self, count, seed=None):
+        """
+        Numbers of distinct variants drawn uniformly at random, ascending.
+
+        Args:
+            count: How many to draw (at most size)
+            seed: Seed for a reproducible draw
+
+        Returns:
+            list: Sorted variant numbers
+        """
+        rng = random.Random(seed)
+        count = min(count, self.size)
+        if self.size <= sys.maxsize:
+            return sorted(rng.sample(range(self.size), count))
+        # range() longer than sys.maxsize has no len(); with count far below
+        # size, rejection sampling almost never draws a number twice
+        drawn = set()
+        while len(drawn) < count:
+            drawn.add(rng.randrange(self.size))
+        return sorted(drawn)
+
+    def expand(self, limit=None, sample=None, seed=None):
+        """
+        Generate (variant number, values) pairs lazily.
+
+        Args:
+            limit: Stop after this many variants
+            sample: Draw this many variants at random instead of taking
+                them in order
+            seed: Seed for the sample
+
+        Yields:
+            tuple: (variant number, tuple of values in field order)
+        """
+        if sample is not None:
+            indices = self.sample_indices(sample, seed)[:limit]
+            return ((index, self.combination(index)) for index in indices)
+        return itertools.islice(enumerate(itertools.product(*self.values)), limit)
+
+    def count(self, limit=None, sample=None):
+        """Number of variants expand() yields with the same arguments."""
+        count = self.size
+        for bound in (limit, sample):
+            if bound is not None:
+                count = min(count, bound)
+        return count